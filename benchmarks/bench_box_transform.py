@@ -0,0 +1,136 @@
+"""
+框坐标变换基准与一致性检查：对比 box_transform 的向量化实现与 tools 中两个单框脚本的逐框做法。
+- scipy: tools/lidar_bbox2world_bbox.py，欧拉角 from_euler('xyz')，输出 as_euler('xyz')
+- pyquaternion: tools/lidar_bbox2world_bbox_pyquternion_version.py，qx · qy · qz（即 seq='XYZ'），
+  输出 yaw_pitch_roll（逆序后即 'XYZ' 欧拉角）
+先用两个脚本中的示例框和随机框检查结果一致（四元数按 ±q 比较），再统计 N 个框的耗时。
+
+用法（在仓库根目录运行）:
+    python benchmarks/bench_box_transform.py
+    python benchmarks/bench_box_transform.py --sizes 10000 1000000 --poses 1000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from box_transform import quat_to_euler, transform_boxes  # noqa: E402
+
+# 两个脚本中的示例数据
+EGO_TRANSLATION = [5.971844426282407, 0.11134448866065963, 0.0]
+EGO_ROTATION = [0.9999368449660043, 0.0, 0.0, -0.011238597752077771]
+BOX_TRANSLATION = [-3.9408597307957014, 0.32885810363408985, 0.29495090450320394]
+BOX_ROTATION = [0, 0, 0.002931187467946428]
+
+
+def make_boxes(n, num_poses, seed=0):
+    rng = np.random.default_rng(seed)
+    translations = rng.uniform(-50.0, 50.0, (n, 3))
+    euler = rng.uniform(-np.pi / 3, np.pi / 3, (n, 3))
+    ego_t = rng.uniform(-1000.0, 1000.0, (num_poses, 3))
+    ego_q = rng.normal(size=(num_poses, 4))
+    ego_q /= np.linalg.norm(ego_q, axis=1, keepdims=True)
+    pose_index = rng.integers(0, num_poses, n)
+    return translations, euler, ego_t, ego_q, pose_index
+
+
+def transform_scipy(translations, euler, ego_t, ego_q, pose_index):
+    """tools/lidar_bbox2world_bbox.py 的逐框做法。"""
+    from scipy.spatial.transform import Rotation as R
+    out_t, out_q = [], []
+    for t, e, i in zip(translations, euler, pose_index):
+        w, x, y, z = ego_q[i]
+        ego_rotation = R.from_quat([x, y, z, w])
+        out_t.append(ego_t[i] + ego_rotation.apply(t))
+        x, y, z, w = (ego_rotation * R.from_euler('xyz', e)).as_quat()
+        out_q.append([w, x, y, z])
+    return np.array(out_t), np.array(out_q)
+
+
+def transform_pyquaternion(translations, euler, ego_t, ego_q, pose_index):
+    """tools/lidar_bbox2world_bbox_pyquternion_version.py 的逐框做法，返回值另含 yaw_pitch_roll。"""
+    from pyquaternion import Quaternion
+    out_t, out_q, out_ypr = [], [], []
+    for t, e, i in zip(translations, euler, pose_index):
+        ego_rotation = Quaternion(ego_q[i])
+        box_rotation = Quaternion(axis=[1, 0, 0], angle=e[0]) * \
+            Quaternion(axis=[0, 1, 0], angle=e[1]) * \
+            Quaternion(axis=[0, 0, 1], angle=e[2])
+        out_t.append(ego_t[i] + ego_rotation.rotate(t))
+        world_rotation = ego_rotation * box_rotation
+        out_q.append(world_rotation.elements)
+        out_ypr.append(world_rotation.yaw_pitch_roll)
+    return np.array(out_t), np.array(out_q), np.array(out_ypr)
+
+
+def same_rotation(q1, q2, atol=1e-9):
+    return np.allclose(np.abs(np.sum(q1 * q2, axis=1)), 1.0, atol=atol)
+
+
+def check(n, num_poses):
+    """返回 [(检查项, 是否通过)]。"""
+    results = []
+    cases = [('示例框', (np.array([BOX_TRANSLATION]), np.array([BOX_ROTATION]), np.array([EGO_TRANSLATION]),
+                         np.array([EGO_ROTATION]), np.zeros(1, dtype=np.int64))),
+             ('随机框', make_boxes(n, num_poses, seed=1))]
+    for name, (translations, euler, ego_t, ego_q, pose_index) in cases:
+        ref_t, ref_q = transform_scipy(translations, euler, ego_t, ego_q, pose_index)
+        out_t, out_q = transform_boxes(translations, euler, ego_t, ego_q, pose_index, seq='xyz')
+        results.append((f"{name} seq='xyz' 与 scipy 一致",
+                        np.allclose(out_t, ref_t, atol=1e-9) and same_rotation(out_q, ref_q)))
+        results.append((f"{name} quat_to_euler 与 scipy as_euler('xyz') 一致",
+                        same_rotation(out_q, ref_q) and _euler_close(quat_to_euler(out_q), ref_q)))
+
+        ref_t, ref_q, ref_ypr = transform_pyquaternion(translations, euler, ego_t, ego_q, pose_index)
+        out_t, out_q = transform_boxes(translations, euler, ego_t, ego_q, pose_index, seq='XYZ')
+        results.append((f"{name} seq='XYZ' 与 pyquaternion 一致",
+                        np.allclose(out_t, ref_t, atol=1e-9) and same_rotation(out_q, ref_q)))
+        results.append((f"{name} quat_to_euler('XYZ') 与 yaw_pitch_roll 逆序一致",
+                        np.allclose(quat_to_euler(out_q, 'XYZ'), ref_ypr[:, ::-1], atol=1e-9)))
+
+        back_t, back_q = transform_boxes(out_t, out_q, ego_t, ego_q, pose_index, inverse=True)
+        results.append((f"{name} 逆变换还原", np.allclose(back_t, translations, atol=1e-9) and
+                        same_rotation(back_q, transform_boxes(translations, euler, [0, 0, 0], [1, 0, 0, 0],
+                                                              seq='XYZ')[1])))
+    return results
+
+
+def _euler_close(euler, quat_wxyz):
+    from scipy.spatial.transform import Rotation as R
+    ref = R.from_quat(quat_wxyz[:, [1, 2, 3, 0]]).as_euler('xyz')
+    return np.allclose(euler, ref, atol=1e-9)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 100_000, 1_000_000])
+    parser.add_argument('--poses', type=int, default=500, help='位姿数（框随机对应到位姿）')
+    parser.add_argument('--loop-limit', type=int, default=10_000, help='逐框做法只跑不超过该规模的用例')
+    args = parser.parse_args()
+
+    results = check(2_000, args.poses)
+    for name, ok in results:
+        print(f"{'OK  ' if ok else 'FAIL'} {name}")
+
+    print(f"{'boxes':>10} {'method':>14} {'seconds':>10} {'us/box':>10}")
+    for n in args.sizes:
+        boxes = make_boxes(n, args.poses)
+        methods = [('vectorized', lambda *a: transform_boxes(*a[:4], pose_index=a[4]))]
+        if n <= args.loop_limit:
+            methods += [('scipy', transform_scipy), ('pyquaternion', transform_pyquaternion)]
+        for name, fn in methods:
+            start = time.perf_counter()
+            fn(*boxes)
+            elapsed = time.perf_counter() - start
+            print(f"{n:>10} {name:>14} {elapsed:>10.3f} {elapsed / n * 1e6:>10.2f}")
+
+    if not all(ok for _, ok in results):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+地图写出基准：对比 json.dump(indent=4) 与 nuscenes_map_writer 的各个模式的写入耗时和文件大小。
+默认把 maps/AIR_F11/AIR_F11.json 的 node / line / polygon / 语义层复制 1000 份（token 加后缀保证唯一）。
+
+用法（在仓库根目录运行）:
+    python benchmarks/bench_map_writer.py
+    python benchmarks/bench_map_writer.py --scale 100 --map maps/AIR_G/AIR_G.json
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from nuscenes_map_writer import write_nuscenes_map  # noqa: E402
+
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+def _suffix_tokens(obj, suffix):
+    """递归地给所有 token 字段（及 token 列表）加后缀。"""
+    if isinstance(obj, dict):
+        return {
+            k: (v + suffix if isinstance(v, str) and k.endswith('token')
+                else [t + suffix for t in v] if k.endswith('tokens') and isinstance(v, list) and v and isinstance(v[0], str)
+                else _suffix_tokens(v, suffix))
+            for k, v in obj.items()
+        }
+    if isinstance(obj, list):
+        return [_suffix_tokens(v, suffix) for v in obj]
+    return obj
+
+
+def scale_map(nuscenes_map, scale):
+    scaled = {}
+    for key, value in nuscenes_map.items():
+        if isinstance(value, list) and key != 'canvas_edge':
+            scaled[key] = [_suffix_tokens(item, f'-{i}') for i in range(scale) for item in value]
+        else:
+            scaled[key] = value
+    return scaled
+
+
+def legacy_dump(nuscenes_map, output_path):
+    with open(output_path, 'w') as f:
+        json.dump(nuscenes_map, f, indent=4)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--map', default=os.path.join(REPO_ROOT, 'maps', 'AIR_F11', 'AIR_F11.json'))
+    parser.add_argument('--scale', type=int, default=1000)
+    args = parser.parse_args()
+
+    with open(args.map, 'r') as f:
+        nuscenes_map = scale_map(json.load(f), args.scale)
+    print(f"{args.map} x{args.scale}: {len(nuscenes_map['node'])} nodes, {len(nuscenes_map['line'])} lines")
+
+    cases = [
+        ('json.dump indent=4', legacy_dump),
+        ('stream indent=4', lambda m, p: write_nuscenes_map(m, p)),
+        ('compact', lambda m, p: write_nuscenes_map(m, p, compact=True)),
+        ('compact precision=4', lambda m, p: write_nuscenes_map(m, p, compact=True, float_precision=4)),
+    ]
+    try:
+        import orjson  # noqa: F401
+        cases.append(('compact orjson', lambda m, p: write_nuscenes_map(m, p, compact=True, fast_encoder=True)))
+        cases.append(('compact orjson precision=4',
+                      lambda m, p: write_nuscenes_map(m, p, compact=True, float_precision=4, fast_encoder=True)))
+    except ImportError:
+        print("orjson 未安装，跳过 fast_encoder 用例")
+
+    print(f"{'mode':>28} {'seconds':>10} {'MB':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, write in cases:
+            path = os.path.join(tmp, 'out.json')
+            start = time.perf_counter()
+            write(nuscenes_map, path)
+            elapsed = time.perf_counter() - start
+            print(f"{name:>28} {elapsed:>10.3f} {os.path.getsize(path) / 1e6:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
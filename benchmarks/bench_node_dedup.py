@@ -0,0 +1,118 @@
+"""
+节点去重基准：对比原先的线性扫描与 NodeRegistry 哈希索引。
+生成 N 个顶点的折线（约 10% 顶点与前面的折线共享端点），统计去重耗时与每顶点耗时，
+NodeRegistry 的每顶点耗时应在 1k ~ 1M 之间基本保持不变（线性增长）。
+之后在 synthetic_map 生成的合成地图上跑完整转换（读 GeoJSON、坐标转换、去重、写出），
+给出总耗时与其中去重阶段（profiler 的 dedup）所占的比例，确认去重的改进体现在端到端耗时上。
+
+用法（在仓库根目录运行）:
+    python benchmarks/bench_node_dedup.py
+    python benchmarks/bench_node_dedup.py --sizes 1000 10000 --tolerance 0.01
+    python benchmarks/bench_node_dedup.py --e2e-lines 1000 10000 100000
+    python benchmarks/bench_node_dedup.py --e2e-lines    # 不跑端到端转换
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from map_meta import load_map_meta  # noqa: E402
+from node_registry import NodeRegistry  # noqa: E402
+from QGISMap2NuscenesMap import make_converter  # noqa: E402
+from synthetic_map import generate  # noqa: E402
+
+
+def make_vertices(n, seed=0):
+    """
+    生成 n 个顶点，每 10 个顶点构成一条折线，折线起点复用上一条折线的终点。
+    """
+    rng = random.Random(seed)
+    vertices = []
+    last = (0.0, 0.0)
+    while len(vertices) < n:
+        vertices.append(last)
+        for _ in range(9):
+            last = (rng.uniform(-500.0, 500.0), rng.uniform(-500.0, 500.0))
+            vertices.append(last)
+    return vertices[:n]
+
+
+def dedup_linear(vertices):
+    """原先 process_geometry 中的做法：每个顶点都扫描全部已有节点。"""
+    nodes = {}
+    for x, y in vertices:
+        existing_token = None
+        for tok, (nx, ny) in nodes.items():
+            if nx == x and ny == y:
+                existing_token = tok
+                break
+        if existing_token is None:
+            nodes[str(uuid.uuid4())] = (x, y)
+    return len(nodes)
+
+
+def dedup_registry(vertices, tolerance):
+    registry = NodeRegistry(tolerance)
+    token_factory = lambda x, y: str(uuid.uuid4())  # noqa: E731
+    for x, y in vertices:
+        registry.get_or_create(x, y, token_factory)
+    return len(registry)
+
+
+def convert_synthetic(lines, tolerance=0.0, seed=0):
+    """
+    生成 lines 条折线（及 lines / 10 个多边形与点）的合成地图并完整转换一次，
+    返回 (顶点数, 节点数, 总耗时, 去重耗时)。
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        dataset = generate(tmp, lines=lines, polygons=lines // 10, points=lines // 10, seed=seed)
+        start = time.perf_counter()
+        converter = make_converter({'node_tolerance': tolerance, 'profile': True}, load_map_meta(dataset['map_yaml']))
+        with contextlib.redirect_stdout(io.StringIO()):
+            converter.convert_layers(dataset['layers'], os.path.join(tmp, 'output_nuscenes_map.json'))
+        seconds = time.perf_counter() - start
+        report = converter.profile_report()
+    dedup = report['stages'].get('dedup', {}).get('seconds', 0.0)
+    return report['counters']['vertices'], len(converter.node_list), seconds, dedup
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 10_000, 100_000, 1_000_000])
+    parser.add_argument('--tolerance', type=float, default=0.0)
+    parser.add_argument('--linear-limit', type=int, default=10_000,
+                        help='线性扫描只跑不超过该规模的用例（O(N^2)）')
+    parser.add_argument('--e2e-lines', type=int, nargs='*', default=[1_000, 10_000],
+                        help='端到端转换的合成地图折线数，不给出数值时跳过')
+    args = parser.parse_args()
+
+    print(f"{'vertices':>10} {'method':>10} {'nodes':>10} {'seconds':>10} {'us/vertex':>10}")
+    for n in args.sizes:
+        vertices = make_vertices(n)
+        methods = [('registry', lambda v: dedup_registry(v, args.tolerance))]
+        if n <= args.linear_limit and not args.tolerance:
+            methods.append(('linear', dedup_linear))
+        for name, fn in methods:
+            start = time.perf_counter()
+            num_nodes = fn(vertices)
+            elapsed = time.perf_counter() - start
+            print(f"{n:>10} {name:>10} {num_nodes:>10} {elapsed:>10.3f} {elapsed / n * 1e6:>10.2f}")
+
+    if args.e2e_lines:
+        print("\n端到端转换（synthetic_map）")
+        print(f"{'lines':>10} {'vertices':>10} {'nodes':>10} {'seconds':>10} {'us/vertex':>10} {'dedup %':>10}")
+    for lines in args.e2e_lines:
+        vertices, num_nodes, seconds, dedup = convert_synthetic(lines, args.tolerance)
+        print(f"{lines:>10} {vertices:>10} {num_nodes:>10} {seconds:>10.3f} {seconds / vertices * 1e6:>10.2f} "
+              f"{dedup / seconds * 100:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+"""
+端到端转换基准：用 synthetic_map 生成不同规模的合成图层，完整执行 转换 -> 与模板合并 -> 写出，
+记录吞吐（顶点/秒）、各阶段耗时与峰值内存（RSS），并与保存的基线比较。
+每个规模在单独的子进程中运行，峰值 RSS 互不影响。
+
+用法（在仓库根目录运行）:
+    python benchmarks/bench_pipeline.py
+    python benchmarks/bench_pipeline.py --sizes 1000 10000 50000 --token-factory counter
+    python benchmarks/bench_pipeline.py --save-baseline           # 用本次结果覆盖基线
+    python benchmarks/bench_pipeline.py --tolerance 0.2           # 吞吐比基线低 20% 以上时返回非零（夜间任务）
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.join(BENCH_DIR, '..')
+sys.path.insert(0, os.path.join(REPO_ROOT, 'src'))
+sys.path.insert(0, BENCH_DIR)
+
+from synthetic_map import generate  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, 'baseline_pipeline.json')
+TEMPLATE = os.path.join(REPO_ROOT, 'template', 'unused_template.json')
+
+
+def _run_size(data_dir, token_factory, compact):
+    """子进程中执行一次完整转换，返回计时报告与峰值 RSS。"""
+    from map_meta import load_map_meta
+    from QGISMap2NuscenesMap import make_converter
+    from pipeline_profiler import PipelineProfiler
+
+    with open(os.path.join(data_dir, 'layers.json'), 'r') as f:
+        dataset = json.load(f)
+    output = os.path.join(data_dir, 'output_nuscenes_map.json')
+    shutil.copy(TEMPLATE, output)
+
+    start = time.perf_counter()
+    converter = make_converter({'token_factory': token_factory}, load_map_meta(dataset['map_yaml']))
+    converter.profiler = PipelineProfiler()
+    converter.convert_layers(dataset['layers'], output, compact=compact)
+    seconds = time.perf_counter() - start
+
+    report = converter.profile_report()
+    # Linux 上 ru_maxrss 单位为 KB，macOS 上为字节
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_rss_mb = max_rss / 1e6 if sys.platform == 'darwin' else max_rss / 1e3
+    return {
+        'seconds': seconds,
+        'vertices': report['counters']['vertices'],
+        'vertices_per_second': report['counters']['vertices'] / seconds,
+        'peak_rss_mb': peak_rss_mb,
+        'output_mb': os.path.getsize(output) / 1e6,
+        'stages': {name: stage['seconds'] for name, stage in report['stages'].items()},
+        'counters': report['counters'],
+    }
+
+
+def run(sizes, token_factory='counter', compact=False, seed=0):
+    results = {}
+    context = multiprocessing.get_context('spawn')
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            dataset = generate(tmp, lines=size, polygons=size // 10, points=size // 10, seed=seed)
+            with open(os.path.join(tmp, 'layers.json'), 'w') as f:
+                json.dump(dataset, f)
+            with context.Pool(1) as pool:
+                results[str(size)] = pool.apply(_run_size, (tmp, token_factory, compact))
+    return results
+
+
+def compare(results, baseline, tolerance=None):
+    """打印与基线的对比，返回吞吐低于基线 (1 - tolerance) 倍的规模列表。"""
+    regressions = []
+    print(f"{'size':>8} {'vertices':>10} {'seconds':>9} {'vert/s':>11} {'RSS MB':>8} {'base vert/s':>12} {'ratio':>7}")
+    for size, result in results.items():
+        base = baseline.get('results', {}).get(size)
+        ratio = result['vertices_per_second'] / base['vertices_per_second'] if base else None
+        print(f"{size:>8} {result['vertices']:>10} {result['seconds']:>9.2f} {result['vertices_per_second']:>11.0f} "
+              f"{result['peak_rss_mb']:>8.1f} "
+              f"{(base['vertices_per_second'] if base else float('nan')):>12.0f} "
+              f"{(ratio if ratio is not None else float('nan')):>7.2f}")
+        if tolerance is not None and ratio is not None and ratio < 1 - tolerance:
+            regressions.append(size)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 5000, 20000], help='road_divider 折线数')
+    parser.add_argument('--token-factory', default='counter')
+    parser.add_argument('--compact', action='store_true')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--tolerance', type=float, default=None, help='允许的吞吐下降比例，超过时返回非零')
+    parser.add_argument('--json', default=None, help='将本次结果写入该 JSON 文件')
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.token_factory, args.compact, args.seed)
+    record = {
+        'machine': {'platform': platform.platform(), 'python': platform.python_version(),
+                    'cpu_count': os.cpu_count()},
+        'options': {'token_factory': args.token_factory, 'compact': args.compact, 'seed': args.seed},
+        'results': results,
+    }
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+    regressions = compare(results, baseline, args.tolerance)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(record, f, indent=4)
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(record, f, indent=4)
+        print(f"baseline saved to {args.baseline}")
+    if regressions:
+        print(f"吞吐低于基线 {args.tolerance:.0%} 以上: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
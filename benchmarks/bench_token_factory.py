@@ -0,0 +1,25 @@
+"""
+token 生成基准：对比 uuid4 / content / counter 三种模式生成一个节点 token 的耗时。
+
+用法（在仓库根目录运行）:
+    python benchmarks/bench_token_factory.py
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from token_factory import TOKEN_MODES, make_token_factory  # noqa: E402
+
+
+def main(number=200_000):
+    print(f"{'mode':>10} {'us/token':>10}")
+    for mode in TOKEN_MODES:
+        factory = make_token_factory(mode)
+        seconds = timeit.timeit(lambda: factory('node', 12.345678901234, -6.789012345678), number=number)
+        print(f"{mode:>10} {seconds / number * 1e6:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
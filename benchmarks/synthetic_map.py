@@ -0,0 +1,124 @@
+"""
+生成 QGIS 风格的合成标注数据，用于转换器的规模测试:
+- road_divider.geojson: 折线（随机游走，部分折线首尾相连以触发节点去重）
+- road_segment.geojson: 多边形（正多边形外环，带 0~2 个孔洞）
+- points.geojson: 点
+- map.png / map.yaml: 空白占据栅格图与 ROS yaml（resolution / origin）
+坐标与 QGIS 导出一致: x 向右为 [0, width]，y 向下为 [-height, 0]（像素）。
+
+用法（在仓库根目录运行）:
+    python benchmarks/synthetic_map.py /tmp/synthetic --lines 10000 --polygons 1000 --points 1000
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+from PIL import Image
+
+
+def _feature_collection(name, features):
+    return {'type': 'FeatureCollection', 'name': name, 'features': features}
+
+
+def _feature(geometry_type, coordinates):
+    return {'type': 'Feature', 'properties': {}, 'geometry': {'type': geometry_type, 'coordinates': coordinates}}
+
+
+def synthetic_lines(rng, n, width, height, vertices=20, step=15.0, connect_ratio=0.3):
+    """随机游走折线；connect_ratio 比例的折线从上一条折线的终点开始。"""
+    features = []
+    last_end = None
+    for _ in range(n):
+        if last_end is not None and rng.random() < connect_ratio:
+            start = last_end
+        else:
+            start = np.array([rng.uniform(0, width), -rng.uniform(0, height)])
+        steps = rng.normal(0, step, size=(vertices - 1, 2))
+        coords = np.vstack([start, start + np.cumsum(steps, axis=0)])
+        coords[:, 0] = np.clip(coords[:, 0], 0, width)
+        coords[:, 1] = np.clip(coords[:, 1], -height, 0)
+        last_end = coords[-1]
+        features.append(_feature('LineString', coords.tolist()))
+    return features
+
+
+def _ring(center, radius, sides):
+    angles = np.linspace(0, 2 * np.pi, sides, endpoint=False)
+    ring = center + radius * np.column_stack([np.cos(angles), np.sin(angles)])
+    return np.vstack([ring, ring[:1]]).tolist()
+
+
+def synthetic_polygons(rng, n, width, height, sides=16, max_holes=2):
+    """正多边形外环，孔洞沿外环内部的一条直径排列，互不相交。"""
+    features = []
+    for _ in range(n):
+        radius = rng.uniform(10, 40)
+        center = np.array([rng.uniform(radius, width - radius), -rng.uniform(radius, height - radius)])
+        rings = [_ring(center, radius, sides)]
+        n_holes = rng.integers(0, max_holes + 1)
+        for k in range(n_holes):
+            offset = (k - (n_holes - 1) / 2) * radius * 0.8
+            rings.append(_ring(center + np.array([offset, 0.0]), radius * 0.3, sides // 2))
+        features.append(_feature('Polygon', rings))
+    return features
+
+
+def synthetic_points(rng, n, width, height):
+    return [_feature('Point', [rng.uniform(0, width), -rng.uniform(0, height)]) for _ in range(n)]
+
+
+def generate(out_dir, lines=1000, polygons=100, points=100, width=2000, height=2000, seed=0,
+             resolution=0.05, origin=(-50.0, -50.0, 0.0)):
+    """
+    写出合成图层与 yaml，返回 {'map_yaml': ..., 'layers': [...], 'vertices': 总顶点数}。
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    layers = {
+        'road_divider': synthetic_lines(rng, lines, width, height),
+        'road_segment': synthetic_polygons(rng, polygons, width, height),
+        'points': synthetic_points(rng, points, width, height),
+    }
+    paths = []
+    vertices = 0
+    for name, features in layers.items():
+        if not features:
+            continue
+        path = os.path.join(out_dir, f'{name}.geojson')
+        with open(path, 'w') as f:
+            json.dump(_feature_collection(name, features), f)
+        paths.append(path)
+        for feature in features:
+            geometry = feature['geometry']
+            if geometry['type'] == 'Point':
+                vertices += 1
+            elif geometry['type'] == 'LineString':
+                vertices += len(geometry['coordinates'])
+            else:
+                vertices += sum(len(ring) for ring in geometry['coordinates'])
+
+    Image.new('L', (width, height), 255).save(os.path.join(out_dir, 'map.png'))
+    map_yaml = os.path.join(out_dir, 'map.yaml')
+    with open(map_yaml, 'w') as f:
+        f.write(f"image: map.png\nresolution: {resolution}\norigin: [{origin[0]}, {origin[1]}, {origin[2]}]\n")
+    return {'map_yaml': map_yaml, 'layers': paths, 'vertices': vertices}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('out_dir')
+    parser.add_argument('--lines', type=int, default=1000)
+    parser.add_argument('--polygons', type=int, default=100)
+    parser.add_argument('--points', type=int, default=100)
+    parser.add_argument('--width', type=int, default=2000)
+    parser.add_argument('--height', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    result = generate(args.out_dir, args.lines, args.polygons, args.points, args.width, args.height, args.seed)
+    print(f"{len(result['layers'])} layers, {result['vertices']} vertices -> {args.out_dir}")
+
+
+if __name__ == '__main__':
+    main()
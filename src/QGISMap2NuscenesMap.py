@@ -1,14 +1,23 @@
 import geojson
 import json
-import uuid
 from shapely.geometry import shape
-import geopandas as gpd
+from shapely.geometry.base import BaseGeometry
 import numpy as np
-import yaml
-from PIL import Image  # 用于读取图像
 import os
 import math
+import hashlib
 import shutil
+from collections import deque
+
+from geojson_stream import iter_features, read_collection_name
+from node_registry import NodeRegistry
+from token_factory import make_token_factory
+from nuscenes_map_writer import write_nuscenes_map
+from polygon_nesting import nest_features
+from polygon_boundaries import boundary_features
+from vertex_reduction import simplify_lines, resample_lines
+from pipeline_profiler import NULL_PROFILER, PipelineProfiler
+from map_meta import load_yaml  # noqa: F401  兼容旧的 from QGISMap2NuscenesMap import load_yaml
 
 
 # - qgis默认x右y下，图片左上角
@@ -17,29 +26,18 @@ import shutil
 
 # x, y, 将ISSAC图片/ROS图片里面的坐标系（x右y上）/(x右y上)转换为实际issac里面的右手坐标系（未知，实际情况）,正值逆时针旋转（右手定则）
 # full_warehouse = (180, 180) # Isaac
-ros2issac_axis_mapping = (0, 0)  # ROS以ROS图片的进行调整, ISAAC以ISAAC图片进行调整
-
-# 配置文件
-IS_ROS = True
-map_name = "AIR_F11"
-resource_root = 'resource/' + map_name + '/'
-geojson_input = resource_root + 'road_divider.geojson'  # 替换为您的GeoJSON文件路径
-ros_yaml_input = resource_root + map_name + '.yaml'
-template_path = 'template/unused_template.json'
-nuscenes_output = 'output_nuscenes_map.json'  # 替换为您希望保存的JSON文件路径
-
-is_merge_diff_geojson = False
-if not is_merge_diff_geojson:
-    # 如果目标文件存在，则先删除
-    if os.path.exists(nuscenes_output):
-        os.remove(nuscenes_output)
-    # 使用 shutil.copy 进行复制
-    shutil.copy(template_path, nuscenes_output)
+DEFAULT_AXIS_MAPPING = (0, 0)  # ROS以ROS图片的进行调整, ISAAC以ISAAC图片进行调整
+DEFAULT_IS_ROS = True
+# 转换结果（节点、几何、语义层的生成方式）发生变化时递增，使 layer_cache 中按旧版本缓存的图层失效
+CONVERTER_VERSION = 1
+# 地图、图层、输出路径等运行配置由命令行给出: python src/cli.py convert --help
 
 class Geojson2Nuscenesjson:
     def __init__(self, 
-                 resolution, origin, image_height, image_width, is_ros=IS_ROS,
-                 axis_mapping=ros2issac_axis_mapping,
+                 resolution, origin, image_height, image_width, is_ros=DEFAULT_IS_ROS,
+                 axis_mapping=DEFAULT_AXIS_MAPPING, node_tolerance=0.0,
+                 token_factory='uuid4', token_seed=0,
+                 simplify_tolerance=0.0, resample_spacing=None, profiler=None,
                  ):
         """
         初始化语义层和数据结构。
@@ -48,6 +46,12 @@ class Geojson2Nuscenesjson:
         - origin: 原点坐标 [x, y, z]
         - image_height: 图像高度（像素数）
         - image_width: 图像宽度（像素数）
+        - node_tolerance: 节点去重的吸附容差（米），默认 0 即坐标完全相同才合并
+        - token_factory: token 生成方式，'uuid4'（默认，随机）、'content'（内容哈希）、'counter'（token_seed + 计数），
+          或自定义的 factory(*key) 可调用对象，见 token_factory.py
+        - simplify_tolerance: 生成节点前对折线和多边形环做 Douglas-Peucker 简化的容差（米），默认 0 不简化
+        - resample_spacing: 生成节点前将折线按该间距（米）重采样，默认 None 不重采样（多边形环不重采样）
+        - profiler: pipeline_profiler.PipelineProfiler，记录各阶段耗时，默认不记录
         """
         self.nuscenes_semantic_layers = (
             "road_divider", "lane_divider", "road_segment", "lane", "ped_crossing"
@@ -55,10 +59,20 @@ class Geojson2Nuscenesjson:
         # 初始化语义数据字典
         self.semantic_data = {layer: [] for layer in self.nuscenes_semantic_layers}
         # 初始化几何数据
-        self.nodes = {}
+        self.node_registry = NodeRegistry(node_tolerance)  # (x, y) -> token 的哈希索引
         self.node_list = []
         self.line_list = []
         self.polygon_list = []
+        self.token_factory = make_token_factory(token_factory, token_seed)
+        self._feature_index = 0  # 当前要素在所属 GeoJSON 图层中的序号，用于内容哈希 token
+        self.simplify_tolerance = simplify_tolerance
+        self.resample_spacing = resample_spacing
+        self.vertex_stats = {'input': 0, 'output': 0}  # 顶点精简前后的顶点数
+        self._reduced_lines = None  # 整个图层批量精简后的折线坐标，process_geometry 按顺序取用
+        self.profiler = profiler or NULL_PROFILER
+        self.feature_count = 0
+        self.vertex_count = 0
+        self.token_count = 0
 
         self.resolution = resolution
         self.origin = origin  # origin 是一个列表 [x, y, z]
@@ -74,8 +88,37 @@ class Geojson2Nuscenesjson:
         # - axis_mapping 用于 ros -> issac 坐标系方向
         self.axis_mapping = axis_mapping
         self.is_ros = is_ros
+        self._build_transform()
 
-    def transform_point(self, x, y, coord):
+    def _build_transform(self):
+        """
+        预先计算 QGIS像素 -> 世界坐标 的系数，避免每个点重复读取 axis_mapping、计算 radians/cos/sin。
+        每一步都与 transform_point 原有的逐步公式一致：
+        - 像素缩放与 y 翻转: x_scaled = sign_x * x_qgis * resolution, y_scaled = sign_y * (image_height + y_qgis) * resolution
+        - 平移到 origin: x_real = x_scaled - origin_x, y_real = y_scaled - origin_y
+        - 按 axis_mapping 旋转
+        同时给出等价的 3x3 仿射矩阵 self.affine_matrix（齐次坐标，QGIS像素 -> 世界坐标）。
+        """
+        if self.is_ros:  # ROS地图yaml: QGIS -> ROS 左下角 x左y下
+            self._sign_x, self._sign_y = -1.0, -1.0
+        else:  # isaac地图yaml: QGIS -> Isaac
+            self._sign_x, self._sign_y = 1.0, 1.0
+        x_rotation, y_rotation = self.axis_mapping  # 获取 X 和 Y 轴的旋转角度（以度为单位）
+        theta_x = math.radians(x_rotation)  # 将角度转换为弧度
+        theta_y = math.radians(y_rotation)  # 将角度转换为弧度
+        self._cos_x, self._sin_x = math.cos(theta_x), math.sin(theta_x)
+        self._cos_y, self._sin_y = math.cos(theta_y), math.sin(theta_y)
+
+        rotation = np.array([[self._cos_x, -self._sin_x],
+                             [self._sin_y, self._cos_y]])
+        scale = np.diag([self._sign_x * self.resolution, self._sign_y * self.resolution])
+        offset = np.array([-self.origin_x,
+                           self._sign_y * self.image_height * self.resolution - self.origin_y])
+        self.affine_matrix = np.eye(3)
+        self.affine_matrix[:2, :2] = rotation @ scale
+        self.affine_matrix[:2, 2] = rotation @ offset
+
+    def transform_point(self, x, y, coord=None):
         """
         将 QGIS/普通图像 坐标系转换为 ROS/Isaac 的 origin 坐标系。
         再将 ROS/Isaac 坐标转换为 Issac 或 real world 坐标（基于 self.axis_mapping）。
@@ -89,59 +132,59 @@ class Geojson2Nuscenesjson:
         再将世界坐标转为bev坐标
         - Issac或者real world ---> BEV(和QGIS一样)
         """
-        if coord:
-            x_qgis, y_qgis = coord
+        if coord is not None:
+            x_qgis, y_qgis = coord[0], coord[1]
         else:
             x_qgis, y_qgis = x, y
-            
-        if self.is_ros:  # ROS地图yaml
-            ### Step 1: QGIS -> ROS 左下角 x左y下
-            # 翻转 Y 轴（QGIS 的 Y 轴向下，ROS 的 Y 轴向上）
-            y_flipped = -(self.image_height + y_qgis)
-            x = -x_qgis
-            # 像素转换到实际世界尺度（ROS的分辨率是每个像素对应多少米）
-            x_ros = x * self.resolution
-            y_ros = y_flipped * self.resolution
-            # 将 ROS 坐标系原点移到 origin
-            x_ros_real = x_ros - self.origin_x
-            y_ros_real = y_ros - self.origin_y
-            ### Step 2: Isaac -> Isaac/real world
-            # 应用 self.axis_mapping（角度旋转）
-            x_rotation, y_rotation = self.axis_mapping  # 获取 X 和 Y 轴的旋转角度（以度为单位）
-            theta_x = math.radians(x_rotation)  # 将角度转换为弧度
-            theta_y = math.radians(y_rotation)  # 将角度转换为弧度
-            # 应用旋转矩阵公式
-            x_transformed = x_ros_real * math.cos(theta_x) - y_ros_real * math.sin(theta_x)
-            y_transformed = x_ros_real * math.sin(theta_y) + y_ros_real * math.cos(theta_y)
-        else: #isaac地图yaml
-            ### Step 1: QGIS -> Isaac
-            # 翻转 Y 轴（QGIS 的 Y 轴向下，Isaac 的 Y 轴向上）
-            y_flipped = self.image_height + y_qgis
-            # 像素转换到实际世界尺度
-            x_isaac = x_qgis * self.resolution
-            y_isaac = y_flipped * self.resolution
-            # 将 Isaac 坐标系原点移到 origin, origin是真实尺度
-            x_isaac_real = x_isaac - self.origin_x
-            y_isaac_real = y_isaac - self.origin_y
-            
-            ### Step 2: Isaac -> Issac/real world
-            # 应用 self.axis_mapping（角度旋转）
-            x_rotation, y_rotation = self.axis_mapping  # 获取 X 和 Y 轴的旋转角度（以度为单位）
-            theta_x = math.radians(x_rotation)  # 将角度转换为弧度
-            theta_y = math.radians(y_rotation)  # 将角度转换为弧度
-            # 应用旋转矩阵公式
-            x_transformed = x_isaac_real * math.cos(theta_x) - y_isaac_real * math.sin(theta_x)
-            y_transformed = x_isaac_real * math.sin(theta_y) + y_isaac_real * math.cos(theta_y)
-        
+
+        ### Step 1: QGIS -> ROS/Isaac
+        # 翻转 Y 轴（QGIS 的 Y 轴向下，ROS/Isaac 的 Y 轴向上），像素转换到实际世界尺度
+        x_scaled = (self._sign_x * x_qgis) * self.resolution
+        y_scaled = (self._sign_y * (self.image_height + y_qgis)) * self.resolution
+        # 将坐标系原点移到 origin, origin是真实尺度
+        x_real = x_scaled - self.origin_x
+        y_real = y_scaled - self.origin_y
+        ### Step 2: ROS/Isaac -> Issac/real world，应用 self.axis_mapping（角度旋转）
+        x_transformed = x_real * self._cos_x - y_real * self._sin_x
+        y_transformed = x_real * self._sin_y + y_real * self._cos_y
         return [x_transformed, y_transformed]
 
-    def generate_token(self):
+    def transform_points(self, coords):
         """
-        生成一个唯一的UUID作为token。
+        批量版本的 transform_point。
+        参数:
+        - coords: (N, 2) 的 QGIS 像素坐标（数组或坐标序列，多出的 z 列会被忽略）
+        返回:
+        - (N, 2) float64 数组，世界坐标。运算顺序与 transform_point 完全一致，结果逐位相同
+        """
+        pts = np.asarray(coords, dtype=np.float64)
+        if pts.size == 0:
+            return np.empty((0, 2), dtype=np.float64)
+        pts = pts.reshape(len(pts), -1)
+        x_qgis, y_qgis = pts[:, 0], pts[:, 1]
+
+        x_scaled = (self._sign_x * x_qgis) * self.resolution
+        y_scaled = (self._sign_y * (self.image_height + y_qgis)) * self.resolution
+        x_real = x_scaled - self.origin_x
+        y_real = y_scaled - self.origin_y
+
+        out = np.empty((len(pts), 2), dtype=np.float64)
+        out[:, 0] = x_real * self._cos_x - y_real * self._sin_x
+        out[:, 1] = x_real * self._sin_y + y_real * self._cos_y
+        return out
+
+    def generate_token(self, *key):
+        """
+        生成一个UUID格式的token。
         UUID是一种标准的格式，用于在分布式系统中生成唯一的标识符，
-        确保在不同系统或不同时间生成的ID不会重复。
+        默认的 uuid4 模式确保在不同系统或不同时间生成的ID不会重复；
+        key 描述被生成 token 的对象，'content' 模式据此生成可复现的 token，其他模式忽略。
         """
-        return str(uuid.uuid4())
+        self.token_count += 1
+        return self.token_factory(*key)
+
+    def _node_token(self, x, y):
+        return self.generate_token('node', x, y)
 
     def extract_semantics(self, geojson_data):
         """
@@ -153,13 +196,77 @@ class Geojson2Nuscenesjson:
             semantic_type = 'unknown'
         return semantic_type
 
-    def process_geometry(self, feature, semantic_type):
+    def reduce_vertices(self, coords_list, closed=False):
+        """
+        对世界坐标下的一组折线（closed=False）或闭合环（closed=True）做顶点精简，见 vertex_reduction.py。
+        未设置 simplify_tolerance / resample_spacing 时原样返回。
+        """
+        if not self.simplify_tolerance and not self.resample_spacing:
+            return coords_list
+        reduced = coords_list
+        with self.profiler.stage('reduce'):
+            if self.simplify_tolerance:
+                reduced = simplify_lines(reduced, self.simplify_tolerance, min_points=4 if closed else 2)
+            if self.resample_spacing and not closed:
+                reduced = resample_lines(reduced, self.resample_spacing)
+        self.vertex_stats['input'] += sum(len(c) for c in coords_list)
+        self.vertex_stats['output'] += sum(len(c) for c in reduced)
+        return reduced
+
+    @property
+    def removed_vertices(self):
+        return self.vertex_stats['input'] - self.vertex_stats['output']
+
+    def coords_to_node_tokens(self, coords, transform=True):
+        """
+        将一串 QGIS 坐标（LineString / Polygon 外环 / 孔洞）转换为节点 token 列表。
+        坐标相同（或在 node_tolerance 内）的节点通过 self.node_registry 复用，新节点追加到 self.node_list。
+        coords 也可以是已经转换好的世界坐标数组（transform=False）。
+        """
+        if transform:
+            with self.profiler.stage('transform'):
+                coords = self.transform_points(coords)  # 整条线/环一次性转换坐标
+        if isinstance(coords, np.ndarray):
+            coords = coords.tolist()
+        self.vertex_count += len(coords)
+        node_tokens = []
+        with self.profiler.stage('dedup'):
+            for coord in coords:
+                x, y = coord[0], coord[1]
+                token, is_new = self.node_registry.get_or_create(x, y, self._node_token)
+                if is_new:
+                    self.node_list.append({
+                        'token': token,
+                        'x': x,
+                        'y': y
+                    })
+                node_tokens.append(token)
+        return node_tokens
+
+    def process_geometry(self, feature, semantic_type, feature_index=None):
         """
         处理GeoJSON要素的几何数据，并根据语义类型分类存储。
+        feature_index: 要素在所属图层中的序号（content 模式的 token 取决于它），默认接着上一个要素递增；
+        只转换图层中部分要素时（见 map_patch.py）传入要素在完整图层中的序号，使 token 与完整转换一致。
         """
-        geom = shape(feature['geometry'])
+        if feature_index is not None:
+            self._feature_index = feature_index
+        geom = feature['geometry']
+        if not isinstance(geom, BaseGeometry):
+            with self.profiler.stage('shapely'):
+                geom = shape(geom)
         properties = feature.get('properties', {})
-        token = properties.get('token', self.generate_token())
+        if geom.geom_type in ('MultiLineString', 'MultiPolygon'):
+            # 多部件几何拆成单部件逐个处理（原先需要在 QGIS 中 multipart to singleparts），指定的 token 只给第一个部件
+            for i, part in enumerate(geom.geoms):
+                part_properties = properties if i == 0 else {k: v for k, v in properties.items() if k != 'token'}
+                self.process_geometry({'geometry': part, 'properties': part_properties}, semantic_type)
+            return
+        # 要素级 token 的 key：语义类型、要素在图层中的序号、几何摘要（仅内容哈希模式需要计算）
+        geom_digest = hashlib.blake2b(geom.wkb, digest_size=8).hexdigest() if self.token_factory.needs_content else None
+        feature_key = (semantic_type, self._feature_index, geom_digest)
+        self._feature_index += 1
+        token = properties.get('token', self.generate_token('feature', *feature_key))
 
         if geom.geom_type == 'Point':
             x, y = self.transform_point(geom.x, geom.y)  # transform coordinates
@@ -169,34 +276,20 @@ class Geojson2Nuscenesjson:
                 'y': y
             }
             self.node_list.append(node)
-            self.nodes[token] = (x, y)
+            self.node_registry.register(token, x, y)
 
         elif geom.geom_type == 'LineString':
-            coords = list(geom.coords)
-            node_tokens = []  # 存储节点 token 列表
-            for coord in coords:
-                coord = self.transform_point(None, None, coord)  # 转换坐标
-                existing_token = None
-                for tok, (x, y) in self.nodes.items():
-                    if x == coord[0] and y == coord[1]:
-                        existing_token = tok
-                        break
-                if existing_token is None:
-                    new_token = self.generate_token()
-                    node = {
-                        'token': new_token,
-                        'x': coord[0],
-                        'y': coord[1]
-                    }
-                    self.node_list.append(node)
-                    self.nodes[new_token] = coord
-                    node_tokens.append(new_token)
-                else:
-                    node_tokens.append(existing_token)
+            if self._reduced_lines is not None:
+                line_coords = self._reduced_lines.popleft()
+            else:
+                with self.profiler.stage('transform'):
+                    line_coords = self.transform_points(geom.coords)
+                line_coords, = self.reduce_vertices([line_coords])
+            node_tokens = self.coords_to_node_tokens(line_coords, transform=False)  # 存储节点 token 列表
 
             if len(node_tokens) >= 2:
                 # 创建 line 数据
-                line_token = self.generate_token()
+                line_token = self.generate_token('line', *feature_key)
                 line = {
                     'token': line_token,
                     'node_tokens': node_tokens  # 完整的节点列表
@@ -206,7 +299,7 @@ class Geojson2Nuscenesjson:
                 # **road_divider** 结构
                 if semantic_type == 'road_divider':
                     semantic_entry = {
-                        'token': self.generate_token(),  # 唯一标识符
+                        'token': self.generate_token(semantic_type, *feature_key),  # 唯一标识符
                         'line_token': line_token,
                         'road_segment_token': properties.get('road_segment_token', None)
                     }
@@ -221,7 +314,7 @@ class Geojson2Nuscenesjson:
                         } for node_token in node_tokens
                     ]
                     semantic_entry = {
-                        'token': self.generate_token(),
+                        'token': self.generate_token(semantic_type, *feature_key),
                         'line_token': line_token,
                         'lane_divider_segments': lane_divider_segments
                     }
@@ -229,51 +322,16 @@ class Geojson2Nuscenesjson:
 
 
         elif geom.geom_type == 'Polygon':
-            exterior_coords = list(geom.exterior.coords)
-            exterior_node_tokens = []
-            for coord in exterior_coords:
-                coord = self.transform_point(None, None, coord)  # transform coordinates
-                existing_token = None
-                for tok, (x, y) in self.nodes.items():
-                    if x == coord[0] and y == coord[1]:
-                        existing_token = tok
-                        break
-                if existing_token is None:
-                    new_token = self.generate_token()
-                    node = {
-                        'token': new_token,
-                        'x': coord[0],
-                        'y': coord[1]
-                    }
-                    self.node_list.append(node)
-                    self.nodes[new_token] = coord
-                    exterior_node_tokens.append(new_token)
-                else:
-                    exterior_node_tokens.append(existing_token)
+            # 外环与孔洞一起转换、精简
+            with self.profiler.stage('transform'):
+                rings = [self.transform_points(ring.coords) for ring in (geom.exterior, *geom.interiors)]
+            rings = self.reduce_vertices(rings, closed=True)
+            exterior_node_tokens = self.coords_to_node_tokens(rings[0], transform=False)
 
             # 处理孔洞（holes）
             holes = []
-            for interior in geom.interiors:
-                hole_coords = list(interior.coords)
-                hole_tokens = []
-                for coord in hole_coords:
-                    existing_token = None
-                    for tok, (x, y) in self.nodes.items():
-                        if x == coord[0] and y == coord[1]:
-                            existing_token = tok
-                            break
-                    if existing_token is None:
-                        new_token = self.generate_token()
-                        node = {
-                            'token': new_token,
-                            'x': coord[0],
-                            'y': coord[1]
-                        }
-                        self.node_list.append(node)
-                        self.nodes[new_token] = coord
-                        hole_tokens.append(new_token)
-                    else:
-                        hole_tokens.append(existing_token)
+            for interior in rings[1:]:
+                hole_tokens = self.coords_to_node_tokens(interior, transform=False)
                 if hole_tokens:
                     holes.append(hole_tokens)
 
@@ -288,14 +346,14 @@ class Geojson2Nuscenesjson:
             if semantic_type in self.nuscenes_semantic_layers:
                 if semantic_type == 'ped_crossing':
                     semantic_entry = {
-                        'token': self.generate_token(),
+                        'token': self.generate_token(semantic_type, *feature_key),
                         'polygon_token': token,
                         'road_segment_token': properties.get('road_segment_token', None)
                     }
                     self.semantic_data[semantic_type].append(semantic_entry)
                 elif semantic_type == 'road_segment':
                         semantic_entry = {
-                            'token': self.generate_token(),
+                            'token': self.generate_token(semantic_type, *feature_key),
                             'polygon_token': token,
                             'is_intersection': properties.get('is_intersection', False),
                             #'drivable_area_token': properties.get('drivable_area_token', token)  # 改为实际的多边形 token
@@ -304,15 +362,15 @@ class Geojson2Nuscenesjson:
                         self.semantic_data[semantic_type].append(semantic_entry)
                 elif semantic_type == 'lane':
                     # 使用几何结构生成左右分隔线 token 列表，而非 "unused"
-                    left_dividers = [self.generate_token() for _ in range(2)]
-                    right_dividers = [self.generate_token() for _ in range(2)]
+                    left_dividers = [self.generate_token('left_divider', i, *feature_key) for i in range(2)]
+                    right_dividers = [self.generate_token('right_divider', i, *feature_key) for i in range(2)]
                     
                     semantic_entry = {
-                        'token': self.generate_token(),
+                        'token': self.generate_token(semantic_type, *feature_key),
                         'polygon_token': token,
                         'lane_type': properties.get('lane_type', "CAR"),
-                        'from_edge_line_token': self.generate_token(),  # 基于 line token 生成，而不是 "unused"
-                        'to_edge_line_token': self.generate_token(),
+                        'from_edge_line_token': self.generate_token('from_edge_line', *feature_key),  # 基于 line token 生成，而不是 "unused"
+                        'to_edge_line_token': self.generate_token('to_edge_line', *feature_key),
                         'left_lane_divider_segments': [
                             {
                                 'node_token': node_token,
@@ -385,26 +443,174 @@ class Geojson2Nuscenesjson:
 
         return existing_map
 
-    def convert(self, geojson_path, output_path):
+    def merge_layer_map(self, layer_map):
         """
-        执行从GeoJSON到NuScenesMap JSON的转换流程。
-        如果输出文件已存在，则将新的内容添加到现有内容中。
+        将另一个转换器单独转换得到的地图（例如子进程中转换的一个图层，assemble_nuscenes_map 的结果）并入当前转换器。
+        节点按坐标经 self.node_registry 去重，被合并掉的节点 token 在 line / polygon / 语义层中随之替换，
+        结果与在同一个转换器中依次 add_layer 相同（token 取值除外）。
         """
-        # 生成新的NuScenesMap
-        with open(geojson_path, 'r') as f:
-            gj = geojson.load(f)
+        remap = {}
+        for node in layer_map.get('node', []):
+            token, is_new = self.node_registry.get_or_create(node['x'], node['y'], lambda x, y: node['token'])
+            if is_new:
+                self.node_list.append(node)
+            elif token != node['token']:
+                remap[node['token']] = token
+
+        for line in layer_map.get('line', []):
+            line['node_tokens'] = [remap.get(t, t) for t in line['node_tokens']]
+            self.line_list.append(line)
+
+        for polygon in layer_map.get('polygon', []):
+            polygon['exterior_node_tokens'] = [remap.get(t, t) for t in polygon['exterior_node_tokens']]
+            polygon['holes'] = [[remap.get(t, t) for t in hole] for hole in polygon['holes']]
+            self.polygon_list.append(polygon)
 
-        # 提取语义类型
-        semantic_type = self.extract_semantics(gj)
+        for layer in self.nuscenes_semantic_layers:
+            for entry in layer_map.get(layer, []):
+                for key in ('lane_divider_segments', 'left_lane_divider_segments', 'right_lane_divider_segments'):
+                    for segment in entry.get(key, ()):
+                        segment['node_token'] = remap.get(segment['node_token'], segment['node_token'])
+                self.semantic_data[layer].append(entry)
+
+    def add_layer(self, geojson_path, stream=False):
+        """
+        读取一个 GeoJSON 图层，将其要素转换到当前转换器中（所有图层共享同一个 node_registry）。
+        可以连续调用多次，最后调用一次 save 统一写出。
+        参数:
+        - stream: 为 True 时用 ijson 逐个要素读取并转换，峰值内存只取决于最大的单个要素，适合几百MB的图层
+        返回:
+        - 该图层的语义类型
+        """
+        if stream:
+            semantic_type = self.extract_semantics({'name': read_collection_name(geojson_path)})
+            features = iter_features(geojson_path)
+        else:
+            with self.profiler.stage('load'), open(geojson_path, 'r') as f:
+                gj = geojson.load(f)
+            # 提取语义类型
+            semantic_type = self.extract_semantics(gj)
+            features = gj['features']
         print(f"Semantic type determined from FeatureCollection name: {semantic_type}")
 
         # 处理每个要素
-        for feature in gj['features']:
-            self.process_geometry(feature, semantic_type)
+        self._process_features(features, semantic_type, batch_reduce=not stream)
+        return semantic_type
 
-        # 组合新的NuScenesMap JSON结构
-        new_nuscenes_map = self.assemble_nuscenes_map()
+    def _process_features(self, features, semantic_type, batch_reduce=True):
+        """
+        依次转换一个图层的全部要素并打印顶点精简统计。
+        batch_reduce 且设置了顶点精简时，先解析全部几何、转换所有折线的坐标，对整个图层的折线只调用一次
+        reduce_vertices，再按原顺序生成节点，结果与逐条精简相同；流式读取时逐个要素处理，不保留整层几何。
+        """
+        self._feature_index = 0
+        before = dict(self.vertex_stats)
+        if batch_reduce and (self.simplify_tolerance or self.resample_spacing):
+            features = self._reduce_lines(features)
+        try:
+            for feature in features:
+                self.feature_count += 1
+                self.process_geometry(feature, semantic_type)
+        finally:
+            self._reduced_lines = None
+        self._report_vertex_reduction(before)
+
+    def _reduce_lines(self, features):
+        """
+        解析全部要素的几何，批量精简其中所有 LineString（含 MultiLineString 的部件）的世界坐标，
+        结果按 process_geometry 处理的顺序放入 self._reduced_lines；返回几何已解析的要素列表。
+        """
+        parsed, lines = [], []
+        with self.profiler.stage('shapely'):
+            for feature in features:
+                geom = shape(feature['geometry'])
+                parsed.append({'geometry': geom, 'properties': feature.get('properties', {})})
+                if geom.geom_type == 'LineString':
+                    lines.append(geom)
+                elif geom.geom_type == 'MultiLineString':
+                    lines.extend(geom.geoms)
+        with self.profiler.stage('transform'):
+            coords = [self.transform_points(line.coords) for line in lines]
+        self._reduced_lines = deque(self.reduce_vertices(coords))
+        return parsed
+
+    def _report_vertex_reduction(self, before):
+        if self.simplify_tolerance or self.resample_spacing:
+            n_in = self.vertex_stats['input'] - before['input']
+            n_out = self.vertex_stats['output'] - before['output']
+            print(f"顶点精简: 本图层 {n_in} -> {n_out} 个顶点（减少 {n_in - n_out}），累计减少 {self.removed_vertices}")
+
+    def add_nested_layers(self, geojson_paths, stream=False):
+        """
+        读取分开标注的外轮廓图层与孔洞图层（如 road_segment out / road_segment holes），
+        经 polygon_nesting 自动把每个内环分配给包含它的多边形（支持任意层嵌套）后，作为一个图层转换。
+        语义类型取第一个图层的 name。
+        返回:
+        - 该图层的语义类型
+        """
+        features, name = self.read_features(geojson_paths, stream)
+        semantic_type = self.extract_semantics({'name': name})
+        print(f"Semantic type determined from FeatureCollection name: {semantic_type}")
 
+        self._process_features(nest_features(features), semantic_type)
+        return semantic_type
+
+    def add_boundary_layer(self, geojson_paths, semantic_type='road_divider', stream=False):
+        """
+        由多边形图层（如 road_segment，含 MultiPolygon 与孔洞）经 polygon_boundaries 提取并合并边界线，
+        直接作为 road_divider 折线转换，不需要在 QGIS 中 polygon to lines / merge / multipart to singleparts。
+        返回:
+        - 边界线的语义类型
+        """
+        features, _ = self.read_features(geojson_paths, stream)
+        print(f"Boundary lines of {len(features)} polygon features -> {semantic_type}")
+
+        self._process_features(boundary_features(features), semantic_type)
+        return semantic_type
+
+    def read_features(self, geojson_paths, stream=False):
+        """
+        读取多个 GeoJSON 图层的全部要素，返回 (features, 第一个图层的 name)。
+        """
+        features = []
+        first_name = None
+        for geojson_path in geojson_paths:
+            if stream:
+                name = read_collection_name(geojson_path)
+                features.extend(iter_features(geojson_path))
+            else:
+                with self.profiler.stage('load'), open(geojson_path, 'r') as f:
+                    gj = geojson.load(f)
+                name = gj.get('name', 'unknown')
+                features.extend(gj['features'])
+            if first_name is None:
+                first_name = name
+        return features, first_name
+
+    def profile_report(self):
+        """
+        将当前计数写入 self.profiler，返回其 report()（阶段耗时 + 计数），未设置 profiler 时阶段为空。
+        """
+        counters = {
+            'features': self.feature_count,
+            'vertices': self.vertex_count,
+            'removed_vertices': self.removed_vertices,
+            'nodes': len(self.node_list),
+            'dedup_hits': self.node_registry.hits,
+            'lines': len(self.line_list),
+            'polygons': len(self.polygon_list),
+            'tokens': self.token_count,
+        }
+        for name, value in counters.items():
+            self.profiler.set_counter(name, value)
+        report = self.profiler.report()
+        report['counters'].update(counters)
+        return report
+
+    def _merge_existing_output(self, output_path, new_nuscenes_map):
+        """
+        输出文件已存在时读取并与 new_nuscenes_map 合并，否则直接返回 new_nuscenes_map。
+        """
         # 检查输出文件是否存在
         if os.path.exists(output_path):
             try:
@@ -423,48 +629,121 @@ class Geojson2Nuscenesjson:
             combined_map = self.merge_maps(existing_map, new_nuscenes_map)
         else:
             combined_map = new_nuscenes_map
+        return combined_map
+
+    def save(self, output_path, compact=False, float_precision=None, fast_encoder=False):
+        """
+        组合当前已转换的所有图层并写入 output_path。
+        如果输出文件已存在，则读取一次并将新的内容合并进去（包括 canvas_edge 一致性检查）。
+        参数:
+        - compact / float_precision / fast_encoder: 输出格式，见 nuscenes_map_writer.write_nuscenes_map
+        """
+        # 组合新的NuScenesMap JSON结构
+        with self.profiler.stage('assemble'):
+            new_nuscenes_map = self.assemble_nuscenes_map()
 
-        # 写入输出JSON文件
-        with open(output_path, 'w') as f:
-            json.dump(combined_map, f, indent=4)
+        with self.profiler.stage('merge'):
+            combined_map = self._merge_existing_output(output_path, new_nuscenes_map)
+
+        # 流式写入输出JSON文件
+        with self.profiler.stage('dump'):
+            write_nuscenes_map(combined_map, output_path, compact=compact,
+                               float_precision=float_precision, fast_encoder=fast_encoder)
 
         print(f"Conversion complete. NuScenesMap JSON saved to {output_path}")
 
-def load_yaml(file_path):
+    def convert(self, geojson_path, output_path, stream=False,
+                compact=False, float_precision=None, fast_encoder=False):
+        """
+        执行从GeoJSON到NuScenesMap JSON的转换流程。
+        如果输出文件已存在，则将新的内容添加到现有内容中。
+        参数见 add_layer 和 save。
+        """
+        self.add_layer(geojson_path, stream=stream)
+        self.save(output_path, compact=compact, float_precision=float_precision, fast_encoder=fast_encoder)
+
+    def convert_layers(self, geojson_paths, output_path, stream=False,
+                       compact=False, float_precision=None, fast_encoder=False):
+        """
+        一次转换多个语义图层（如 road_divider, lane_divider, road_segment, lane, ped_crossing 各一个 GeoJSON）。
+        所有图层共享同一个节点注册表，在内存中组合成一张地图后只读写输出文件一次，
+        避免逐个 convert 时每个图层都重新读取、重写整个输出文件。
+        """
+        for geojson_path in geojson_paths:
+            self.add_layer(geojson_path, stream=stream)
+        self.save(output_path, compact=compact, float_precision=float_precision, fast_encoder=fast_encoder)
+
+
+def make_converter(job, meta, layer_index=0):
     """
-    读取 YAML 配置文件
+    按 batch_convert 清单中 job 的写法（is_ros、axis_mapping、node_tolerance、token_factory 等，均可省略）
+    与 map_meta.load_map_meta 读取的地图信息构造转换器。
+    参数:
+    - layer_index: 图层序号。counter 模式下每个图层在各自的子进程中计数，用 (token_seed, 图层序号) 区分，避免 token 重复
     """
-    with open(file_path, 'r', encoding='utf-8') as file:
-        config = yaml.safe_load(file)
-    return config
+    return Geojson2Nuscenesjson(
+        resolution=meta['resolution'],
+        origin=meta['origin'],
+        image_height=meta['image_height'],
+        image_width=meta['image_width'],
+        is_ros=job.get('is_ros', True),
+        axis_mapping=tuple(job.get('axis_mapping', (0, 0))),
+        node_tolerance=job.get('node_tolerance', 0.0),
+        token_factory=job.get('token_factory', 'uuid4'),
+        token_seed=(job.get('token_seed', 0), layer_index),
+        simplify_tolerance=job.get('simplify_tolerance', 0.0),
+        resample_spacing=job.get('resample_spacing'),
+        profiler=PipelineProfiler() if job.get('profile') else None,
+    )
+
+
+def prepare_output(output_path, template=None, merge_existing=False):
+    """
+    转换前准备输出文件。save / merge_map_files 会与已存在的输出合并，因此默认（与原脚本 is_merge_diff_geojson=False 相同）
+    先删除上一次的输出，给出 template 时再用模板覆盖，重复运行得到相同的结果。
+    merge_existing=True 时保留已有的输出，新的内容追加进去；输出不存在时才复制模板。
+    """
+    if os.path.exists(output_path):
+        if merge_existing:
+            return
+        os.remove(output_path)
+    if template:
+        shutil.copy(template, output_path)
+
+
+def merge_map_files(input_paths, output_path, compact=False, float_precision=None, fast_encoder=False):
+    """
+    合并多张已转换的 NuScenesMap JSON（例如分区域分别转换的同一张地图），节点按坐标去重。
+    各输入的 canvas_edge 必须一致，其余非几何字段（version 等）取第一张出现该字段的地图中的值。
+    output_path 已存在时（例如先复制了模板）与 save 相同，合并进去；需要重新生成时先调用 prepare_output。
+    """
+    # 不做坐标变换，只借用 merge_layer_map 的节点去重
+    converter = Geojson2Nuscenesjson(resolution=1.0, origin=(0.0, 0.0, 0.0), image_height=0, image_width=0)
+    geometry_keys = {'node', 'line', 'polygon'} | set(converter.nuscenes_semantic_layers)
+    extra = {}
+    for input_path in input_paths:
+        with open(input_path, 'r') as f:
+            layer_map = json.load(f)
+        converter.merge_layer_map(layer_map)
+        for key, value in layer_map.items():
+            if key in geometry_keys:
+                continue
+            if key == 'canvas_edge' and key in extra and extra[key] != value:
+                raise ValueError(f"Canvas edge mismatch: {input_path} {value} vs {extra[key]}")
+            extra.setdefault(key, value)
+
+    new_nuscenes_map = converter.assemble_nuscenes_map()
+    del new_nuscenes_map['canvas_edge']
+    new_nuscenes_map.update(extra)
+    combined_map = converter._merge_existing_output(output_path, new_nuscenes_map)
+    write_nuscenes_map(combined_map, output_path, compact=compact,
+                       float_precision=float_precision, fast_encoder=fast_encoder)
+    print(f"Merged {len(input_paths)} maps into {output_path}")
+
 
 # 示例使用
-if __name__ == "__main__":    
-    # 加载 YAML 配置文件
-    config = load_yaml(ros_yaml_input)
-    
-    # 提取所需的信息
-    image_path = config['image']
-    resolution = config['resolution']
-    origin = config['origin']  # origin 是一个列表 [x, y, z]
-    negate = config.get('negate', 0)  # 如果 negate 不存在，默认为 0
-    occupied_thresh = config.get('occupied_thresh', 0.65)  # 默认阈值
-    free_thresh = config.get('free_thresh', 0.196)  # 默认阈值
-    print(f"*********resolution={resolution}, origin={origin}, negate={negate}, occupied_thresh={occupied_thresh}*******")
-
-    # 读取图像以获取图像高度（像素数）
-    try:
-        with Image.open(image_path) as img:
-            image_width, image_height = img.size
-            print(f"图像宽度: {image_width}px, 图像高度: {image_height}px")
-    except Exception as e:
-        print(f"无法读取图像文件: {e}")
-        exit(1)
-    
-    converter = Geojson2Nuscenesjson(
-        resolution=resolution,
-        origin=origin,
-        image_height=image_height,
-        image_width=image_width
-    )
-    converter.convert(geojson_input, nuscenes_output)
+if __name__ == "__main__":
+    # 等价于 python src/cli.py convert <map_yaml> <geojson ...> -o output_nuscenes_map.json --template template/unused_template.json
+    import sys
+    from cli import main
+    main(['convert'] + sys.argv[1:])
@@ -0,0 +1,196 @@
+"""
+多地图、多语义图层的并行批量转换。
+清单（yaml 或 json）中每个 job 对应一张地图:
+
+    jobs:
+      - name: AIR_F11
+        map_yaml: resource/AIR_F11/AIR_F11.yaml
+        layers:
+          - resource/AIR_F11/road_divider.geojson
+          - resource/AIR_F11/road_segment.geojson
+          - [resource/AIR_F11/road_segment_out.geojson, resource/AIR_F11/road_segment_holes.geojson]  # 外轮廓与孔洞分开标注时自动嵌套
+          - {boundary: [resource/AIR_F11/road_segment.geojson]}  # 由多边形边界生成 road_divider
+        output: maps/AIR_F11/AIR_F11.json
+        axis_mapping: [155, 155]          # 可选，默认 (0, 0)
+        is_ros: true                      # 可选，默认 true
+        node_tolerance: 0.0               # 可选
+        simplify_tolerance: 0.05          # 可选，生成节点前的 Douglas-Peucker 简化容差（米）
+        resample_spacing: 1.0             # 可选，折线按固定间距（米）重采样
+        profile: true                     # 可选，记录各阶段耗时与计数（见 pipeline_profiler.py），写入结果的 profile 字段
+        token_factory: content            # 可选，uuid4 / content / counter，见 token_factory.py
+        template: template/unused_template.json  # 可选，先用模板覆盖 output 再合并（与脚本 is_merge_diff_geojson=False 相同）
+        merge_existing: false             # 可选，为 true 时与已存在的 output 合并；默认每次重新生成 output，重复运行结果相同
+        cache_dir: .layer_cache           # 可选，按内容哈希缓存每个图层的转换结果，未修改的图层不再重新转换（见 layer_cache.py）
+        cache_max_mb: 1024                # 可选，缓存总大小上限
+
+每个图层在进程池中单独转换，父进程按清单顺序（与完成顺序无关）合并各图层并写出，保证结果确定。
+某个 job 失败不影响其他 job，最后打印每个 job 的耗时。
+
+用法:
+    python src/batch_convert.py manifest.yaml --workers 8
+    python src/cli.py batch manifest.yaml --workers 8
+"""
+import json
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+
+from QGISMap2NuscenesMap import CONVERTER_VERSION, make_converter, prepare_output
+from layer_cache import LayerCache
+from map_meta import load_map_meta, load_yaml
+from pipeline_profiler import merge_reports
+
+
+def _layer_params(job, meta, layer_index):
+    """影响单个图层转换结果的全部参数，作为 layer_cache 的缓存键。"""
+    token_factory = job.get('token_factory', 'uuid4')
+    return {
+        'converter_version': CONVERTER_VERSION,
+        'resolution': meta['resolution'],
+        'origin': [float(v) for v in meta['origin']],
+        'image_height': meta['image_height'],
+        'image_width': meta['image_width'],
+        'is_ros': job.get('is_ros', True),
+        'axis_mapping': [float(v) for v in job.get('axis_mapping', (0, 0))],
+        'node_tolerance': job.get('node_tolerance', 0.0),
+        'simplify_tolerance': job.get('simplify_tolerance', 0.0),
+        'resample_spacing': job.get('resample_spacing'),
+        'token_factory': token_factory,
+        # 只有 counter 模式的 token 取决于 seed 与图层序号
+        'token_seed': [job.get('token_seed', 0), layer_index] if token_factory == 'counter' else None,
+    }
+
+
+def _layer_cache(job):
+    if not job.get('cache_dir'):
+        return None
+    return LayerCache(job['cache_dir'], max_bytes=int(job.get('cache_max_mb', 1024) * (1 << 20)))
+
+
+def convert_layer(job, meta, layer_index, layer_path):
+    """
+    转换单个图层（run_batch 中在子进程执行），返回 (layer_map, 耗时秒数, 计时报告, 是否命中缓存)。
+    job 给出 cache_dir 时先查缓存，命中则不再转换。
+    """
+    start = time.perf_counter()
+    converter = make_converter(job, meta, layer_index)
+    cache = _layer_cache(job)
+    if cache is not None:
+        with converter.profiler.stage('cache'):
+            key = cache.key(layer_path, _layer_params(job, meta, layer_index))
+            layer_map = cache.get(layer_path, key)
+        if layer_map is not None:
+            return layer_map, time.perf_counter() - start, converter.profile_report(), True
+
+    if isinstance(layer_path, dict):
+        converter.add_boundary_layer(layer_path['boundary'], stream=job.get('stream', False))
+    elif isinstance(layer_path, (list, tuple)):
+        converter.add_nested_layers(layer_path, stream=job.get('stream', False))
+    else:
+        converter.add_layer(layer_path, stream=job.get('stream', False))
+    with converter.profiler.stage('assemble'):
+        layer_map = converter.assemble_nuscenes_map()
+    if cache is not None:
+        with converter.profiler.stage('cache'):
+            cache.put(layer_path, key, layer_map)
+    return layer_map, time.perf_counter() - start, converter.profile_report(), False
+
+
+def assemble_job(job, meta, layer_maps):
+    """
+    按清单顺序合并各图层的 convert_layer 结果并写出（run_batch 中在父进程执行），返回计时报告。
+    output 先按 template / merge_existing 重置（见 prepare_output），重复运行同一清单不会重复追加记录。
+    """
+    converter = make_converter(job, meta)
+    output = job['output']
+    prepare_output(output, job.get('template'), job.get('merge_existing', False))
+    with converter.profiler.stage('merge_layers'):
+        for layer_map in layer_maps:
+            converter.merge_layer_map(layer_map)
+    converter.save(output, compact=job.get('compact', False),
+                   float_precision=job.get('float_precision'), fast_encoder=job.get('fast_encoder', False))
+    return converter.profiler.report()
+
+
+def run_batch(jobs, workers=None):
+    """
+    并行执行所有 job，返回每个 job 的结果字典列表（name, ok, seconds, layer_seconds, merge_seconds, cached_layers, error, profile）。
+    seconds 为各图层转换耗时（子进程内）与父进程合并写出耗时之和；
+    profile 为各图层与合并阶段的计时报告之和（job 设置 profile: true 时才有阶段耗时）。
+    """
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # 先把所有 job 的所有图层都提交到进程池
+        submitted = []
+        for index, job in enumerate(jobs):
+            name = job.get('name', job['output'])
+            try:
+                meta = load_map_meta(job['map_yaml'])
+                futures = [pool.submit(convert_layer, job, meta, layer_index, layer)
+                           for layer_index, layer in enumerate(job['layers'])]
+                submitted.append((name, job, meta, futures, None))
+            except Exception:
+                submitted.append((name, job, None, [], traceback.format_exc()))
+
+        # 再按清单顺序收集并合并
+        for name, job, meta, futures, error in submitted:
+            layer_seconds = []
+            reports = []
+            cached_layers = 0
+            merge_seconds = 0.0
+            if error is None:
+                try:
+                    layer_maps = []
+                    for future in futures:
+                        layer_map, seconds, report, cached = future.result()
+                        cached_layers += cached
+                        layer_maps.append(layer_map)
+                        layer_seconds.append(seconds)
+                        reports.append(report)
+                    start = time.perf_counter()
+                    reports.append(assemble_job(job, meta, layer_maps))
+                    merge_seconds = time.perf_counter() - start
+                except Exception:
+                    error = traceback.format_exc()
+            results.append({
+                'name': name,
+                'ok': error is None,
+                'seconds': sum(layer_seconds) + merge_seconds,
+                'layer_seconds': layer_seconds,
+                'merge_seconds': merge_seconds,
+                'cached_layers': cached_layers,
+                'error': error,
+                'profile': merge_reports(reports),
+            })
+    return results
+
+
+def print_report(results):
+    print(f"{'job':<24} {'status':<8} {'seconds':>10} {'merge':>10} {'layers':>7} {'cached':>7}")
+    for result in results:
+        status = 'ok' if result['ok'] else 'FAILED'
+        print(f"{result['name']:<24} {status:<8} {result['seconds']:>10.2f} "
+              f"{result['merge_seconds']:>10.2f} {len(result['layer_seconds']):>7} {result['cached_layers']:>7}")
+    for result in results:
+        if not result['ok']:
+            print(f"\n[{result['name']}] 失败:\n{result['error']}")
+
+
+def run_manifest(manifest_path, workers=None, report_json=None):
+    """
+    执行清单中的所有 job 并打印报告，返回是否全部成功。
+    """
+    manifest = load_yaml(manifest_path)
+    results = run_batch(manifest['jobs'], workers=workers)
+    print_report(results)
+    if report_json:
+        with open(report_json, 'w') as f:
+            json.dump(results, f, indent=4)
+    return all(result['ok'] for result in results)
+
+
+if __name__ == '__main__':
+    # 等价于 python src/cli.py batch manifest.yaml --workers 8
+    import sys
+    from cli import main
+    main(['batch'] + sys.argv[1:])
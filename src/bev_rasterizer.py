@@ -0,0 +1,257 @@
+"""
+将生成的 NuScenesMap 画回占据栅格图像（BEV），用于核对转换结果与生成训练用的语义 mask。
+- 世界坐标 -> 图像像素使用 Geojson2Nuscenesjson.affine_matrix（transform_point 的等价仿射）的逆，
+  构造时对全部节点向量化变换一次并缓存
+- 折线层的所有折线用一次 cv2.polylines 绘制；多边形逐个在外包框大小的临时 mask 上填充外环、擦除自身孔洞后
+  并入整层 mask（重叠的多边形取并集，孔洞只作用于所属多边形）
+- 以自车为中心的 patch 由整图 mask 经一次 cv2.warpAffine（最近邻）裁剪得到，各层按位打包到同一张图中一起变换
+
+用法:
+    python src/bev_rasterizer.py maps/AIR_F11/AIR_F11.json resource/AIR_F11/AIR_F11.yaml --out-dir bev/AIR_F11
+"""
+import os
+
+import cv2
+import numpy as np
+
+from map_query import LINE_LAYERS, POLYGON_LAYERS
+
+# 叠加图中各层的颜色（RGB）
+LAYER_COLORS = {
+    'drivable_area': (166, 206, 227),
+    'road_segment': (31, 120, 180),
+    'road_block': (178, 223, 138),
+    'lane': (51, 160, 44),
+    'ped_crossing': (251, 154, 153),
+    'walkway': (227, 26, 28),
+    'stop_line': (253, 191, 111),
+    'carpark_area': (255, 127, 0),
+    'lane_connector': (202, 178, 214),
+    'road_divider': (255, 0, 0),
+    'lane_divider': (0, 0, 255),
+    'traffic_light': (106, 61, 154),
+}
+
+# cv2 绘制时的亚像素精度（坐标左移的位数）
+_SHIFT = 4
+
+
+def world_to_pixel_matrix(converter):
+    """
+    由转换器的 affine_matrix（QGIS像素 -> 世界坐标）求 世界坐标 -> 图像像素(col, row) 的 3x3 矩阵。
+    QGIS 坐标 x 向右、y 向下为负，像素 (col, row) 的中心位于 QGIS 坐标 (col + 0.5, -(row + 0.5))。
+    """
+    qgis_to_pixel = np.array([[1.0, 0.0, -0.5],
+                              [0.0, -1.0, -0.5],
+                              [0.0, 0.0, 1.0]])
+    return qgis_to_pixel @ np.linalg.inv(converter.affine_matrix)
+
+
+class BEVRasterizer:
+    """
+    参数:
+    - nuscenes_map: NuScenesMap 字典
+    - converter: 生成该地图时使用的 Geojson2Nuscenesjson（只用到 affine_matrix、image_height、image_width）
+    - layer_names: 需要绘制的语义层，默认为地图中存在的所有几何层
+    - line_thickness: 折线层的线宽（像素）
+    """
+
+    def __init__(self, nuscenes_map, converter, layer_names=None, line_thickness=1):
+        if layer_names is None:
+            layer_names = [name for name in POLYGON_LAYERS + LINE_LAYERS if name in nuscenes_map]
+        if len(layer_names) > 16:
+            raise ValueError("最多支持 16 个语义层")
+        self.layer_names = tuple(layer_names)
+        self.image_height = converter.image_height
+        self.image_width = converter.image_width
+        self.line_thickness = line_thickness
+        self.world_to_pixel = world_to_pixel_matrix(converter)
+
+        # 全部节点一次性变换到像素坐标，后续按下标取用
+        nodes = nuscenes_map.get('node', [])
+        node_index = {}
+        for i, node in enumerate(nodes):
+            node_index.setdefault(node['token'], i)
+        world = np.array([(node['x'], node['y']) for node in nodes], dtype=np.float64).reshape(-1, 2)
+        pixels = world @ self.world_to_pixel[:2, :2].T + self.world_to_pixel[:2, 2]
+        fixed = np.round(pixels * (1 << _SHIFT))
+        # 模板中 'unused' 之类的占位节点坐标极大，超出 int32 范围的点不参与绘制
+        self._valid = np.all(np.abs(fixed) < 2 ** 31 - 1, axis=1)
+        self._pixels = np.where(self._valid[:, None], fixed, 0).astype(np.int32)
+
+        def ring(tokens):
+            indexes = [node_index[t] for t in tokens if t in node_index]
+            if not indexes or not self._valid[indexes].all():
+                return None
+            return self._pixels[indexes]
+
+        lines = {line['token']: line for line in nuscenes_map.get('line', [])}
+        polygons = {polygon['token']: polygon for polygon in nuscenes_map.get('polygon', [])}
+        self._layers = {}
+        for name in self.layer_names:
+            shapes = []
+            for record in nuscenes_map.get(name, []):
+                if name in LINE_LAYERS:
+                    line = lines.get(record.get('line_token'))
+                    pts = ring(line['node_tokens']) if line else None
+                    if pts is not None and len(pts) > 1:
+                        shapes.append(pts)
+                else:
+                    polygon = polygons.get(record.get('polygon_token'))
+                    exterior = ring(polygon['exterior_node_tokens']) if polygon else None
+                    if exterior is not None and len(exterior) > 2:
+                        holes = [h for h in (ring(hole) for hole in polygon['holes']) if h is not None and len(h) > 2]
+                        shapes.append((exterior, holes))
+            self._layers[name] = shapes
+        self._masks = None
+        self._packed = None
+
+    @classmethod
+    def from_files(cls, map_json, map_yaml, is_ros=True, axis_mapping=(0, 0), **kwargs):
+        """由地图 JSON 与 ROS yaml 构造。"""
+        import json
+        from map_meta import load_map_meta
+        from QGISMap2NuscenesMap import make_converter
+
+        with open(map_json, 'r') as f:
+            nuscenes_map = json.load(f)
+        meta = load_map_meta(map_yaml)
+        converter = make_converter({'is_ros': is_ros, 'axis_mapping': axis_mapping}, meta)
+        rasterizer = cls(nuscenes_map, converter, **kwargs)
+        rasterizer.image_path = meta['image_path']
+        return rasterizer
+
+    def world_to_pixels(self, points):
+        """(N, 2) 世界坐标 -> (N, 2) 像素坐标 (col, row)。"""
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        return points @ self.world_to_pixel[:2, :2].T + self.world_to_pixel[:2, 2]
+
+    def _draw_layer(self, name, canvas):
+        shapes = self._layers[name]
+        if name in LINE_LAYERS:
+            if shapes:
+                cv2.polylines(canvas, shapes, False, 1, self.line_thickness, cv2.LINE_8, _SHIFT)
+            return
+        # 同一次 fillPoly 中的多个轮廓按奇偶规则填充，重叠的多边形会互相抵消，孔洞也会擦掉其他多边形，
+        # 因此每个多边形在其外包框大小的临时 mask 上单独绘制（外环填 1、自己的孔洞填 0），再并入整层 mask
+        height, width = canvas.shape
+        for exterior, holes in shapes:
+            col0, row0 = np.maximum(exterior.min(axis=0) >> _SHIFT, 0)
+            col1, row1 = np.minimum((exterior.max(axis=0) >> _SHIFT) + 2, (width, height))
+            if col1 <= col0 or row1 <= row0:
+                continue
+            origin = np.array([col0, row0], dtype=np.int32) << _SHIFT
+            scratch = np.zeros((row1 - row0, col1 - col0), dtype=np.uint8)
+            cv2.fillPoly(scratch, [exterior - origin], 1, cv2.LINE_8, _SHIFT)
+            if holes:
+                cv2.fillPoly(scratch, [hole - origin for hole in holes], 0, cv2.LINE_8, _SHIFT)
+            canvas[row0:row1, col0:col1] |= scratch
+
+    def render_masks(self):
+        """
+        整图 mask: {layer_name: (image_height, image_width) uint8，0/1}。结果缓存。
+        """
+        if self._masks is None:
+            self._masks = {}
+            for name in self.layer_names:
+                canvas = np.zeros((self.image_height, self.image_width), dtype=np.uint8)
+                self._draw_layer(name, canvas)
+                self._masks[name] = canvas
+        return self._masks
+
+    def _packed_masks(self):
+        # 各层按位打包，patch 裁剪时只需对一张图做一次 warpAffine
+        if self._packed is None:
+            dtype = np.uint8 if len(self.layer_names) <= 8 else np.uint16
+            packed = np.zeros((self.image_height, self.image_width), dtype=dtype)
+            for bit, mask in enumerate(self.render_masks().values()):
+                packed |= (mask.astype(dtype) << bit)
+            self._packed = packed
+        return self._packed
+
+    def patch_matrices(self, centers, yaws=None, patch_size=(51.2, 51.2), canvas_size=(256, 256)):
+        """
+        每个 patch 的 2x3 矩阵（patch 像素 -> 整图像素），供 cv2.warpAffine(..., WARP_INVERSE_MAP) 使用。
+        参数:
+        - centers: (N, 2) patch 中心的世界坐标
+        - yaws: (N,) patch 朝向（弧度，自车航向），patch 的 +x（向右）对齐该方向，第 0 行对应 patch 的 +y 边
+        - patch_size: (height, width) 米
+        - canvas_size: (height, width) 像素
+        """
+        centers = np.asarray(centers, dtype=np.float64).reshape(-1, 2)
+        yaws = np.zeros(len(centers)) if yaws is None else np.broadcast_to(np.asarray(yaws, dtype=np.float64), (len(centers),))
+        patch_h, patch_w = patch_size
+        canvas_h, canvas_w = canvas_size
+
+        # patch 像素 (u, v) -> patch 局部坐标（米）
+        local_from_canvas = np.array([[patch_w / canvas_w, 0.0, (0.5 - canvas_w / 2) * patch_w / canvas_w],
+                                      [0.0, -patch_h / canvas_h, (canvas_h / 2 - 0.5) * patch_h / canvas_h],
+                                      [0.0, 0.0, 1.0]])
+        world_from_local = np.zeros((len(centers), 3, 3))
+        world_from_local[:, 0, 0] = np.cos(yaws)
+        world_from_local[:, 0, 1] = -np.sin(yaws)
+        world_from_local[:, 1, 0] = np.sin(yaws)
+        world_from_local[:, 1, 1] = np.cos(yaws)
+        world_from_local[:, :2, 2] = centers
+        world_from_local[:, 2, 2] = 1.0
+        return (self.world_to_pixel @ world_from_local @ local_from_canvas)[:, :2, :]
+
+    def render_patches(self, centers, yaws=None, patch_size=(51.2, 51.2), canvas_size=(256, 256)):
+        """
+        以自车为中心的 patch mask，返回 (N, L, canvas_h, canvas_w) uint8，L 的顺序同 self.layer_names。
+        """
+        packed = self._packed_masks()
+        matrices = self.patch_matrices(centers, yaws, patch_size, canvas_size)
+        canvas_h, canvas_w = canvas_size
+        bits = np.left_shift(1, np.arange(len(self.layer_names))).astype(packed.dtype)
+        out = np.empty((len(matrices), len(self.layer_names), canvas_h, canvas_w), dtype=np.uint8)
+        for i, matrix in enumerate(matrices):
+            patch = cv2.warpAffine(packed, matrix, (canvas_w, canvas_h),
+                                   flags=cv2.INTER_NEAREST | cv2.WARP_INVERSE_MAP,
+                                   borderMode=cv2.BORDER_CONSTANT, borderValue=0)
+            out[i] = (patch[None, :, :] & bits[:, None, None]) != 0
+        return out
+
+    def render_overlay(self, background=None, alpha=0.5):
+        """
+        在占据栅格图像上叠加各层颜色，返回 (H, W, 3) uint8 RGB。
+        参数:
+        - background: 图像路径或数组，默认使用 from_files 时 yaml 中的 image，没有则为白底
+        """
+        if background is None:
+            background = getattr(self, 'image_path', None)
+        if isinstance(background, str):
+            image = cv2.imread(background, cv2.IMREAD_COLOR)
+            if image is None:
+                raise FileNotFoundError(f"无法读取背景图像: {background}")
+            background = image[:, :, ::-1]
+        if background is None:
+            overlay = np.full((self.image_height, self.image_width, 3), 255, dtype=np.uint8)
+        elif background.ndim == 2:
+            overlay = np.repeat(background[:, :, None], 3, axis=2)
+        else:
+            overlay = background[:, :, :3].copy()
+
+        for name, mask in self.render_masks().items():
+            color = np.array(LAYER_COLORS.get(name, (0, 0, 0)), dtype=np.float64)
+            selected = mask.astype(bool)
+            if name in LINE_LAYERS:
+                overlay[selected] = color
+            else:
+                overlay[selected] = (overlay[selected] * (1 - alpha) + color * alpha).astype(np.uint8)
+        return overlay
+
+    def save(self, out_dir, overlay=True):
+        """每层 mask 写为 <layer>.png（0/255），叠加图写为 overlay.png。"""
+        os.makedirs(out_dir, exist_ok=True)
+        for name, mask in self.render_masks().items():
+            cv2.imwrite(os.path.join(out_dir, f'{name}.png'), mask * 255)
+        if overlay:
+            cv2.imwrite(os.path.join(out_dir, 'overlay.png'), self.render_overlay()[:, :, ::-1])
+
+
+if __name__ == '__main__':
+    # 等价于 python src/cli.py render <map_json> <map_yaml> --out-dir bev
+    import sys
+    from cli import main
+    main(['render'] + sys.argv[1:])
@@ -0,0 +1,246 @@
+"""
+3D 框在 ego 坐标系与世界坐标系之间的批量刚体变换（纯 NumPy 向量化，不逐框调用 scipy / pyquaternion）。
+
+约定:
+- 四元数统一为 nuScenes 的 [w, x, y, z]
+- 欧拉角为弧度，seq 沿用 scipy 的写法: 小写为外旋（绕固定轴），大写为内旋（绕旋转后的轴）
+  - 默认 'xyz': [roll, pitch, yaw]，R = Rz(yaw) · Ry(pitch) · Rx(roll)，与 tools/lidar_bbox2world_bbox.py
+    （scipy from_euler('xyz') / as_euler('xyz')）相同
+  - 'XYZ': q = qx · qy · qz，与 tools/lidar_bbox2world_bbox_pyquternion_version.py 的构造方式相同；
+    该脚本输出的 yaw_pitch_roll（pyquaternion 0.9.x）逆序后也是这一顺序，而不是文档所写的 ZYX
+  - 两者只有一个角非零（通常只有航向角）时结果一致
+- 框的旋转可以是 (N,) 航向角、(N, 3) 欧拉角或 (N, 4) 四元数
+- ego 位姿为 (M, 3) 平移与 (M, 4) 四元数，pose_index (N,) 给出每个框对应的位姿；M 为 1 时所有框共用
+
+变换: world = t_ego + q_ego ⊗ box，q_world = q_ego · q_box；inverse=True 时为其逆变换（世界 -> ego）。
+
+用法:
+    python src/box_transform.py dataset_dir -o sample_annotation_world.json   # 由 ego 坐标系转为世界坐标系
+    python src/box_transform.py dataset_dir --to-ego -o sample_annotation_ego.json
+    python src/box_transform.py dataset_dir --in-place                         # 覆盖 sample_annotation.json
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+
+_AXES = {'x': 0, 'y': 1, 'z': 2}
+
+
+def quat_multiply(q1, q2):
+    """四元数乘积 q1 · q2，形状 (..., 4) 按广播规则。"""
+    w1, x1, y1, z1 = np.moveaxis(np.asarray(q1, dtype=np.float64), -1, 0)
+    w2, x2, y2, z2 = np.moveaxis(np.asarray(q2, dtype=np.float64), -1, 0)
+    return np.stack([
+        w1 * w2 - x1 * x2 - y1 * y2 - z1 * z2,
+        w1 * x2 + x1 * w2 + y1 * z2 - z1 * y2,
+        w1 * y2 - x1 * z2 + y1 * w2 + z1 * x2,
+        w1 * z2 + x1 * y2 - y1 * x2 + z1 * w2,
+    ], axis=-1)
+
+
+def quat_conjugate(q):
+    q = np.array(q, dtype=np.float64)
+    q[..., 1:] *= -1
+    return q
+
+
+def quat_normalize(q):
+    q = np.asarray(q, dtype=np.float64)
+    return q / np.linalg.norm(q, axis=-1, keepdims=True)
+
+
+def quat_rotate(q, v):
+    """用单位四元数 q (..., 4) 旋转向量 v (..., 3): v + 2w(u×v) + 2u×(u×v)。"""
+    q = np.asarray(q, dtype=np.float64)
+    v = np.asarray(v, dtype=np.float64)
+    u = q[..., 1:]
+    t = 2 * np.cross(u, v)
+    return v + q[..., :1] * t + np.cross(u, t)
+
+
+def euler_to_quat(angles, seq='xyz'):
+    """
+    欧拉角 (N, 3)（弧度，顺序与 seq 一致）-> (N, 4) [w, x, y, z]。
+    seq 为 3 个字母，全小写为外旋，全大写为内旋（与 scipy Rotation.from_euler 相同）。
+    """
+    if len(seq) != 3 or not (seq.islower() or seq.isupper()) or set(seq.lower()) - set(_AXES):
+        raise ValueError(f"不支持的欧拉角顺序: {seq!r}")
+    angles = np.asarray(angles, dtype=np.float64).reshape(-1, 3)
+    elementary = []
+    for i, axis in enumerate(seq.lower()):
+        q = np.zeros((len(angles), 4), dtype=np.float64)
+        q[:, 0] = np.cos(angles[:, i] / 2)
+        q[:, 1 + _AXES[axis]] = np.sin(angles[:, i] / 2)
+        elementary.append(q)
+    # 外旋依次左乘，内旋依次右乘
+    if seq.islower():
+        elementary.reverse()
+    return quat_multiply(quat_multiply(elementary[0], elementary[1]), elementary[2])
+
+
+def quat_to_euler(q, seq='xyz'):
+    """
+    (N, 4) [w, x, y, z] -> (N, 3) 欧拉角（弧度），与 scipy as_euler(seq) 相同，中间的角在 [-90°, 90°]:
+    - 'xyz': 外旋 [roll, pitch, yaw]，R = Rz · Ry · Rx
+    - 'XYZ': 内旋，q = qx · qy · qz；pyquaternion 的 yaw_pitch_roll 实际就是该顺序的逆序
+    中间的角为 ±90° 时另外两个角不唯一。
+    """
+    w, x, y, z = np.moveaxis(quat_normalize(q), -1, 0)
+    if seq == 'xyz':
+        first = np.arctan2(2 * (w * x + y * z), 1 - 2 * (x * x + y * y))
+        second = np.arcsin(np.clip(2 * (w * y - z * x), -1.0, 1.0))
+        third = np.arctan2(2 * (w * z + x * y), 1 - 2 * (y * y + z * z))
+    elif seq == 'XYZ':
+        first = np.arctan2(2 * (w * x - y * z), 1 - 2 * (x * x + y * y))
+        second = np.arcsin(np.clip(2 * (w * y + x * z), -1.0, 1.0))
+        third = np.arctan2(2 * (w * z - x * y), 1 - 2 * (y * y + z * z))
+    else:
+        raise ValueError(f"quat_to_euler 只支持 'xyz' 与 'XYZ'，得到 {seq!r}")
+    return np.stack([first, second, third], axis=-1)
+
+
+def as_quaternion(rotations, seq='xyz', count=None):
+    """
+    框的旋转统一为单位四元数 (N, 4):
+    - (N,) 航向角（绕 z 轴）
+    - (N, 3) 欧拉角，顺序见 seq
+    - (N, 4) [w, x, y, z] 四元数
+    count: 框数。给出时检查旋转数与框数一致；count 为 1 时长度为 3 / 4 的一维输入视为单个框的欧拉角 / 四元数
+    """
+    rotations = np.asarray(rotations, dtype=np.float64)
+    if rotations.ndim == 1 and count is not None and len(rotations) != count:
+        if count != 1 or len(rotations) not in (3, 4):
+            raise ValueError(f"{len(rotations)} 个旋转值无法与 {count} 个框对应")
+        rotations = rotations.reshape(1, -1)
+    if rotations.ndim == 1:
+        quat = np.zeros((len(rotations), 4), dtype=np.float64)
+        quat[:, 0] = np.cos(rotations / 2)
+        quat[:, 3] = np.sin(rotations / 2)
+        return quat
+    if rotations.shape[-1] == 3:
+        return euler_to_quat(rotations, seq)
+    if rotations.shape[-1] == 4:
+        return quat_normalize(rotations)
+    raise ValueError(f"旋转的形状应为 (N,)、(N, 3) 或 (N, 4)，得到 {rotations.shape}")
+
+
+def transform_boxes(translations, rotations, ego_translations, ego_rotations, pose_index=None, seq='xyz',
+                    inverse=False):
+    """
+    批量将框从 ego 坐标系变换到世界坐标系（inverse=True 时从世界坐标系变换到 ego 坐标系）。
+    参数:
+    - translations: (N, 3) 框中心
+    - rotations: (N,) / (N, 3) / (N, 4)，见 as_quaternion
+    - ego_translations: (M, 3)，ego_rotations: (M, 4) [w, x, y, z]
+    - pose_index: (N,) 每个框对应的位姿下标；为 None 时 M 必须为 1 或 N
+    返回:
+    - (N, 3) 平移与 (N, 4) 四元数 [w, x, y, z]（w >= 0）
+    """
+    translations = np.asarray(translations, dtype=np.float64).reshape(-1, 3)
+    box_quat = as_quaternion(rotations, seq, count=len(translations))
+    if len(box_quat) != len(translations):
+        raise ValueError(f"{len(box_quat)} 个旋转与 {len(translations)} 个框的数量不一致")
+    ego_t = np.asarray(ego_translations, dtype=np.float64).reshape(-1, 3)
+    ego_q = quat_normalize(np.asarray(ego_rotations, dtype=np.float64).reshape(-1, 4))
+    if pose_index is not None:
+        ego_t, ego_q = ego_t[pose_index], ego_q[pose_index]
+    elif len(ego_t) not in (1, len(translations)):
+        raise ValueError(f"{len(ego_t)} 个位姿无法与 {len(translations)} 个框对应，请给出 pose_index")
+
+    if inverse:
+        ego_inv = quat_conjugate(ego_q)
+        out_t = quat_rotate(ego_inv, translations - ego_t)
+        out_q = quat_multiply(ego_inv, box_quat)
+    else:
+        out_t = ego_t + quat_rotate(ego_q, translations)
+        out_q = quat_multiply(ego_q, box_quat)
+    # q 与 -q 表示同一旋转，统一取 w >= 0 便于比较与存储
+    out_q *= np.where(out_q[:, :1] < 0, -1.0, 1.0)
+    return out_t, out_q
+
+
+def annotation_pose_tokens(annotations, sample_data_table, channel='LIDAR_TOP'):
+    """
+    每条 sample_annotation 所在 sample 中 channel 关键帧 sample_data 的 ego_pose_token。
+    参数:
+    - sample_data_table: sample_data 的 TableIndex，需要 'sample_token' 索引
+    - channel: 按 filename 中包含的传感器名选择 sample_data
+    """
+    pose_of_sample = {}
+    tokens = []
+    for annotation in annotations:
+        sample_token = annotation['sample_token']
+        if sample_token not in pose_of_sample:
+            candidates = [sd for sd in sample_data_table.get_all('sample_token', sample_token)
+                          if channel in sd.get('filename', '')]
+            # 优先关键帧
+            candidates.sort(key=lambda sd: not sd.get('is_key_frame', True))
+            if not candidates:
+                raise KeyError(f"sample {sample_token} 中没有 {channel} 的 sample_data")
+            pose_of_sample[sample_token] = candidates[0]['ego_pose_token']
+        tokens.append(pose_of_sample[sample_token])
+    return tokens
+
+
+def transform_annotations(annotations, sample_data_table, ego_pose_table, inverse=False, seq='xyz',
+                          channel='LIDAR_TOP'):
+    """
+    批量变换 sample_annotation 表的 translation / rotation（原地修改，rotation 写为 [w, x, y, z]）。
+    每个 ego_pose 只取一次，所有框一次向量化变换。
+    参数:
+    - ego_pose_table: ego_pose 的 TableIndex，需要 'token' 索引
+    - inverse: False 为 ego -> 世界，True 为世界 -> ego
+    返回:
+    - 变换的记录数
+    """
+    if not annotations:
+        return 0
+    tokens = annotation_pose_tokens(annotations, sample_data_table, channel)
+    unique_tokens = list(dict.fromkeys(tokens))
+    pose_position = {token: i for i, token in enumerate(unique_tokens)}
+    poses = ego_pose_table.get_many('token', unique_tokens)
+    missing = [token for token, pose in zip(unique_tokens, poses) if pose is None]
+    if missing:
+        raise KeyError(f"找不到 ego_pose: {missing[:5]}{' ...' if len(missing) > 5 else ''}")
+
+    translations, rotations = transform_boxes(
+        [a['translation'] for a in annotations], [a['rotation'] for a in annotations],
+        [p['translation'] for p in poses], [p['rotation'] for p in poses],
+        pose_index=np.array([pose_position[token] for token in tokens], dtype=np.int64),
+        seq=seq, inverse=inverse,
+    )
+    for annotation, translation, rotation in zip(annotations, translations.tolist(), rotations.tolist()):
+        annotation['translation'] = translation
+        annotation['rotation'] = rotation
+    return len(annotations)
+
+
+if __name__ == '__main__':
+    from nuscenes_table_index import TableIndex
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('dataset_dir', help='包含 sample_annotation.json / sample_data.json / ego_pose.json 的目录')
+    parser.add_argument('--to-ego', action='store_true', help='由世界坐标系转为 ego 坐标系（默认相反）')
+    parser.add_argument('--seq', default='xyz', help="框旋转为欧拉角时的顺序，'xyz' 外旋 / 'XYZ' 内旋")
+    parser.add_argument('--channel', default='LIDAR_TOP')
+    parser.add_argument('-o', '--output', default=None, help='输出文件')
+    parser.add_argument('--in-place', action='store_true',
+                        help='直接覆盖 sample_annotation.json（再次运行会把框再变换一次）')
+    args = parser.parse_args()
+    if not args.output and not args.in_place:
+        parser.error('需要用 -o 指定输出文件，或用 --in-place 覆盖 sample_annotation.json')
+
+    annotation_path = os.path.join(args.dataset_dir, 'sample_annotation.json')
+    with open(annotation_path, 'r', encoding='utf-8') as f:
+        sample_annotations = json.load(f)
+    count = transform_annotations(
+        sample_annotations,
+        TableIndex.load(os.path.join(args.dataset_dir, 'sample_data.json'), keys=('sample_token',)),
+        TableIndex.load(os.path.join(args.dataset_dir, 'ego_pose.json')),
+        inverse=args.to_ego, seq=args.seq, channel=args.channel,
+    )
+    with open(args.output or annotation_path, 'w', encoding='utf-8') as f:
+        json.dump(sample_annotations, f, ensure_ascii=False, indent=4)
+    print(f"已变换 {count} 个框")
@@ -0,0 +1,291 @@
+"""
+统一命令行入口。各子命令只在执行时才导入需要的模块（shapely / geopandas / PIL / cv2 等），
+python src/cli.py --help 等快速命令不加载任何重量级依赖。
+
+子命令:
+    convert    GeoJSON 图层 -> NuScenesMap JSON
+    update     按要素增量更新已有的 NuScenesMap JSON，未修改要素的 token 不变，并写出补丁（见 map_patch.py）
+    merge      合并多张已转换的 NuScenesMap JSON（节点去重）
+    fix-poses  用 pose_in_image.json 修正数据集的 ego_pose.json
+    render     将 NuScenesMap JSON 绘制为 BEV mask 与叠加图
+    batch      按清单并行批量转换（见 batch_convert.py）
+    cache      查看 / 失效 / 清空图层转换缓存（见 layer_cache.py）
+
+用法（在仓库根目录运行）:
+    python src/cli.py convert resource/AIR_F11/AIR_F11.yaml resource/AIR_F11/road_divider.geojson \\
+        -o output_nuscenes_map.json --template template/unused_template.json
+    python src/cli.py convert map.yaml road_divider.geojson --nested out.geojson,holes.geojson --boundary road_segment.geojson
+    python src/cli.py convert map.yaml road_divider.geojson --report profile.json --memory --profile convert.pstats
+    python src/cli.py convert map.yaml road_divider.geojson road_segment.geojson --cache-dir .layer_cache
+    python src/cli.py cache .layer_cache --invalidate road_segment.geojson
+    python src/cli.py update map.yaml road_divider.geojson -o output_nuscenes_map.json --patch patch.json
+    python src/cli.py merge part_a.json part_b.json -o output_nuscenes_map.json
+    python src/cli.py fix-poses resource/AIR_F11/AIR_F11.yaml data/Dataset/20250122_192629 \\
+        data/pose_in_image/20250122_192629/pose_in_image.json --axis-mapping 155 155
+    python src/cli.py render output_nuscenes_map.json resource/AIR_F11/AIR_F11.yaml --out-dir bev
+    python src/cli.py batch manifest.yaml --workers 8
+"""
+import argparse
+import sys
+
+
+def _split_paths(groups):
+    return [[path for path in group.split(',') if path] for group in groups or ()]
+
+
+def _layer_specs(args):
+    """命令行中的图层转为 batch_convert 清单中的写法: 路径、[外轮廓, 孔洞, ...]、{boundary: [...]}。"""
+    return (list(args.layers) + _split_paths(args.nested)
+            + [{'boundary': group} for group in _split_paths(args.boundary)])
+
+
+def _convert_cached(args, meta, profiled):
+    """每个图层单独转换（或读取缓存），再合并写出，与 batch_convert 的单个 job 相同。"""
+    import json
+    from batch_convert import assemble_job, convert_layer
+    from pipeline_profiler import merge_reports
+
+    job = {
+        'output': args.output, 'template': args.template, 'merge_existing': args.merge_existing,
+        'is_ros': not args.isaac,
+        'axis_mapping': list(args.axis_mapping), 'node_tolerance': args.node_tolerance,
+        'token_factory': args.token_factory, 'token_seed': args.token_seed,
+        'simplify_tolerance': args.simplify_tolerance, 'resample_spacing': args.resample_spacing,
+        'stream': args.stream, 'compact': args.compact, 'float_precision': args.float_precision,
+        'fast_encoder': args.fast_encoder, 'profile': profiled,
+        'cache_dir': args.cache_dir, 'cache_max_mb': args.cache_max_mb,
+    }
+    layer_maps, reports = [], []
+    cached_layers = 0
+    for layer_index, layer in enumerate(_layer_specs(args)):
+        layer_map, _, report, cached = convert_layer(job, meta, layer_index, layer)
+        layer_maps.append(layer_map)
+        reports.append(report)
+        cached_layers += cached
+    reports.append(assemble_job(job, meta, layer_maps))
+    print(f"{cached_layers}/{len(layer_maps)} 个图层来自缓存 {args.cache_dir}")
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(merge_reports(reports), f, indent=4)
+
+
+def _convert(args):
+    from map_meta import load_map_meta
+    from QGISMap2NuscenesMap import Geojson2Nuscenesjson, prepare_output
+    from pipeline_profiler import PipelineProfiler, run_profiled
+
+    if not (args.layers or args.nested or args.boundary):
+        raise SystemExit("convert: 至少需要一个 GeoJSON 图层（layers / --nested / --boundary）")
+    meta = load_map_meta(args.map_yaml)
+    print(f"*********resolution={meta['resolution']}, origin={meta['origin']}*******")
+    print(f"图像宽度: {meta['image_width']}px, 图像高度: {meta['image_height']}px")
+
+    profiled = bool(args.report or args.memory)
+    if args.cache_dir:
+        run_profiled(lambda: _convert_cached(args, meta, profiled), args.profile)
+        return
+    converter = Geojson2Nuscenesjson(
+        resolution=meta['resolution'],
+        origin=meta['origin'],
+        image_height=meta['image_height'],
+        image_width=meta['image_width'],
+        is_ros=not args.isaac,
+        axis_mapping=tuple(args.axis_mapping),
+        node_tolerance=args.node_tolerance,
+        token_factory=args.token_factory,
+        token_seed=args.token_seed,
+        simplify_tolerance=args.simplify_tolerance,
+        resample_spacing=args.resample_spacing,
+        profiler=PipelineProfiler(track_memory=args.memory) if profiled else None,
+    )
+    prepare_output(args.output, args.template, args.merge_existing)
+
+    def run():
+        for layer in args.layers:
+            converter.add_layer(layer, stream=args.stream)
+        for group in _split_paths(args.nested):
+            converter.add_nested_layers(group, stream=args.stream)
+        for group in _split_paths(args.boundary):
+            converter.add_boundary_layer(group, stream=args.stream)
+        converter.save(args.output, compact=args.compact, float_precision=args.float_precision,
+                       fast_encoder=args.fast_encoder)
+
+    run_profiled(run, args.profile)
+    if profiled:
+        converter.profile_report()
+        converter.profiler.print_report()
+        if args.report:
+            converter.profiler.write_json(args.report)
+
+
+def _update(args):
+    from map_meta import load_map_meta
+    from map_patch import update_map
+
+    options = {
+        'is_ros': not args.isaac, 'axis_mapping': tuple(args.axis_mapping), 'node_tolerance': args.node_tolerance,
+        'token_factory': args.token_factory, 'token_seed': args.token_seed,
+        'simplify_tolerance': args.simplify_tolerance, 'resample_spacing': args.resample_spacing,
+    }
+    update_map(load_map_meta(args.map_yaml), _layer_specs(args), args.output, options, index_path=args.index,
+               patch_path=args.patch, template=args.template, compact=args.compact,
+               float_precision=args.float_precision, fast_encoder=args.fast_encoder)
+
+
+def _merge(args):
+    from QGISMap2NuscenesMap import merge_map_files, prepare_output
+
+    prepare_output(args.output, args.template, args.merge_existing)
+    merge_map_files(args.inputs, args.output, compact=args.compact, float_precision=args.float_precision)
+
+
+def _fix_poses(args):
+    from image_pixel_to_world_position import fix_ego_poses
+
+    fix_ego_poses(args.map_yaml, args.dataset_dir, args.pose_in_image, output=args.output,
+                  is_ros=not args.isaac, axis_mapping=tuple(args.axis_mapping),
+                  update_rotation=args.update_rotation)
+
+
+def _render(args):
+    from bev_rasterizer import BEVRasterizer
+
+    rasterizer = BEVRasterizer.from_files(args.map_json, args.map_yaml, is_ros=not args.isaac,
+                                          axis_mapping=tuple(args.axis_mapping), line_thickness=args.line_thickness)
+    rasterizer.save(args.out_dir, overlay=not args.no_overlay)
+
+
+def _batch(args):
+    from batch_convert import run_manifest
+
+    if not run_manifest(args.manifest, args.workers, args.report_json):
+        sys.exit(1)
+
+
+def _cache(args):
+    from layer_cache import LayerCache
+
+    cache = LayerCache(args.cache_dir, max_bytes=int(args.max_mb * (1 << 20)))
+    if args.clear:
+        print(f"removed {cache.invalidate()} entries")
+    for layer in args.invalidate or ():
+        print(f"{layer}: removed {cache.invalidate(layer)} entries")
+    for group in _split_paths(args.invalidate_nested):
+        print(f"{','.join(group)}: removed {cache.invalidate(group)} entries")
+    for group in _split_paths(args.invalidate_boundary):
+        print(f"boundary {','.join(group)}: removed {cache.invalidate({'boundary': group})} entries")
+    if args.evict:
+        print(f"evicted {cache.evict()} entries")
+    stats = cache.stats()
+    print(f"{args.cache_dir}: {stats['entries']} entries, {stats['bytes'] / 1e6:.1f} MB")
+
+
+def _add_axis_arguments(parser, default_axis_mapping=(0, 0)):
+    parser.add_argument('--isaac', action='store_true', help='yaml 为 Isaac 地图（默认 ROS）')
+    parser.add_argument('--axis-mapping', type=float, nargs=2, default=default_axis_mapping, metavar=('X', 'Y'),
+                        help='ROS/Isaac 图片坐标系到实际坐标系的旋转角（度），默认 %(default)s')
+
+
+def _add_layer_arguments(parser):
+    parser.add_argument('map_yaml', help='ROS/Isaac 地图 yaml')
+    parser.add_argument('layers', nargs='*', help='GeoJSON 图层，文件中的 name 为语义类型')
+    parser.add_argument('-o', '--output', default='output_nuscenes_map.json')
+    _add_axis_arguments(parser)
+    parser.add_argument('--nested', action='append', metavar='OUT,HOLES,...',
+                        help='外轮廓与孔洞分开标注的一组图层（逗号分隔），按包含关系自动嵌套，可重复')
+    parser.add_argument('--boundary', action='append', metavar='POLYGONS,...',
+                        help='由一组多边形图层（逗号分隔）的边界生成 road_divider，可重复')
+    parser.add_argument('--node-tolerance', type=float, default=0.0, help='节点去重的吸附容差（米）')
+    parser.add_argument('--token-factory', default='uuid4', help='uuid4 / content / counter，见 token_factory.py')
+    parser.add_argument('--token-seed', type=int, default=0)
+    parser.add_argument('--simplify-tolerance', type=float, default=0.0, help='Douglas-Peucker 简化容差（米）')
+    parser.add_argument('--resample-spacing', type=float, default=None, help='折线按固定间距（米）重采样')
+    _add_output_format_arguments(parser)
+    parser.add_argument('--fast-encoder', action='store_true', help='使用 orjson 写出（需要安装 orjson）')
+
+
+def _add_output_format_arguments(parser):
+    parser.add_argument('--compact', action='store_true', help='输出不缩进')
+    parser.add_argument('--float-precision', type=int, default=None, help='坐标保留的小数位数')
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='cli.py', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='command', metavar='command')
+    subparsers.required = True
+
+    convert = subparsers.add_parser('convert', help='GeoJSON 图层 -> NuScenesMap JSON')
+    _add_layer_arguments(convert)
+    convert.add_argument('--template', default=None,
+                         help='先用模板覆盖输出文件再合并；不给出时从空地图开始')
+    convert.add_argument('--merge-existing', action='store_true',
+                         help='与已存在的输出文件合并（默认每次重新生成输出文件，重复运行结果相同）')
+    convert.add_argument('--stream', action='store_true', help='用 ijson 逐个要素读取大图层')
+    convert.add_argument('--report', default=None, help='打印阶段耗时与计数，并写入该 JSON 文件')
+    convert.add_argument('--memory', action='store_true', help='同时记录每个阶段的内存峰值（tracemalloc）')
+    convert.add_argument('--profile', default=None, help='用 cProfile 包装整个转换，统计结果写入该文件')
+    convert.add_argument('--cache-dir', default=None,
+                         help='按内容哈希缓存每个图层的转换结果，未修改的图层直接读取缓存（见 layer_cache.py）')
+    convert.add_argument('--cache-max-mb', type=float, default=1024, help='缓存总大小上限，超出时淘汰最久未使用的条目')
+    convert.set_defaults(func=_convert)
+
+    update = subparsers.add_parser('update', help='按要素增量更新 NuScenesMap JSON 并写出补丁')
+    _add_layer_arguments(update)
+    update.add_argument('--template', default=None, help='输出文件不存在时以模板为初始地图')
+    update.add_argument('--index', default=None, help='要素索引文件，默认 <output>.features.json')
+    update.add_argument('--patch', default=None, help='将补丁（删除的 token 与新增/替换的记录）写入该文件')
+    update.set_defaults(func=_update)
+
+    merge = subparsers.add_parser('merge', help='合并多张 NuScenesMap JSON（节点去重）')
+    merge.add_argument('inputs', nargs='+')
+    merge.add_argument('-o', '--output', default='output_nuscenes_map.json')
+    merge.add_argument('--template', default=None, help='先用模板覆盖输出文件再合并')
+    merge.add_argument('--merge-existing', action='store_true', help='与已存在的输出文件合并（默认重新生成）')
+    _add_output_format_arguments(merge)
+    merge.set_defaults(func=_merge)
+
+    fix_poses = subparsers.add_parser('fix-poses', help='用 pose_in_image.json 修正 ego_pose.json')
+    fix_poses.add_argument('map_yaml', help='ROS/Isaac 地图 yaml')
+    fix_poses.add_argument('dataset_dir', help='NuScenes 数据集目录（sample_data.json / ego_pose.json / samples/LIDAR_TOP）')
+    fix_poses.add_argument('pose_in_image', help='pose_in_image.json')
+    fix_poses.add_argument('-o', '--output', default=None, help='默认覆盖数据集中的 ego_pose.json')
+    _add_axis_arguments(fix_poses, default_axis_mapping=(155, 155))
+    fix_poses.add_argument('--update-rotation', action='store_true',
+                           help='同时用相邻帧位移得到的航向更新 ego_pose 的 rotation')
+    fix_poses.set_defaults(func=_fix_poses)
+
+    render = subparsers.add_parser('render', help='将 NuScenesMap JSON 绘制为 BEV mask 与叠加图')
+    render.add_argument('map_json')
+    render.add_argument('map_yaml', help='生成地图时使用的 ROS/Isaac yaml')
+    render.add_argument('--out-dir', default='bev')
+    _add_axis_arguments(render)
+    render.add_argument('--line-thickness', type=int, default=1)
+    render.add_argument('--no-overlay', action='store_true', help='只写出各图层 mask')
+    render.set_defaults(func=_render)
+
+    batch = subparsers.add_parser('batch', help='按清单并行批量转换')
+    batch.add_argument('manifest', help='yaml/json 清单文件，格式见 batch_convert.py')
+    batch.add_argument('--workers', type=int, default=None, help='进程数，默认使用全部 CPU 核')
+    batch.add_argument('--report-json', default=None, help='将每个 job 的耗时、计数与阶段计时写入该 JSON 文件')
+    batch.set_defaults(func=_batch)
+
+    cache = subparsers.add_parser('cache', help='查看 / 失效 / 清空图层转换缓存')
+    cache.add_argument('cache_dir')
+    cache.add_argument('--invalidate', action='append', metavar='GEOJSON', help='删除该图层的全部缓存结果，可重复')
+    cache.add_argument('--invalidate-nested', action='append', metavar='OUT,HOLES,...', help='同 convert --nested')
+    cache.add_argument('--invalidate-boundary', action='append', metavar='POLYGONS,...', help='同 convert --boundary')
+    cache.add_argument('--clear', action='store_true', help='清空缓存')
+    cache.add_argument('--evict', action='store_true', help='按 --max-mb 淘汰最久未使用的条目')
+    cache.add_argument('--max-mb', type=float, default=1024)
+    cache.set_defaults(func=_cache)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,288 @@
+"""
+NuScenesMap 的列式二进制存储格式（.nmap），可作为 JSON 地图的替代后端。
+
+文件布局（所有 section 按 64 字节对齐，小端序）:
+    b'NUSCMAP1' | uint64 header 长度 | header JSON | section ...
+- node_x / node_y: float64 连续数组
+- node_tokens / line_tokens / polygon_tokens / ref_tokens: 定长字节串 token 表
+- line_offsets + line_nodes: 每条 line 的节点下标（offset 索引的 int32 数组）
+- polygon_exterior_offsets + polygon_exterior_nodes: polygon 外环
+- polygon_hole_offsets + hole_offsets + hole_nodes: 每个 polygon 的孔洞（先索引到孔洞，再索引到节点）
+- tables_json: 其余所有顶层键（语义层、canvas_edge、version 等）的 JSON，用到时才解析
+节点下标为负数 -(k+1) 表示引用了 node 表中不存在的 token（ref_tokens[k]），保证导出无损。
+
+ColumnarMap 通过 numpy.memmap 打开几何 section，不需要解析即可使用，多个进程打开同一文件时共享页缓存。
+"""
+import json
+
+import numpy as np
+
+MAGIC = b'NUSCMAP1'
+ALIGN = 64
+FORMAT_VERSION = 1
+
+_NODE_KEYS = ('token', 'x', 'y')
+_LINE_KEYS = ('token', 'node_tokens')
+_POLYGON_KEYS = ('token', 'exterior_node_tokens', 'holes')
+
+
+def _token_table(tokens):
+    encoded = [t.encode('utf-8') for t in tokens]
+    width = max((len(t) for t in encoded), default=1) or 1
+    return np.array(encoded, dtype=f'S{width}')
+
+
+def _offsets(lengths):
+    offsets = np.zeros(len(lengths) + 1, dtype='<i8')
+    np.cumsum(lengths, out=offsets[1:])
+    return offsets
+
+
+def _is_exact_float(value):
+    return type(value) is float
+
+
+def write_columnar_map(nuscenes_map, output_path):
+    """
+    将 NuScenesMap 字典（assemble_nuscenes_map 的结果或读入的地图 JSON）写为 .nmap 文件。
+    """
+    nodes = nuscenes_map.get('node', [])
+    lines = nuscenes_map.get('line', [])
+    polygons = nuscenes_map.get('polygon', [])
+
+    node_index = {}
+    for i, node in enumerate(nodes):
+        node_index.setdefault(node['token'], i)
+    ref_tokens = {}
+
+    def resolve(tokens):
+        out = []
+        for token in tokens:
+            i = node_index.get(token)
+            if i is None:
+                i = -(ref_tokens.setdefault(token, len(ref_tokens)) + 1)
+            out.append(i)
+        return out
+
+    # 节点坐标；非 float（如模板里的大整数）或带额外字段的节点原样记录在 header 中
+    node_x = np.zeros(len(nodes), dtype='<f8')
+    node_y = np.zeros(len(nodes), dtype='<f8')
+    node_overrides = {}
+    for i, node in enumerate(nodes):
+        x, y = node['x'], node['y']
+        if _is_exact_float(x) and _is_exact_float(y) and len(node) == 3:
+            node_x[i] = x
+            node_y[i] = y
+        else:
+            # 坐标数组中仍保留近似值，供几何查询使用；导出时以 header 中的原始记录为准
+            node_x[i] = float(x)
+            node_y[i] = float(y)
+            node_overrides[i] = node
+
+    line_nodes = [resolve(line['node_tokens']) for line in lines]
+    line_extra = {i: {k: v for k, v in line.items() if k not in _LINE_KEYS}
+                  for i, line in enumerate(lines) if len(line) != len(_LINE_KEYS)}
+
+    exterior_nodes = [resolve(polygon['exterior_node_tokens']) for polygon in polygons]
+    holes = [[resolve(hole) for hole in polygon['holes']] for polygon in polygons]
+    polygon_extra = {i: {k: v for k, v in polygon.items() if k not in _POLYGON_KEYS}
+                     for i, polygon in enumerate(polygons) if len(polygon) != len(_POLYGON_KEYS)}
+    flat_holes = [hole for polygon_holes in holes for hole in polygon_holes]
+
+    def flatten(lists):
+        return np.fromiter((i for lst in lists for i in lst), dtype='<i4')
+
+    sections = {
+        'node_x': node_x,
+        'node_y': node_y,
+        'node_tokens': _token_table(node['token'] for node in nodes),
+        'line_tokens': _token_table(line['token'] for line in lines),
+        'line_offsets': _offsets([len(n) for n in line_nodes]),
+        'line_nodes': flatten(line_nodes),
+        'polygon_tokens': _token_table(polygon['token'] for polygon in polygons),
+        'polygon_exterior_offsets': _offsets([len(n) for n in exterior_nodes]),
+        'polygon_exterior_nodes': flatten(exterior_nodes),
+        'polygon_hole_offsets': _offsets([len(h) for h in holes]),
+        'hole_offsets': _offsets([len(h) for h in flat_holes]),
+        'hole_nodes': flatten(flat_holes),
+        'ref_tokens': _token_table(ref_tokens),
+        'tables_json': np.frombuffer(json.dumps(
+            {k: v for k, v in nuscenes_map.items() if k not in ('node', 'line', 'polygon')}
+        ).encode('utf-8'), dtype='u1'),
+    }
+
+    header = {
+        'format_version': FORMAT_VERSION,
+        'key_order': list(nuscenes_map.keys()),
+        'node_overrides': node_overrides,
+        'line_extra': line_extra,
+        'polygon_extra': polygon_extra,
+        'sections': {},
+    }
+    # 先计算 header 长度（section 偏移依赖于它），偏移字段用定宽数字避免长度变化
+    for name, array in sections.items():
+        header['sections'][name] = {'offset': 10 ** 15, 'dtype': array.dtype.str, 'shape': list(array.shape)}
+    header_len = len(json.dumps(header).encode('utf-8'))
+    data_start = -(-(len(MAGIC) + 8 + header_len) // ALIGN) * ALIGN
+    offset = data_start
+    for name, array in sections.items():
+        header['sections'][name]['offset'] = offset
+        offset += -(-array.nbytes // ALIGN) * ALIGN
+    header_bytes = json.dumps(header).encode('utf-8')
+    header_bytes += b' ' * (header_len - len(header_bytes))
+
+    with open(output_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(np.uint64(len(header_bytes)).astype('<u8').tobytes())
+        f.write(header_bytes)
+        for name, array in sections.items():
+            f.write(b'\0' * (header['sections'][name]['offset'] - f.tell()))
+            f.write(array.tobytes())
+        f.write(b'\0' * (offset - f.tell()))
+
+
+class ColumnarMap:
+    """
+    只读打开 .nmap 文件。几何数组均为 numpy.memmap（或空数组），按需从页缓存读取。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} 不是 NuScenesMap 列式文件")
+            header_len = int(np.frombuffer(f.read(8), dtype='<u8')[0])
+            self.header = json.loads(f.read(header_len).decode('utf-8'))
+        if self.header['format_version'] != FORMAT_VERSION:
+            raise ValueError(f"不支持的格式版本 {self.header['format_version']}")
+
+        for name, section in self.header['sections'].items():
+            setattr(self, name, self._open_section(section))
+        self._node_overrides = {int(k): v for k, v in self.header['node_overrides'].items()}
+        self._tables = None
+        self._token_to_node = None
+
+    def _open_section(self, section):
+        shape = tuple(section['shape'])
+        if 0 in shape:
+            return np.empty(shape, dtype=section['dtype'])
+        return np.memmap(self.path, dtype=section['dtype'], mode='r', offset=section['offset'], shape=shape)
+
+    @property
+    def num_nodes(self):
+        return len(self.node_tokens)
+
+    @property
+    def num_lines(self):
+        return len(self.line_tokens)
+
+    @property
+    def num_polygons(self):
+        return len(self.polygon_tokens)
+
+    @property
+    def tables(self):
+        """语义层、canvas_edge 等非几何数据，首次访问时解析。"""
+        if self._tables is None:
+            self._tables = json.loads(self.tables_json.tobytes().decode('utf-8'))
+        return self._tables
+
+    def node_index(self, token):
+        """token -> 节点下标，首次调用时建立字典。"""
+        if self._token_to_node is None:
+            self._token_to_node = {}
+            for i, t in enumerate(self.node_tokens.tolist()):
+                self._token_to_node.setdefault(t.decode('utf-8'), i)
+        return self._token_to_node[token]
+
+    def _coords(self, node_indexes):
+        node_indexes = np.asarray(node_indexes)
+        coords = np.full((len(node_indexes), 2), np.nan)
+        valid = node_indexes >= 0
+        coords[valid, 0] = self.node_x[node_indexes[valid]]
+        coords[valid, 1] = self.node_y[node_indexes[valid]]
+        return coords
+
+    def line_node_indexes(self, i):
+        return self.line_nodes[self.line_offsets[i]:self.line_offsets[i + 1]]
+
+    def line_coords(self, i):
+        """第 i 条 line 的 (K, 2) 坐标。"""
+        return self._coords(self.line_node_indexes(i))
+
+    def polygon_exterior_coords(self, i):
+        return self._coords(self.polygon_exterior_nodes[
+            self.polygon_exterior_offsets[i]:self.polygon_exterior_offsets[i + 1]])
+
+    def polygon_holes_coords(self, i):
+        return [
+            self._coords(self.hole_nodes[self.hole_offsets[h]:self.hole_offsets[h + 1]])
+            for h in range(self.polygon_hole_offsets[i], self.polygon_hole_offsets[i + 1])
+        ]
+
+    def _token_list(self, node_indexes, node_tokens, ref_tokens):
+        return [node_tokens[i] if i >= 0 else ref_tokens[-i - 1] for i in node_indexes]
+
+    def to_nuscenes_json(self):
+        """
+        无损导出为 NuScenesMap JSON 字典（与写入时的字典相等，顶层键顺序一致）。
+        """
+        node_tokens = [t.decode('utf-8') for t in self.node_tokens.tolist()]
+        ref_tokens = [t.decode('utf-8') for t in self.ref_tokens.tolist()]
+
+        nodes = [
+            {'token': token, 'x': x, 'y': y}
+            for token, x, y in zip(node_tokens, self.node_x.tolist(), self.node_y.tolist())
+        ]
+        for i, node in self._node_overrides.items():
+            nodes[i] = node
+
+        line_nodes = self.line_nodes.tolist()
+        line_offsets = self.line_offsets.tolist()
+        lines = []
+        for i, token in enumerate(self.line_tokens.tolist()):
+            line = {'token': token.decode('utf-8'),
+                    'node_tokens': self._token_list(line_nodes[line_offsets[i]:line_offsets[i + 1]],
+                                                    node_tokens, ref_tokens)}
+            line.update(self.header['line_extra'].get(str(i), {}))
+            lines.append(line)
+
+        exterior_nodes = self.polygon_exterior_nodes.tolist()
+        exterior_offsets = self.polygon_exterior_offsets.tolist()
+        hole_nodes = self.hole_nodes.tolist()
+        hole_offsets = self.hole_offsets.tolist()
+        polygon_hole_offsets = self.polygon_hole_offsets.tolist()
+        polygons = []
+        for i, token in enumerate(self.polygon_tokens.tolist()):
+            polygon = {
+                'token': token.decode('utf-8'),
+                'exterior_node_tokens': self._token_list(
+                    exterior_nodes[exterior_offsets[i]:exterior_offsets[i + 1]], node_tokens, ref_tokens),
+                'holes': [
+                    self._token_list(hole_nodes[hole_offsets[h]:hole_offsets[h + 1]], node_tokens, ref_tokens)
+                    for h in range(polygon_hole_offsets[i], polygon_hole_offsets[i + 1])
+                ],
+            }
+            polygon.update(self.header['polygon_extra'].get(str(i), {}))
+            polygons.append(polygon)
+
+        geometry = {'node': nodes, 'line': lines, 'polygon': polygons}
+        tables = self.tables
+        return {key: geometry[key] if key in geometry else tables[key] for key in self.header['key_order']}
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="NuScenesMap JSON 与列式 .nmap 格式互转")
+    parser.add_argument('input')
+    parser.add_argument('output')
+    parser.add_argument('--export', action='store_true', help='将 .nmap 导出为 JSON（默认是 JSON -> .nmap）')
+    args = parser.parse_args()
+
+    if args.export:
+        from nuscenes_map_writer import write_nuscenes_map
+        write_nuscenes_map(ColumnarMap(args.input).to_nuscenes_json(), args.output)
+    else:
+        with open(args.input, 'r') as f:
+            write_columnar_map(json.load(f), args.output)
@@ -0,0 +1,135 @@
+"""
+用地图像素位姿（pose_in_image.json）批量修正 nuScenes ego_pose。
+- 所有像素位姿一次性经 converter.get_world_positions 向量化转换为世界坐标
+- 由相邻帧的位移计算航向角，输出 nuScenes 的 [w, x, y, z] 四元数
+- 通过 TableIndex 找到每帧对应 sample 下所有 sample_data 的 ego_pose，批量写入 translation（可选 rotation）
+"""
+import json
+
+import numpy as np
+
+
+def load_pose_in_image(path):
+    """
+    读取 pose_in_image.json，返回 (frame_numbers, pixels):
+    - frame_numbers: (N,) int64，lidar_file_name 中的数字部分（即排序后的雷达帧序号）
+    - pixels: (N, 2) float64，pose_in_map_pixel
+    同一帧出现多次时以最后一次为准（与原脚本使用 dict 存储的行为一致），顺序为首次出现的顺序。
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    poses = {}
+    for entry in data or []:
+        lidar_file_name = entry.get("lidar_file_name")
+        pose_in_map_pixel = entry.get("pose_in_map_pixel")
+        if not lidar_file_name or not pose_in_map_pixel:
+            raise ValueError("Lidar file or pose_in_map_pixel not found")
+        # 提取数字部分并转换为整数
+        poses[int(''.join(filter(str.isdigit, lidar_file_name)))] = pose_in_map_pixel[:2]
+
+    frame_numbers = np.fromiter(poses.keys(), dtype=np.int64, count=len(poses))
+    pixels = np.array(list(poses.values()), dtype=np.float64).reshape(-1, 2)
+    return frame_numbers, pixels
+
+
+def headings_from_positions(frame_numbers, positions, min_step=1e-6):
+    """
+    按帧序号排序后，用每帧到下一帧的位移方向作为该帧航向角（弧度，x 轴为 0，逆时针为正）。
+    最后一帧沿用前一帧的航向；位移小于 min_step（静止）的帧沿用上一个有效航向，开头的静止帧沿用第一个有效航向。
+    返回 (N,) 数组，顺序与输入一致。
+    """
+    n = len(frame_numbers)
+    yaw = np.zeros(n, dtype=np.float64)
+    if n < 2:
+        return yaw
+
+    order = np.argsort(frame_numbers, kind='stable')
+    sorted_xy = positions[order]
+    delta = np.diff(sorted_xy, axis=0)
+    step_yaw = np.arctan2(delta[:, 1], delta[:, 0])
+    valid = np.hypot(delta[:, 0], delta[:, 1]) >= min_step
+    if not valid.any():
+        return yaw
+
+    # 前向填充：静止的步沿用上一个有效航向
+    last_valid = np.where(valid, np.arange(n - 1), -1)
+    np.maximum.accumulate(last_valid, out=last_valid)
+    last_valid[last_valid < 0] = np.argmax(valid)
+    sorted_yaw = np.empty(n, dtype=np.float64)
+    sorted_yaw[:-1] = step_yaw[last_valid]
+    sorted_yaw[-1] = sorted_yaw[-2]
+
+    yaw[order] = sorted_yaw
+    return yaw
+
+
+def yaw_to_quaternion(yaw):
+    """
+    绕 z 轴的航向角 (N,) -> nuScenes 格式四元数 (N, 4) [w, x, y, z]。
+    """
+    yaw = np.asarray(yaw, dtype=np.float64)
+    quat = np.zeros((len(yaw), 4), dtype=np.float64)
+    quat[:, 0] = np.cos(yaw / 2)
+    quat[:, 3] = np.sin(yaw / 2)
+    return quat
+
+
+class EgoPoseCorrector:
+    """
+    参数:
+    - converter: 提供 get_world_positions 的像素->世界坐标转换器
+    - sample_data_table: sample_data 的 TableIndex，需要 'filename' 和 'sample_token' 索引
+    - ego_pose_table: ego_pose 的 TableIndex，需要 'token' 索引
+    """
+
+    def __init__(self, converter, sample_data_table, ego_pose_table):
+        self.converter = converter
+        self.sample_data_table = sample_data_table
+        self.ego_pose_table = ego_pose_table
+
+    def compute_poses(self, frame_numbers, pixels):
+        """
+        返回 (translations, rotations): (N, 3) 世界坐标（z=0）与 (N, 4) 航向四元数。
+        """
+        world = self.converter.get_world_positions(pixels)
+        translations = np.zeros((len(world), 3), dtype=np.float64)
+        translations[:, :2] = world
+        rotations = yaw_to_quaternion(headings_from_positions(frame_numbers, world))
+        return translations, rotations
+
+    def apply(self, lidar_filenames, translations, rotations=None):
+        """
+        将每帧的位姿写入该帧所在 sample 的所有 sample_data 对应的 ego_pose 记录（原地修改）。
+        参数:
+        - lidar_filenames: 每帧对应的 sample_data filename（已修正），与 translations 对齐
+        - rotations: 为 None 时只更新 translation
+        返回:
+        - (changed, missing): 被修改的 ego_pose 记录列表（按帧顺序）与找不到的 filename / ego_pose_token 列表
+        """
+        translation_list = translations.tolist()
+        rotation_list = rotations.tolist() if rotations is not None else None
+        changed, missing = [], []
+        for i, filename in enumerate(lidar_filenames):
+            sample_data = self.sample_data_table.get('filename', filename)
+            if sample_data is None:
+                missing.append(filename)
+                continue
+            # 寻找这个sample里面所有的sample_data
+            for sibling in self.sample_data_table.get_all('sample_token', sample_data['sample_token']):
+                ego_pose = self.ego_pose_table.get('token', sibling.get('ego_pose_token'))
+                if ego_pose is None:
+                    missing.append(sibling.get('ego_pose_token'))
+                    continue
+                ego_pose['translation'] = translation_list[i]
+                if rotation_list is not None:
+                    ego_pose['rotation'] = rotation_list[i]
+                changed.append(ego_pose)
+        return changed, missing
+
+    def correct(self, frame_numbers, pixels, lidar_filenames, update_rotation=False):
+        """
+        compute_poses + apply。返回值同 apply。
+        """
+        translations, rotations = self.compute_poses(frame_numbers, pixels)
+        return self.apply(lidar_filenames, translations, rotations if update_rotation else None)
@@ -0,0 +1,40 @@
+"""
+流式读取 GeoJSON FeatureCollection，逐个返回要素，避免一次性 geojson.load 整个图层。
+依赖 ijson（pip install ijson），仅在使用流式模式时才需要安装。
+"""
+import geojson
+
+
+def _import_ijson():
+    try:
+        import ijson
+    except ImportError as e:
+        raise ImportError("流式读取 GeoJSON 需要安装 ijson: pip install ijson") from e
+    return ijson
+
+
+def read_collection_name(geojson_path, default='unknown'):
+    """
+    读取 FeatureCollection 顶层的 'name'（QGIS 导出时写在 features 之前，读取到即停止）。
+    """
+    ijson = _import_ijson()
+    with open(geojson_path, 'rb') as f:
+        for prefix, event, value in ijson.parse(f):
+            if prefix == 'name' and event == 'string':
+                return value
+            if prefix == 'features' and event == 'start_array':
+                break
+    # name 写在 features 之后的少见情况：再扫描一遍（仍然是流式，不占内存）
+    with open(geojson_path, 'rb') as f:
+        return next(ijson.items(f, 'name'), default)
+
+
+def iter_features(geojson_path):
+    """
+    逐个产出 FeatureCollection 中的要素，同一时刻内存中只保留一个要素。
+    每个要素都经过 geojson.GeoJSON.to_instance，坐标精度（默认保留 6 位小数）与 geojson.load 的结果一致。
+    """
+    ijson = _import_ijson()
+    with open(geojson_path, 'rb') as f:
+        for feature in ijson.items(f, 'features.item', use_float=True):
+            yield geojson.GeoJSON.to_instance(feature)
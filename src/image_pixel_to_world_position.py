@@ -1,9 +1,14 @@
 import json
 import uuid
-import yaml
-from PIL import Image  # 用于读取图像
 import os
 import math
+import numpy as np
+
+from node_registry import NodeRegistry
+from nuscenes_table_index import TableIndex
+from ego_pose_correction import EgoPoseCorrector, load_pose_in_image
+from lidar_filename_index import LidarFilenameIndex
+from map_meta import load_map_meta, load_yaml  # noqa: F401
 
 
 # - qgis默认x右y下，图片左上角
@@ -16,27 +21,9 @@ import math
 # AIR_B1 = (-5， -5) # ROS
 # AIR_G = (45, 45 # ROS)
 # AIR_F11 = (155, 155) # ROS
-ros2issac_axis_mapping = (155, 155)  # ROS以ROS图片的进行调整, ISAAC以ISAAC图片进行调整epoch_name = "20250122_192629"
-epoch_name = "20250122_192629"
-map_name = "AIR_F11"
-IS_ROS = True
-
-# 配置文件
-# dataset
-dataset_foldet = r'data/Dataset/' + epoch_name  # 根路径
-pose_in_image_json_path = r'data/pose_in_image/' + epoch_name + '/pose_in_image.json'  # 根路径
-lidar_folder = dataset_foldet + r'/samples/LIDAR_TOP'
-sample_data_path = dataset_foldet + r'/sample_data.json'
-sample_json_path = dataset_foldet + r'/sample.json'
-ego_pose_path = dataset_foldet + r'/ego_pose.json'
-
-# map
-resource_root = 'resource/' + map_name + '/'
-geojson_input = resource_root + 'road_divider.geojson'  # 替换为您的GeoJSON文件路径
-ros_yaml_input = resource_root + map_name + '.yaml'
-template_path = 'template/unused_template.json'
-
-ego_pose_output_path = "data/ego_pose.json"
+DEFAULT_AXIS_MAPPING = (155, 155)  # ROS以ROS图片的进行调整, ISAAC以ISAAC图片进行调整
+DEFAULT_IS_ROS = True
+# 数据集目录、pose_in_image、地图 yaml 等运行配置由命令行给出: python src/cli.py fix-poses --help
 
 def find_json_with_key(search_key, search_value, json_datas)-> json:
 
@@ -67,8 +54,8 @@ def find_all_json_with_key(search_key, search_value, json_datas):
 
 class Geojson2Nuscenesjson:
     def __init__(self, 
-                 resolution, origin, image_height, image_width, is_ros=IS_ROS,
-                 axis_mapping=ros2issac_axis_mapping,
+                 resolution, origin, image_height, image_width, is_ros=DEFAULT_IS_ROS,
+                 axis_mapping=DEFAULT_AXIS_MAPPING, node_tolerance=0.0,
                  ):
         """
         初始化语义层和数据结构。
@@ -77,6 +64,7 @@ class Geojson2Nuscenesjson:
         - origin: 原点坐标 [x, y, z]
         - image_height: 图像高度（像素数）
         - image_width: 图像宽度（像素数）
+        - node_tolerance: 节点去重的吸附容差（米），默认 0 即坐标完全相同才合并
         """
         self.nuscenes_semantic_layers = (
             "road_divider", "lane_divider", "road_segment", "lane", "ped_crossing"
@@ -84,7 +72,7 @@ class Geojson2Nuscenesjson:
         # 初始化语义数据字典
         self.semantic_data = {layer: [] for layer in self.nuscenes_semantic_layers}
         # 初始化几何数据
-        self.nodes = {}
+        self.node_registry = NodeRegistry(node_tolerance)  # (x, y) -> token 的哈希索引
         self.node_list = []
         self.line_list = []
         self.polygon_list = []
@@ -103,8 +91,26 @@ class Geojson2Nuscenesjson:
         # - axis_mapping 用于 ros -> issac 坐标系方向
         self.axis_mapping = axis_mapping
         self.is_ros = is_ros
+        self._build_transform()
 
-    def transform_point(self, x, y, coord):
+    def _build_transform(self):
+        """
+        预先计算 QGIS像素 -> 世界坐标 的系数，避免每个点重复读取 axis_mapping、计算 radians/cos/sin。
+        - ROS地图: x_real = x_qgis * resolution + origin_x, y_real = (image_height + y_qgis) * resolution + origin_y
+        - Isaac地图: x_real = x_qgis * resolution - origin_x, y_real = (image_height + y_qgis) * resolution - origin_y
+        - 再按 axis_mapping 旋转
+        """
+        if self.is_ros:  # ROS地图yaml
+            self._offset_x, self._offset_y = self.origin_x, self.origin_y
+        else:  # isaac地图yaml
+            self._offset_x, self._offset_y = -self.origin_x, -self.origin_y
+        x_rotation, y_rotation = self.axis_mapping  # 获取 X 和 Y 轴的旋转角度（以度为单位）
+        theta_x = math.radians(x_rotation)  # 将角度转换为弧度
+        theta_y = math.radians(y_rotation)  # 将角度转换为弧度
+        self._cos_x, self._sin_x = math.cos(theta_x), math.sin(theta_x)
+        self._cos_y, self._sin_y = math.cos(theta_y), math.sin(theta_y)
+
+    def transform_point(self, x, y, coord=None):
         """
         将 QGIS/普通图像 坐标系转换为 ROS/Isaac 的 origin 坐标系。
         再将 ROS/Isaac 坐标转换为 Issac 或 real world 坐标（基于 self.axis_mapping）。
@@ -118,51 +124,40 @@ class Geojson2Nuscenesjson:
         再将世界坐标转为bev坐标
         - Issac或者real world ---> BEV(和QGIS一样)
         """
-        if coord:
-            x_qgis, y_qgis = coord
+        if coord is not None:
+            x_qgis, y_qgis = coord[0], coord[1]
         else:
             x_qgis, y_qgis = x, y
-            
-        if self.is_ros:  # ROS地图yaml
-            ### Step 1: QGIS -> ROS
-            # 翻转 Y 轴（QGIS 的 Y 轴向下，ROS 的 Y 轴向上）
-            y_flipped = self.image_height + y_qgis
-            # 像素转换到实际世界尺度（ROS的分辨率是每个像素对应多少米）
-            x_ros = x_qgis * self.resolution
-            y_ros = y_flipped * self.resolution
-            # 将 ROS 坐标系原点移到 origin
-            x_ros_real = x_ros + self.origin_x
-            y_ros_real = y_ros + self.origin_y
-            ### Step 2: Isaac -> Isaac/real world
-            # 应用 self.axis_mapping（角度旋转）
-            x_rotation, y_rotation = self.axis_mapping  # 获取 X 和 Y 轴的旋转角度（以度为单位）
-            theta_x = math.radians(x_rotation)  # 将角度转换为弧度
-            theta_y = math.radians(y_rotation)  # 将角度转换为弧度
-            # 应用旋转矩阵公式
-            x_transformed = x_ros_real * math.cos(theta_x) - y_ros_real * math.sin(theta_x)
-            y_transformed = x_ros_real * math.sin(theta_y) + y_ros_real * math.cos(theta_y)
-        else: #isaac地图yaml
-            ### Step 1: QGIS -> Isaac
-            # 翻转 Y 轴（QGIS 的 Y 轴向下，Isaac 的 Y 轴向上）
-            y_flipped = self.image_height + y_qgis
-            # 像素转换到实际世界尺度
-            x_isaac = x_qgis * self.resolution
-            y_isaac = y_flipped * self.resolution
-            # 将 Isaac 坐标系原点移到 origin, origin是真实尺度
-            x_isaac_real = x_isaac - self.origin_x
-            y_isaac_real = y_isaac - self.origin_y
-            
-            ### Step 2: Isaac -> Issac/real world
-            # 应用 self.axis_mapping（角度旋转）
-            x_rotation, y_rotation = self.axis_mapping  # 获取 X 和 Y 轴的旋转角度（以度为单位）
-            theta_x = math.radians(x_rotation)  # 将角度转换为弧度
-            theta_y = math.radians(y_rotation)  # 将角度转换为弧度
-            # 应用旋转矩阵公式
-            x_transformed = x_isaac_real * math.cos(theta_x) - y_isaac_real * math.sin(theta_x)
-            y_transformed = x_isaac_real * math.sin(theta_y) + y_isaac_real * math.cos(theta_y)
-        
+
+        ### Step 1: QGIS -> ROS/Isaac
+        # 翻转 Y 轴（QGIS 的 Y 轴向下，ROS/Isaac 的 Y 轴向上），像素转换到实际世界尺度
+        x_scaled = x_qgis * self.resolution
+        y_scaled = (self.image_height + y_qgis) * self.resolution
+        # 将坐标系原点移到 origin
+        x_real = x_scaled + self._offset_x
+        y_real = y_scaled + self._offset_y
+        ### Step 2: ROS/Isaac -> Issac/real world，应用 self.axis_mapping（角度旋转）
+        x_transformed = x_real * self._cos_x - y_real * self._sin_x
+        y_transformed = x_real * self._sin_y + y_real * self._cos_y
         return [x_transformed, y_transformed]
 
+    def transform_points(self, coords):
+        """
+        批量版本的 transform_point，输入 (N, 2) 的 QGIS 像素坐标，返回 (N, 2) 的世界坐标，结果与逐点计算逐位相同。
+        """
+        pts = np.asarray(coords, dtype=np.float64)
+        if pts.size == 0:
+            return np.empty((0, 2), dtype=np.float64)
+        pts = pts.reshape(len(pts), -1)
+
+        x_real = pts[:, 0] * self.resolution + self._offset_x
+        y_real = (self.image_height + pts[:, 1]) * self.resolution + self._offset_y
+
+        out = np.empty((len(pts), 2), dtype=np.float64)
+        out[:, 0] = x_real * self._cos_x - y_real * self._sin_x
+        out[:, 1] = x_real * self._sin_y + y_real * self._cos_y
+        return out
+
     def generate_token(self):
         """
         生成一个唯一的UUID作为token。
@@ -181,6 +176,26 @@ class Geojson2Nuscenesjson:
             semantic_type = 'unknown'
         return semantic_type
 
+    def coords_to_node_tokens(self, coords, transform=True):
+        """
+        将一串 QGIS 坐标（LineString / Polygon 外环 / 孔洞）转换为节点 token 列表。
+        坐标相同（或在 node_tolerance 内）的节点通过 self.node_registry 复用，新节点追加到 self.node_list。
+        """
+        if transform:
+            coords = self.transform_points(coords).tolist()  # 整条线/环一次性转换坐标
+        node_tokens = []
+        for coord in coords:
+            x, y = coord[0], coord[1]
+            token, is_new = self.node_registry.get_or_create(x, y, self.generate_token)
+            if is_new:
+                self.node_list.append({
+                    'token': token,
+                    'x': x,
+                    'y': y
+                })
+            node_tokens.append(token)
+        return node_tokens
+
     def process_geometry(self, feature, semantic_type):
         """
         处理GeoJSON要素的几何数据，并根据语义类型分类存储。
@@ -197,30 +212,10 @@ class Geojson2Nuscenesjson:
                 'y': y
             }
             self.node_list.append(node)
-            self.nodes[token] = (x, y)
+            self.node_registry.register(token, x, y)
 
         elif geom.geom_type == 'LineString':
-            coords = list(geom.coords)
-            node_tokens = []  # 存储节点 token 列表
-            for coord in coords:
-                coord = self.transform_point(None, None, coord)  # 转换坐标
-                existing_token = None
-                for tok, (x, y) in self.nodes.items():
-                    if x == coord[0] and y == coord[1]:
-                        existing_token = tok
-                        break
-                if existing_token is None:
-                    new_token = self.generate_token()
-                    node = {
-                        'token': new_token,
-                        'x': coord[0],
-                        'y': coord[1]
-                    }
-                    self.node_list.append(node)
-                    self.nodes[new_token] = coord
-                    node_tokens.append(new_token)
-                else:
-                    node_tokens.append(existing_token)
+            node_tokens = self.coords_to_node_tokens(geom.coords)  # 存储节点 token 列表
 
             if len(node_tokens) >= 2:
                 # 创建 line 数据
@@ -257,51 +252,13 @@ class Geojson2Nuscenesjson:
 
 
         elif geom.geom_type == 'Polygon':
-            exterior_coords = list(geom.exterior.coords)
-            exterior_node_tokens = []
-            for coord in exterior_coords:
-                coord = self.transform_point(None, None, coord)  # transform coordinates
-                existing_token = None
-                for tok, (x, y) in self.nodes.items():
-                    if x == coord[0] and y == coord[1]:
-                        existing_token = tok
-                        break
-                if existing_token is None:
-                    new_token = self.generate_token()
-                    node = {
-                        'token': new_token,
-                        'x': coord[0],
-                        'y': coord[1]
-                    }
-                    self.node_list.append(node)
-                    self.nodes[new_token] = coord
-                    exterior_node_tokens.append(new_token)
-                else:
-                    exterior_node_tokens.append(existing_token)
+            exterior_node_tokens = self.coords_to_node_tokens(geom.exterior.coords)
 
             # 处理孔洞（holes）
             holes = []
             for interior in geom.interiors:
-                hole_coords = list(interior.coords)
-                hole_tokens = []
-                for coord in hole_coords:
-                    existing_token = None
-                    for tok, (x, y) in self.nodes.items():
-                        if x == coord[0] and y == coord[1]:
-                            existing_token = tok
-                            break
-                    if existing_token is None:
-                        new_token = self.generate_token()
-                        node = {
-                            'token': new_token,
-                            'x': coord[0],
-                            'y': coord[1]
-                        }
-                        self.node_list.append(node)
-                        self.nodes[new_token] = coord
-                        hole_tokens.append(new_token)
-                    else:
-                        hole_tokens.append(existing_token)
+                # 孔洞坐标沿用原有行为，不经过 transform_point
+                hole_tokens = self.coords_to_node_tokens(interior.coords, transform=False)
                 if hole_tokens:
                     holes.append(hole_tokens)
 
@@ -460,139 +417,77 @@ class Geojson2Nuscenesjson:
         
     def get_world_position(self, x, y):
         return self.transform_point(x, y)
+
+    def get_world_positions(self, pixels):
+        """
+        批量将地图像素位置 (N, 2) 转换为世界坐标 (N, 2)。
+        """
+        return self.transform_points(pixels)
         
         
 
-def load_yaml(file_path):
+def fix_ego_poses(map_yaml, dataset_dir, pose_in_image_path, output=None, is_ros=DEFAULT_IS_ROS,
+                  axis_mapping=DEFAULT_AXIS_MAPPING, update_rotation=False):
     """
-    读取 YAML 配置文件
+    用地图图片上标注的位姿（pose_in_image.json）修正数据集的 ego_pose.json。
+    参数:
+    - map_yaml: 地图 yaml
+    - dataset_dir: NuScenes 数据集目录（包含 sample_data.json、ego_pose.json 与 samples/LIDAR_TOP）
+    - pose_in_image_path: pose_in_image.json 路径
+    - output: 修正后的 ego_pose 输出路径，默认覆盖数据集中的 ego_pose.json
+    - update_rotation: 是否同时用相邻帧位移得到的航向更新 ego_pose 的 rotation
+    返回:
+    - 未找到 sample_data / ego_pose 的雷达文件名或 token 列表
     """
-    with open(file_path, 'r', encoding='utf-8') as file:
-        config = yaml.safe_load(file)
-    return config
-
-# 示例使用
-if __name__ == "__main__":    
-    # 加载 YAML 配置文件
-    config = load_yaml(ros_yaml_input)
-    
-    # 提取所需的信息
-    image_path = config['image']
-    resolution = config['resolution']
-    origin = config['origin']  # origin 是一个列表 [x, y, z]
-    negate = config.get('negate', 0)  # 如果 negate 不存在，默认为 0
-    occupied_thresh = config.get('occupied_thresh', 0.65)  # 默认阈值
-    free_thresh = config.get('free_thresh', 0.196)  # 默认阈值
-    print(f"*********resolution={resolution}, origin={origin}, negate={negate}, occupied_thresh={occupied_thresh}*******")
-
-    # 读取图像以获取图像高度（像素数）
-    try:
-        with Image.open(image_path) as img:
-            image_width, image_height = img.size
-            print(f"图像宽度: {image_width}px, 图像高度: {image_height}px")
-    except Exception as e:
-        print(f"无法读取图像文件: {e}")
-        exit(1)
-    
+    meta = load_map_meta(map_yaml)
+    print(f"*********resolution={meta['resolution']}, origin={meta['origin']}*******")
+    print(f"图像宽度: {meta['image_width']}px, 图像高度: {meta['image_height']}px")
     converter = Geojson2Nuscenesjson(
-        resolution=resolution,
-        origin=origin,
-        image_height=image_height,
-        image_width=image_width
+        resolution=meta['resolution'],
+        origin=meta['origin'],
+        image_height=meta['image_height'],
+        image_width=meta['image_width'],
+        is_ros=is_ros,
+        axis_mapping=tuple(axis_mapping),
     )
 
-    lidar_file_names = os.listdir(lidar_folder)
-    # 加载 sample_data.json 文件
-    with open(sample_data_path, 'r', encoding='utf-8') as f:
-        sample_data_json_data = json.load(f)
-    # 加载 sample.json 文件
-    with open(sample_json_path, 'r', encoding='utf-8') as f:
-        sample_json_data = json.load(f)
-    # 加载 ego_pose.json 文件
-    with open(ego_pose_path, 'r', encoding='utf-8') as f:
-        ego_pose_json_data = json.load(f)
-        
-    # 排序雷达文件名
-    lidar_file_names_sorted = sorted(  # 提取时间戳并排序（按主时间戳和次时间戳组成的元组排序）
-        lidar_file_names,
-        key=lambda x: tuple(map(int, x.split("__")[-1].split(".")[0].split("_")))
-    )
-    # for idx, filename in enumerate(lidar_file_names_sorted):  # 打印排序结果（序号从0开始）
-    #     print(f"Index {idx}: {filename}")
+    # 加载 sample_data.json / ego_pose.json 文件，并一次性建立哈希索引
+    ego_pose_path = os.path.join(dataset_dir, 'ego_pose.json')
+    sample_data_table = TableIndex.load(os.path.join(dataset_dir, 'sample_data.json'),
+                                        keys=('token', 'filename', 'sample_token', 'ego_pose_token'))
+    ego_pose_table = TableIndex.load(ego_pose_path, keys=('token',))
+
+    # 扫描一次雷达目录，按时间戳（主时间戳和次时间戳组成的元组）排序并修正文件名
+    lidar_index = LidarFilenameIndex(os.path.join(dataset_dir, 'samples', 'LIDAR_TOP'))
 
     try:
-        with open(pose_in_image_json_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        frame_numbers, pixels = load_pose_in_image(pose_in_image_path)
     except json.JSONDecodeError as e:
-        print(f"Error in file: {pose_in_image_json_path}")
+        print(f"Error in file: {pose_in_image_path}")
         print(f"Error details: {e}")
-        with open(pose_in_image_json_path, 'r', encoding='utf-8') as f:
+        with open(pose_in_image_path, 'r', encoding='utf-8') as f:
             print(f"File content: {f.read()}")
         raise  # 重新抛出异常，终止程序
-        
-    lidar_file_numbers_and_poses = {}
-    if data:
-        for entry in data:
-            lidar_file_name = entry.get("lidar_file_name")
-            pose_in_map_pixel = entry.get("pose_in_map_pixel")
-            
-            if not lidar_file_name or not pose_in_map_pixel:
-                raise ValueError("Lidar file or pose_in_map_pixel not found")
-            else:
-                # 提取数字部分并转换为整数
-                lidar_file_number = int(''.join(filter(str.isdigit, lidar_file_name)))
-                # 将 lidar_file_number 作为键，pose_in_map_pixel 作为值存储到字典中
-                lidar_file_numbers_and_poses[lidar_file_number] = pose_in_map_pixel
-                
-    ego_pose_json_data_changed = []
-    for lidar_file_number, pose_in_map_pixel in lidar_file_numbers_and_poses.items():
-        
-        lidar_file_name = lidar_file_names_sorted[lidar_file_number]
-        
-        '''BUG'''
-        # 由于数据的bug，将_转换为:,__不被替换
-        # 先将 '__' 替换为一个临时标记，比如 '__TEMP__'
-        temp_file_name = lidar_file_name.replace("__", "'")
-        # 然后将单个 '_' 替换为 ':'
-        corrected_file_name = temp_file_name.replace("_", ":")
-        # 最后将临时标记 '__TEMP__' 替换回 '__'
-        corrected_file_name = corrected_file_name.replace("'", "__") 
-        s = corrected_file_name
-        # 1. 从后往前查找最后两个 ':'，并替换倒数两个 ':'
-        parts = s.rsplit(":", 2)
-        if len(parts) >= 3:
-            s = ":".join(parts[:-2]) + "_" + parts[-2] + "_" + parts[-1]
-        # 2. 然后将第一个 ':' 替换为 '_'
-        first_colon_index = s.find(":")
-        if first_colon_index != -1:
-            s = s[:first_colon_index] + "_" + s[first_colon_index+1:]
-        corrected_file_name = s
-
-        # 获得sample_data_token from LIDAR filename
-        corr_sample_data_json = find_json_with_key("filename", corrected_file_name, sample_data_json_data)
-        #print(annotation_json_obj)
-        sample_token = corr_sample_data_json["sample_token"]
-        #print(sample_token)
-        corr_sample_json = find_json_with_key("token", sample_token, sample_json_data)
-        
-        # 寻找这个sample里面所有的json
-        sample_jsons = find_all_json_with_key("sample_token", corr_sample_json, sample_data_json_data)
-        ego_pose_tokens = [obj.get("ego_pose_token") for obj in sample_jsons]
-        
-        # 根据位置像素计算世界坐标
-        image_x = pose_in_map_pixel[0]
-        image_y = pose_in_map_pixel[1]
-        x_world, y_world = converter.get_world_position(image_x, image_y)  # get world postion from image
-        
-        # 修复所有的ego_pose
-        for ego_pose_token in ego_pose_tokens:
-            ego_pose_json = find_json_with_key("token", ego_pose_token, ego_pose_json_data)
-            if ego_pose_json:
-                ego_pose_json["translation"] = [x_world, y_world, 0]  # 更新 translation 字段
-                ego_pose_json_data_changed.append(ego_pose_json)
-            else:
-                print(f"未找到 token 为 {ego_pose_token} 的 ego_pose 数据")
-                
-    with open(ego_pose_path, 'w', encoding='utf-8') as f:
+
+    # 每帧对应的（修正后的）雷达文件名
+    lidar_filenames = [lidar_index.corrected_filename(n) for n in frame_numbers.tolist()]
+
+    # 向量化计算所有帧的世界坐标与航向，并批量修复所有的ego_pose
+    corrector = EgoPoseCorrector(converter, sample_data_table, ego_pose_table)
+    ego_pose_json_data_changed, missing = corrector.correct(
+        frame_numbers, pixels, lidar_filenames, update_rotation=update_rotation
+    )
+    for token_or_filename in missing:
+        print(f"未找到 {token_or_filename} 对应的 sample_data / ego_pose 数据")
+
+    with open(output or ego_pose_path, 'w', encoding='utf-8') as f:
         json.dump(ego_pose_json_data_changed, f, ensure_ascii=False, indent=4)
-    
\ No newline at end of file
+    return missing
+
+
+# 示例使用
+if __name__ == "__main__":
+    # 等价于 python src/cli.py fix-poses <map_yaml> <dataset_dir> <pose_in_image.json> --axis-mapping 155 155
+    import sys
+    from cli import main
+    main(['fix-poses'] + sys.argv[1:])
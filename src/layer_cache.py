@@ -0,0 +1,162 @@
+"""
+按内容哈希缓存单个图层的转换结果（assemble_nuscenes_map 得到的 node / line / polygon / 语义层片段）。
+在 QGIS 中只修改了一个图层时，重建地图只需重新转换该图层，其余图层直接读取缓存后合并（merge_layer_map）。
+
+缓存键 = 图层类型（普通 / 嵌套 / 边界） + 各 GeoJSON 文件内容的 sha256 + 转换参数
+（resolution / origin / 图像尺寸 / axis_mapping / is_ros / 去重容差 / 精简参数 / token 方式 / 转换器版本，由调用方给出）。
+文件名为 <图层路径标签>-<缓存键>.json，按路径标签可以删除某个图层的全部历史结果。
+读取命中时更新文件 mtime，写入后按 mtime 从旧到新淘汰，直到总大小与条目数不超过上限（LRU）。
+
+图层的写法与 batch_convert 清单相同: 路径字符串、[外轮廓, 孔洞, ...] 列表、{boundary: [...]}。
+
+用法:
+    python src/cli.py convert map.yaml road_divider.geojson road_segment.geojson --cache-dir .layer_cache
+    python src/cli.py cache .layer_cache                                 # 查看条目数与大小
+    python src/cli.py cache .layer_cache --invalidate road_segment.geojson
+    python src/cli.py cache .layer_cache --clear
+"""
+import hashlib
+import json
+import os
+
+_digest_cache = {}  # (绝对路径, mtime_ns, 文件大小) -> sha256
+
+
+def layer_kind(layer):
+    if isinstance(layer, dict):
+        return 'boundary'
+    if isinstance(layer, (list, tuple)):
+        return 'nested'
+    return 'layer'
+
+
+def layer_sources(layer):
+    """图层涉及的 GeoJSON 文件列表。"""
+    if isinstance(layer, dict):
+        return list(layer['boundary'])
+    if isinstance(layer, (list, tuple)):
+        return list(layer)
+    return [layer]
+
+
+def file_digest(path):
+    """文件内容的 sha256，同一进程内按 (路径, mtime, 大小) 复用。"""
+    stat = os.stat(path)
+    memo_key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+    digest = _digest_cache.get(memo_key)
+    if digest is None:
+        h = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                h.update(chunk)
+        digest = _digest_cache[memo_key] = h.hexdigest()
+    return digest
+
+
+class LayerCache:
+    """
+    参数:
+    - cache_dir: 缓存目录（不存在时自动创建）
+    - max_bytes: 缓存总大小上限，默认 1 GiB
+    - max_entries: 条目数上限，默认不限制
+    """
+
+    def __init__(self, cache_dir, max_bytes=1 << 30, max_entries=None):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def source_tag(layer):
+        """由图层类型与文件绝对路径得到的标签，与文件内容无关。"""
+        spec = [layer_kind(layer)] + [os.path.abspath(path) for path in layer_sources(layer)]
+        return hashlib.blake2b(json.dumps(spec).encode('utf-8'), digest_size=8).hexdigest()
+
+    @staticmethod
+    def key(layer, params):
+        """
+        参数:
+        - layer: 图层（见模块说明）
+        - params: 影响转换结果的全部参数，需可 JSON 序列化
+        """
+        spec = {
+            'kind': layer_kind(layer),
+            'sources': [file_digest(path) for path in layer_sources(layer)],
+            'params': params,
+        }
+        return hashlib.sha256(json.dumps(spec, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def _path(self, layer, key):
+        return os.path.join(self.cache_dir, f"{self.source_tag(layer)}-{key}.json")
+
+    def get(self, layer, key):
+        """返回缓存的图层片段，未命中返回 None。"""
+        path = self._path(layer, key)
+        try:
+            with open(path, 'r') as f:
+                fragment = json.load(f)
+            os.utime(path)  # 记录最近使用时间
+        except (OSError, ValueError):
+            # 不存在、被其他进程淘汰或写了一半
+            self.misses += 1
+            return None
+        self.hits += 1
+        return fragment
+
+    def put(self, layer, key, fragment):
+        path = self._path(layer, key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(fragment, f, separators=(',', ':'))
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def entries(self):
+        """[(路径, 大小, mtime)]，按 mtime 从旧到新排序。"""
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith('.json'):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((entry.path, stat.st_size, stat.st_mtime_ns))
+        entries.sort(key=lambda e: e[2])
+        return entries
+
+    def evict(self):
+        """按最近使用时间淘汰，直到满足 max_bytes / max_entries，返回删除的条目数。"""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        while entries and (total > self.max_bytes or
+                           (self.max_entries is not None and len(entries) > self.max_entries)):
+            path, size, _ = entries.pop(0)
+            total -= size
+            removed += self._remove(path)
+        return removed
+
+    def invalidate(self, layer=None):
+        """删除某个图层（按路径，与内容无关）的全部缓存结果；layer 为 None 时清空缓存。返回删除的条目数。"""
+        prefix = None if layer is None else self.source_tag(layer) + '-'
+        removed = 0
+        for path, _, _ in self.entries():
+            if prefix is None or os.path.basename(path).startswith(prefix):
+                removed += self._remove(path)
+        return removed
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+            return 1
+        except FileNotFoundError:
+            return 0
+
+    def stats(self):
+        entries = self.entries()
+        return {'entries': len(entries), 'bytes': sum(size for _, size, _ in entries),
+                'hits': self.hits, 'misses': self.misses}
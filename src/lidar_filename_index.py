@@ -0,0 +1,75 @@
+import os
+import re
+
+# 文件名最后一个 '__' 之后、第一个 '.' 之前的时间戳，例如 xxx__LIDAR_TOP__1737545189_123456.pcd.bin -> 1737545189_123456
+_TIMESTAMP_RE = re.compile(r'^(?:.*__)?(\d+(?:_\d+)*)(?:\..*)?$')
+
+
+def parse_lidar_timestamp(lidar_file_name):
+    """
+    返回文件名中的时间戳元组（主时间戳, 次时间戳, ...），用于排序。
+    """
+    match = _TIMESTAMP_RE.match(lidar_file_name)
+    if match is None:
+        raise ValueError(f"无法从雷达文件名中解析时间戳: {lidar_file_name}")
+    return tuple(map(int, match.group(1).split('_')))
+
+
+def correct_lidar_file_name(lidar_file_name):
+    '''BUG'''
+    # 由于数据的bug，将_转换为:,__不被替换
+    # 先将 '__' 替换为一个临时标记，比如 '__TEMP__'
+    temp_file_name = lidar_file_name.replace("__", "'")
+    # 然后将单个 '_' 替换为 ':'
+    corrected_file_name = temp_file_name.replace("_", ":")
+    # 最后将临时标记 '__TEMP__' 替换回 '__'
+    corrected_file_name = corrected_file_name.replace("'", "__")
+    s = corrected_file_name
+    # 1. 从后往前查找最后两个 ':'，并替换倒数两个 ':'
+    parts = s.rsplit(":", 2)
+    if len(parts) >= 3:
+        s = ":".join(parts[:-2]) + "_" + parts[-2] + "_" + parts[-1]
+    # 2. 然后将第一个 ':' 替换为 '_'
+    first_colon_index = s.find(":")
+    if first_colon_index != -1:
+        s = s[:first_colon_index] + "_" + s[first_colon_index+1:]
+    return s
+
+
+class LidarFilenameIndex:
+    """
+    LIDAR_TOP 目录的文件名索引，构建时用 os.scandir 扫描一次目录：
+    - filenames[n]: 按时间戳排序后第 n 帧的文件名（即 pose_in_image.json 中的帧序号）
+    - corrected_filenames[n]: 经 correct_lidar_file_name 修正后、与 sample_data.json 中 filename 一致的文件名
+    - sample_data(n): 给定 sample_data_table（TableIndex，需要 'filename' 索引）时，第 n 帧对应的 sample_data 记录
+    之后每帧的查找都是 O(1)。
+    """
+
+    def __init__(self, lidar_folder, sample_data_table=None):
+        entries = []
+        with os.scandir(lidar_folder) as it:
+            for entry in it:
+                if entry.is_file():
+                    entries.append((parse_lidar_timestamp(entry.name), entry.name))
+        entries.sort()
+
+        self.timestamps = [timestamp for timestamp, _ in entries]
+        self.filenames = [name for _, name in entries]
+        self.corrected_filenames = [correct_lidar_file_name(name) for name in self.filenames]
+        self._sample_data = None
+        if sample_data_table is not None:
+            self._sample_data = [sample_data_table.get('filename', name) for name in self.corrected_filenames]
+
+    def __len__(self):
+        return len(self.filenames)
+
+    def filename(self, frame_number):
+        return self.filenames[frame_number]
+
+    def corrected_filename(self, frame_number):
+        return self.corrected_filenames[frame_number]
+
+    def sample_data(self, frame_number):
+        if self._sample_data is None:
+            raise ValueError("构建 LidarFilenameIndex 时没有传入 sample_data_table")
+        return self._sample_data[frame_number]
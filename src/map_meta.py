@@ -0,0 +1,192 @@
+"""
+地图 yaml（ROS map_server / Isaac 格式）与占据栅格图像的元数据读取。
+- image 路径与 map_server 相同，按 yaml 所在目录解析（找不到时再按当前目录解析，兼容旧用法）
+- 图像尺寸只读取文件头（PNG / PGM / PPM / PBM / JPEG / BMP），不解码像素、不导入 PIL；其他格式才回退到 PIL
+- 尺寸按 (路径, mtime, 文件大小) 缓存在进程内，并持久化到 JSON 缓存文件，批量处理多张地图时跨进程、跨运行复用
+
+缓存文件默认为 ~/.cache/qgis2nuscenes/image_size_cache.json，可用环境变量 QGIS2NUSCENES_CACHE_DIR 指定目录，
+设为空字符串时只使用进程内缓存。
+"""
+import json
+import os
+import struct
+
+import yaml
+
+CACHE_DIR_ENV = 'QGIS2NUSCENES_CACHE_DIR'
+IMAGE_SIZE_CACHE_FILE = 'image_size_cache.json'
+
+_image_size_cache = {}  # 绝对路径 -> (mtime_ns, 文件大小, width, height)
+
+
+def load_yaml(file_path):
+    """
+    读取 YAML 配置文件
+    """
+    with open(file_path, 'r', encoding='utf-8') as file:
+        config = yaml.safe_load(file)
+    return config
+
+
+def _png_size(f, head):
+    # 8 字节签名之后第一个块必须是 IHDR: 长度(4) 'IHDR'(4) width(4) height(4)
+    if head[12:16] != b'IHDR':
+        raise ValueError("PNG 缺少 IHDR 块")
+    return struct.unpack('>II', head[16:24])
+
+
+def _pnm_size(f, head):
+    # P1-P6 头部为 ASCII: 魔数 宽 高 [最大值]，以空白分隔，'#' 到行尾为注释
+    f.seek(2)
+    values = []
+    token = b''
+    while len(values) < 2:
+        c = f.read(1)
+        if not c:
+            raise ValueError("PNM 头部不完整")
+        if c == b'#':
+            f.readline()
+        elif c.isspace():
+            if token:
+                values.append(int(token))
+                token = b''
+        elif c.isdigit():
+            token += c
+        else:
+            raise ValueError(f"PNM 头部包含非法字符: {c!r}")
+    return values[0], values[1]
+
+
+def _jpeg_size(f, head):
+    # 逐个跳过标记段，直到 SOFn（C0-CF，除去 C4 DHT、C8 JPG、CC DAC）
+    f.seek(2)
+    while True:
+        marker = f.read(2)
+        while marker[:1] == b'\xff' and marker[1:2] == b'\xff':  # 填充字节
+            marker = marker[1:] + f.read(1)
+        if len(marker) < 2 or marker[:1] != b'\xff':
+            raise ValueError("JPEG 中未找到 SOF 标记")
+        code = marker[1]
+        if code in (0xd8, 0x01) or 0xd0 <= code <= 0xd7:  # 无长度字段的标记
+            continue
+        length = struct.unpack('>H', f.read(2))[0]
+        if 0xc0 <= code <= 0xcf and code not in (0xc4, 0xc8, 0xcc):
+            height, width = struct.unpack('>xHH', f.read(5))
+            return width, height
+        f.seek(length - 2, os.SEEK_CUR)
+
+
+def _bmp_size(f, head):
+    header_size = struct.unpack('<I', head[14:18])[0]
+    if header_size == 12:  # BITMAPCOREHEADER
+        width, height = struct.unpack('<HH', head[18:22])
+    else:
+        width, height = struct.unpack('<ii', head[18:26])
+    return width, abs(height)  # 高度为负表示自上而下存储
+
+
+_HEADER_READERS = (
+    (b'\x89PNG\r\n\x1a\n', _png_size),
+    (b'P1', _pnm_size), (b'P2', _pnm_size), (b'P3', _pnm_size),
+    (b'P4', _pnm_size), (b'P5', _pnm_size), (b'P6', _pnm_size),
+    (b'\xff\xd8', _jpeg_size),
+    (b'BM', _bmp_size),
+)
+
+
+def read_image_size(image_path):
+    """
+    只读取文件头得到图像尺寸，返回 (width, height)。不认识的格式回退到 PIL（Image.open 同样只解析文件头）。
+    """
+    with open(image_path, 'rb') as f:
+        head = f.read(32)
+        for magic, reader in _HEADER_READERS:
+            if head.startswith(magic):
+                return tuple(int(v) for v in reader(f, head))
+
+    from PIL import Image
+    with Image.open(image_path) as img:
+        return img.size
+
+
+def _cache_path():
+    cache_dir = os.environ.get(CACHE_DIR_ENV)
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.expanduser('~'), '.cache', 'qgis2nuscenes')
+    return os.path.join(cache_dir, IMAGE_SIZE_CACHE_FILE) if cache_dir else None
+
+
+def _load_disk_cache(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_disk_cache(path, key, entry):
+    """重新读取后写入单条记录，临时文件 + os.replace 保证并发的批量进程不会写出半个文件。"""
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        cache = _load_disk_cache(path)
+        cache[key] = entry
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(cache, f)
+        os.replace(tmp_path, path)
+    except OSError:
+        pass  # 缓存只用于加速，不可写时忽略
+
+
+def image_size(image_path, use_cache=True):
+    """
+    带缓存的图像尺寸 (width, height)。缓存键为绝对路径，mtime 或文件大小变化时重新读取文件头。
+    """
+    image_path = os.path.abspath(image_path)
+    stat = os.stat(image_path)
+    if not use_cache:
+        return read_image_size(image_path)
+
+    cached = _image_size_cache.get(image_path)
+    if cached is not None and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+        return cached[2:]
+
+    cache_path = _cache_path()
+    entry = _load_disk_cache(cache_path).get(image_path) if cache_path else None
+    if entry is not None and (entry['mtime_ns'], entry['size']) == (stat.st_mtime_ns, stat.st_size):
+        width, height = entry['width'], entry['height']
+    else:
+        width, height = read_image_size(image_path)
+        if cache_path:
+            _save_disk_cache(cache_path, image_path, {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size,
+                                                      'width': width, 'height': height})
+    _image_size_cache[image_path] = (stat.st_mtime_ns, stat.st_size, width, height)
+    return width, height
+
+
+def resolve_image_path(map_yaml, image_path):
+    """yaml 中的 image 为相对路径时按 yaml 所在目录解析，不存在时再按当前目录解析。"""
+    if os.path.isabs(image_path):
+        return image_path
+    relative_to_yaml = os.path.join(os.path.dirname(map_yaml), image_path)
+    if os.path.exists(relative_to_yaml) or not os.path.exists(image_path):
+        return relative_to_yaml
+    return image_path
+
+
+def load_map_meta(map_yaml, use_cache=True):
+    """
+    读取地图 yaml 与对应图像的尺寸。
+    返回:
+    - {'image_path', 'resolution', 'origin', 'image_height', 'image_width'}
+    """
+    config = load_yaml(map_yaml)
+    image_path = resolve_image_path(map_yaml, config['image'])
+    image_width, image_height = image_size(image_path, use_cache=use_cache)
+    return {
+        'image_path': image_path,
+        'resolution': config['resolution'],
+        'origin': config['origin'],
+        'image_height': image_height,
+        'image_width': image_width,
+    }
@@ -0,0 +1,341 @@
+"""
+要素级增量更新：QGIS 中只修改了图层里的少数要素时，只转换新增、修改的要素，删除被删掉的要素产生的记录；
+未改动要素的 node / line / polygon / 语义层记录与 token 保持不变，下游按 token 建立的缓存无需整体失效。
+
+- 要素身份: GeoJSON 要素 id（QGIS 导出的 id 或 properties.fid），没有时用几何的哈希（相同几何按出现顺序区分）
+- 是否修改: 几何 + 属性的哈希
+- 修改过的要素产生的 line / polygon / 语义层记录数量不变时沿用原来的 token；节点按坐标与旧地图去重，未移动的顶点 token 不变
+
+每次更新在输出地图旁写入索引 <output>.features.json，记录每个要素的哈希与它产生的各表 token，供下一次更新使用；
+同时可以写出补丁（删除的 token 与新增/替换的记录），apply_patch 把补丁应用到旧地图上即得到新地图。
+转换只与修改的要素数量成正比，读写地图文件本身仍与地图大小成正比。
+
+注意:
+- 第一次对某个图层做增量更新时索引中没有该图层，全部要素视为新增，因此该图层不能已经用 convert 写入过输出文件
+- 转换参数（yaml、axis_mapping、精简参数、token 方式等）与索引中记录的不同时所有记录都会变化，需要删除索引与输出后完整重建
+
+用法:
+    python src/cli.py update map.yaml road_divider.geojson road_segment.geojson -o output_nuscenes_map.json \\
+        --template template/unused_template.json --patch patch.json
+"""
+import hashlib
+import json
+import os
+
+import geojson
+import numpy as np
+
+from QGISMap2NuscenesMap import CONVERTER_VERSION, Geojson2Nuscenesjson
+from layer_cache import layer_kind
+from nuscenes_map_writer import write_nuscenes_map
+from polygon_boundaries import boundary_features
+from polygon_nesting import nest_features
+
+INDEX_VERSION = 1
+_GEOMETRY_TABLES = ('node', 'line', 'polygon')
+
+
+def _canonical_json(obj):
+    return json.dumps(obj, sort_keys=True, separators=(',', ':')).encode('utf-8')
+
+
+def _coordinate_bytes(coordinates):
+    try:
+        array = np.asarray(coordinates, dtype=np.float64)
+    except ValueError:  # 长度不同的环 / 多部件，逐层展开
+        return b'[' + b'|'.join(_coordinate_bytes(part) for part in coordinates) + b']'
+    return repr(array.shape).encode('ascii') + array.tobytes()
+
+
+def geometry_digest(geometry):
+    """几何的哈希：坐标按 float64 字节计算（比 JSON 序列化快得多），GeometryCollection 等退回 JSON。"""
+    if 'coordinates' not in geometry:
+        return hashlib.sha1(_canonical_json(geometry)).digest()
+    return hashlib.sha1(geometry['type'].encode('ascii') + _coordinate_bytes(geometry['coordinates'])).digest()
+
+
+def feature_keys(features):
+    """
+    返回每个要素的 (身份 key, 内容哈希)。
+    """
+    keys = []
+    seen = {}
+    for feature in features:
+        properties = feature.get('properties') or {}
+        geometry = geometry_digest(feature['geometry'])
+        digest = hashlib.sha1(geometry + _canonical_json(properties)).hexdigest()
+        fid = feature.get('id', properties.get('fid'))
+        key = f'id:{fid}' if fid is not None else 'geom:' + geometry.hex()
+        count = seen.get(key, 0)
+        seen[key] = count + 1
+        if count:
+            key = f'{key}#{count}'
+        keys.append((key, digest))
+    return keys
+
+
+def layer_id(layer):
+    """索引中图层的名字：路径，或嵌套 / 边界图层的 JSON 写法。"""
+    if layer_kind(layer) == 'layer':
+        return os.path.normpath(layer)
+    if layer_kind(layer) == 'nested':
+        return json.dumps([os.path.normpath(path) for path in layer])
+    return json.dumps({'boundary': [os.path.normpath(path) for path in layer['boundary']]})
+
+
+def _layer_features(converter, layer):
+    """
+    读取图层（写法同 batch_convert 清单）的要素，返回 (features, 语义类型, 转换前是否需要 _clean_feature)。
+    普通图层用 json 读取，只用于比较哈希，需要转换的要素再经 _clean_feature 处理；
+    嵌套 / 边界图层的要素由全部输入要素生成，与完整转换一样用 geojson 读取。
+    """
+    kind = layer_kind(layer)
+    if kind == 'boundary':
+        features, _ = converter.read_features(layer['boundary'])
+        return boundary_features(features), 'road_divider', False
+    if kind == 'nested':
+        features, name = converter.read_features(layer)
+        return nest_features(features), converter.extract_semantics({'name': name}), False
+    with open(layer, 'r') as f:
+        collection = json.load(f)
+    return collection['features'], converter.extract_semantics(collection), True
+
+
+def _clean_feature(feature):
+    """与完整转换读取图层时相同，经 geojson 处理（坐标按 geojson 的默认精度取整），保证增量结果与完整转换一致。"""
+    return geojson.loads(json.dumps(feature))
+
+
+def _convert_features(converter, features, indices, digests, semantic_type):
+    """
+    逐个转换要素，返回每个要素的索引条目 {'digest', 'node', 'line', 'polygon', 语义类型: [token, ...]}。
+    node 为要素引用的全部节点（包括与其他要素共用的节点）。
+    """
+    entries = []
+    semantic_records = converter.semantic_data.get(semantic_type, [])
+    for feature, index, digest in zip(features, indices, digests):
+        n_node, n_line, n_polygon, n_semantic = (len(converter.node_list), len(converter.line_list),
+                                                 len(converter.polygon_list), len(semantic_records))
+        converter.feature_count += 1
+        converter.process_geometry(feature, semantic_type, feature_index=index)
+
+        lines = converter.line_list[n_line:]
+        polygons = converter.polygon_list[n_polygon:]
+        nodes = dict.fromkeys(node['token'] for node in converter.node_list[n_node:])
+        for line in lines:
+            nodes.update(dict.fromkeys(line['node_tokens']))
+        for polygon in polygons:
+            nodes.update(dict.fromkeys(polygon['exterior_node_tokens']))
+            for hole in polygon['holes']:
+                nodes.update(dict.fromkeys(hole))
+        entry = {
+            'digest': digest,
+            'node': list(nodes),
+            'line': [line['token'] for line in lines],
+            'polygon': [polygon['token'] for polygon in polygons],
+        }
+        if len(semantic_records) > n_semantic:
+            entry[semantic_type] = [record['token'] for record in semantic_records[n_semantic:]]
+        entries.append(entry)
+    return entries
+
+
+def _reuse_tokens(old_entry, new_entry, rename):
+    """修改过的要素产生的记录数量不变时，line / polygon / 语义层记录沿用旧 token。"""
+    for table, new_tokens in new_entry.items():
+        if table in ('digest', 'node'):
+            continue
+        old_tokens = old_entry.get(table, [])
+        if len(old_tokens) == len(new_tokens):
+            rename.update(zip(new_tokens, old_tokens))
+            new_entry[table] = list(old_tokens)
+
+
+def _rename_records(converter, rename):
+    for record in converter.line_list + converter.polygon_list:
+        record['token'] = rename.get(record['token'], record['token'])
+    for records in converter.semantic_data.values():
+        for record in records:
+            record['token'] = rename.get(record['token'], record['token'])
+            for key in ('line_token', 'polygon_token'):
+                if key in record:
+                    record[key] = rename.get(record[key], record[key])
+
+
+def _referenced_nodes(nuscenes_map, index):
+    referenced = set()
+    for line in nuscenes_map.get('line', []):
+        referenced.update(line['node_tokens'])
+    for polygon in nuscenes_map.get('polygon', []):
+        referenced.update(polygon['exterior_node_tokens'])
+        for hole in polygon['holes']:
+            referenced.update(hole)
+    for layer in index['layers'].values():
+        for entry in layer['features'].values():
+            referenced.update(entry['node'])  # Point 要素的节点只被要素自己引用
+    return referenced
+
+
+def _load_json(path, default=None):
+    if path and os.path.exists(path):
+        with open(path, 'r') as f:
+            return json.load(f)
+    return default
+
+
+def default_index_path(output_path):
+    return os.path.splitext(output_path)[0] + '.features.json'
+
+
+def update_map(meta, layers, output_path, converter_options=None, index_path=None, patch_path=None, template=None,
+               compact=False, float_precision=None, fast_encoder=False):
+    """
+    按要素增量更新 output_path（不存在时从 template 或空地图开始），并写出索引与补丁。
+    参数:
+    - meta: map_meta.load_map_meta 的结果
+    - layers: 图层列表，写法同 batch_convert 清单（路径、[外轮廓, 孔洞, ...]、{boundary: [...]}）
+    - converter_options: Geojson2Nuscenesjson 的其他参数（is_ros / axis_mapping / node_tolerance / token_factory ...）
+    - index_path: 要素索引，默认 <output>.features.json
+    - patch_path: 给出时把补丁写入该文件
+    返回:
+    - 补丁 {'removed': {表: [token]}, 'upserted': {表: [记录]}, 'canvas_edge', 'features': 每个图层的要素变化统计}
+    """
+    converter_options = dict(converter_options or {})
+    index_path = index_path or default_index_path(output_path)
+    params = {
+        'converter_version': CONVERTER_VERSION,
+        'resolution': meta['resolution'],
+        'origin': [float(v) for v in meta['origin']],
+        'image_height': meta['image_height'],
+        'image_width': meta['image_width'],
+        **{key: list(value) if isinstance(value, tuple) else value for key, value in converter_options.items()},
+    }
+    index = _load_json(index_path) or {'version': INDEX_VERSION, 'params': params, 'generation': 0, 'layers': {}}
+    if index.get('version') != INDEX_VERSION or index['params'] != params:
+        raise ValueError(f"转换参数或索引格式与索引 {index_path} 中记录的不同，请删除索引与输出文件后完整重建:\n"
+                         f"  索引: {index['params']}\n  本次: {params}")
+    index['generation'] += 1
+
+    if converter_options.get('token_factory') == 'counter':
+        # 每次更新使用不同的计数前缀，避免与之前生成的 token 重复
+        converter_options['token_seed'] = (converter_options.get('token_seed', 0), 'update', index['generation'])
+    converter = Geojson2Nuscenesjson(resolution=meta['resolution'], origin=meta['origin'],
+                                     image_height=meta['image_height'], image_width=meta['image_width'],
+                                     **converter_options)
+
+    # 先对比所有图层的要素哈希，没有任何变化时不读写地图
+    diffs = []
+    for layer in layers:
+        features, semantic_type, needs_clean = _layer_features(converter, layer)
+        name = layer_id(layer)
+        old_features = index['layers'].get(name, {}).get('features', {})
+        keys = feature_keys(features)
+        changed = [(i, key, digest) for i, (key, digest) in enumerate(keys)
+                   if old_features.get(key, {}).get('digest') != digest]
+        new_keys = {key for key, _ in keys}
+        removed = [key for key in old_features if key not in new_keys]
+        if needs_clean:
+            features = {i: _clean_feature(features[i]) for i, _, _ in changed}
+        diffs.append((name, semantic_type, features, keys, old_features, changed, removed))
+    if os.path.exists(output_path) and not any(changed or removed for *_, changed, removed in diffs):
+        print(f"{output_path}: 所有要素均未修改")
+        patch = {'removed': {}, 'upserted': {}, 'canvas_edge': None,
+                 'features': {name: {'added': 0, 'modified': 0, 'removed': 0, 'unchanged': len(keys)}
+                              for name, _, _, keys, *_ in diffs}}
+        if patch_path:
+            with open(patch_path, 'w') as f:
+                json.dump(patch, f, indent=4)
+        return patch
+
+    nuscenes_map = _load_json(output_path) or _load_json(template) or {}
+    for table in _GEOMETRY_TABLES:
+        nuscenes_map.setdefault(table, [])
+    # 新要素的顶点与旧地图中坐标相同的节点复用旧 token
+    for node in nuscenes_map['node']:
+        if isinstance(node.get('x'), float) and isinstance(node.get('y'), float):
+            converter.node_registry.register(node['token'], node['x'], node['y'])
+
+    removed_entries = []
+    rename = {}
+    feature_stats = {}
+    for name, semantic_type, features, keys, old_features, changed, removed in diffs:
+        entries = _convert_features(converter, [features[i] for i, _, _ in changed],
+                                    [i for i, _, _ in changed], [digest for _, _, digest in changed], semantic_type)
+        layer_features = {key: old_features[key] for key, _ in keys if key in old_features}
+        modified = 0
+        for (_, key, _), entry in zip(changed, entries):
+            if key in old_features:
+                modified += 1
+                removed_entries.append(old_features[key])
+                _reuse_tokens(old_features[key], entry, rename)
+            layer_features[key] = entry
+        removed_entries.extend(old_features[key] for key in removed)
+        index['layers'][name] = {'semantic_type': semantic_type, 'features': layer_features}
+        feature_stats[name] = {'added': len(changed) - modified, 'modified': modified, 'removed': len(removed),
+                               'unchanged': len(keys) - len(changed)}
+        print(f"{name}: {feature_stats[name]}")
+    _rename_records(converter, rename)
+
+    # 删除被删除 / 修改的要素原来的记录，再追加新记录
+    removed_tokens = {}
+    candidate_nodes = set()
+    for entry in removed_entries:
+        for table, tokens in entry.items():
+            if table == 'node':
+                candidate_nodes.update(tokens)
+            elif table != 'digest':
+                removed_tokens.setdefault(table, set()).update(tokens)
+    upserted = {'node': converter.node_list, 'line': converter.line_list, 'polygon': converter.polygon_list}
+    upserted.update({table: records for table, records in converter.semantic_data.items() if records})
+    for table, tokens in removed_tokens.items():
+        if table in nuscenes_map:
+            nuscenes_map[table] = [record for record in nuscenes_map[table] if record['token'] not in tokens]
+    for table, records in upserted.items():
+        nuscenes_map.setdefault(table, []).extend(records)
+
+    # 不再被任何 line / polygon / 要素引用的节点随之删除
+    orphan_nodes = candidate_nodes - _referenced_nodes(nuscenes_map, index)
+    if orphan_nodes:
+        nuscenes_map['node'] = [node for node in nuscenes_map['node'] if node['token'] not in orphan_nodes]
+    removed_tokens['node'] = orphan_nodes
+
+    canvas_edge = [converter.image_width * converter.resolution, converter.image_height * converter.resolution]
+    if nuscenes_map.setdefault('canvas_edge', canvas_edge) != canvas_edge:
+        raise ValueError(f"Canvas edge mismatch: existing {nuscenes_map['canvas_edge']} vs new {canvas_edge}")
+
+    upserted_tokens = {table: {record['token'] for record in records} for table, records in upserted.items()}
+    patch = {
+        'removed': {table: sorted(tokens - upserted_tokens.get(table, set()))
+                    for table, tokens in removed_tokens.items() if tokens - upserted_tokens.get(table, set())},
+        'upserted': {table: records for table, records in upserted.items() if records},
+        'canvas_edge': canvas_edge,
+        'features': feature_stats,
+    }
+
+    write_nuscenes_map(nuscenes_map, output_path, compact=compact, float_precision=float_precision,
+                       fast_encoder=fast_encoder)
+    with open(index_path, 'w') as f:
+        json.dump(index, f, separators=(',', ':'))
+    if patch_path:
+        with open(patch_path, 'w') as f:
+            json.dump(patch, f, indent=4)
+    print(f"Incremental update saved to {output_path}: "
+          f"{sum(len(records) for records in patch['upserted'].values())} records upserted, "
+          f"{sum(len(tokens) for tokens in patch['removed'].values())} removed")
+    return patch
+
+
+def apply_patch(nuscenes_map, patch):
+    """
+    将 update_map 写出的补丁应用到旧地图（原地修改并返回）：先删除 removed 与 upserted 中的 token，再追加 upserted 的记录。
+    """
+    for table in set(patch['removed']) | set(patch['upserted']):
+        tokens = set(patch['removed'].get(table, ()))
+        tokens.update(record['token'] for record in patch['upserted'].get(table, ()))
+        if table in nuscenes_map:
+            nuscenes_map[table] = [record for record in nuscenes_map[table] if record['token'] not in tokens]
+    for table, records in patch['upserted'].items():
+        nuscenes_map.setdefault(table, []).extend(records)
+    if patch['canvas_edge'] is not None:
+        nuscenes_map.setdefault('canvas_edge', patch['canvas_edge'])
+    return nuscenes_map
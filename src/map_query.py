@@ -0,0 +1,169 @@
+"""
+输出地图（NuScenesMap JSON 或 .nmap）的空间索引与区域查询。
+每个语义层（road_divider / road_segment / lane ...）各建一棵 shapely STRtree，树中存放记录几何的包围盒，
+查询时用（可旋转的）patch 多边形一次性求交，不再逐条扫描全部几何。
+
+patch_box 与 nuscenes-devkit 一致: (center_x, center_y, height, width)，patch_angle 为角度（逆时针）。
+"""
+import json
+
+import numpy as np
+import shapely
+
+LINE_LAYERS = ('road_divider', 'lane_divider', 'traffic_light')
+POLYGON_LAYERS = ('drivable_area', 'road_segment', 'road_block', 'lane', 'ped_crossing', 'walkway',
+                  'stop_line', 'carpark_area', 'lane_connector')
+
+
+def patch_polygons(patch_boxes, patch_angles=None):
+    """
+    (N, 4) patch_box + (N,) 角度 -> (N,) shapely Polygon 数组（向量化构造）。
+    """
+    patch_boxes = np.atleast_2d(np.asarray(patch_boxes, dtype=np.float64))
+    cx, cy, height, width = patch_boxes.T
+    # 角点顺序与 shapely.box 相同，先在 patch 局部坐标系中构造再旋转平移
+    local = np.stack([
+        np.stack([width / 2, -height / 2], axis=-1),
+        np.stack([width / 2, height / 2], axis=-1),
+        np.stack([-width / 2, height / 2], axis=-1),
+        np.stack([-width / 2, -height / 2], axis=-1),
+    ], axis=1)
+    if patch_angles is None:
+        angles = np.zeros(len(patch_boxes))
+    else:
+        angles = np.radians(np.broadcast_to(np.asarray(patch_angles, dtype=np.float64), (len(patch_boxes),)))
+    cos, sin = np.cos(angles)[:, None], np.sin(angles)[:, None]
+    corners = np.empty_like(local)
+    corners[..., 0] = local[..., 0] * cos - local[..., 1] * sin + cx[:, None]
+    corners[..., 1] = local[..., 0] * sin + local[..., 1] * cos + cy[:, None]
+    return shapely.polygons(corners)
+
+
+class MapSpatialIndex:
+    """
+    参数:
+    - nuscenes_map: NuScenesMap 字典（assemble_nuscenes_map 的结果或读入的地图 JSON）
+    - layer_names: 需要建立索引的语义层，默认为 LINE_LAYERS + POLYGON_LAYERS 中地图里存在的层
+    """
+
+    def __init__(self, nuscenes_map, layer_names=None):
+        if layer_names is None:
+            layer_names = [name for name in LINE_LAYERS + POLYGON_LAYERS if name in nuscenes_map]
+
+        self._nodes = {node['token']: (node['x'], node['y']) for node in nuscenes_map.get('node', [])}
+        self._lines = {line['token']: line for line in nuscenes_map.get('line', [])}
+        self._polygons = {polygon['token']: polygon for polygon in nuscenes_map.get('polygon', [])}
+
+        self._tokens = {}
+        self._rows = {}  # {layer_name: {token: 行号}}
+        self._bounds = {}
+        self._trees = {}
+        self._coords = {}
+        self._geometries = {}
+        for name in layer_names:
+            self._build_layer(name, nuscenes_map.get(name, []))
+
+    @classmethod
+    def load(cls, path, layer_names=None):
+        """读取 .json 或 .nmap（列式格式）地图。"""
+        if str(path).endswith('.nmap'):
+            from columnar_map import ColumnarMap
+            return cls(ColumnarMap(path).to_nuscenes_json(), layer_names)
+        with open(path, 'r') as f:
+            return cls(json.load(f), layer_names)
+
+    @property
+    def layer_names(self):
+        return tuple(self._trees)
+
+    def _record_coords(self, layer_name, record):
+        if layer_name in LINE_LAYERS:
+            line = self._lines.get(record.get('line_token'))
+            node_tokens = line['node_tokens'] if line else []
+        else:
+            polygon = self._polygons.get(record.get('polygon_token'))
+            node_tokens = polygon['exterior_node_tokens'] if polygon else []
+        coords = [self._nodes[t] for t in node_tokens if t in self._nodes]
+        return np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+
+    def _build_layer(self, layer_name, records):
+        tokens, coords = [], []
+        for record in records:
+            xy = self._record_coords(layer_name, record)
+            if len(xy):
+                tokens.append(record['token'])
+                coords.append(xy)
+        bounds = np.array([[c[:, 0].min(), c[:, 1].min(), c[:, 0].max(), c[:, 1].max()] for c in coords],
+                          dtype=np.float64).reshape(-1, 4)
+
+        self._tokens[layer_name] = np.array(tokens, dtype=object)
+        self._rows[layer_name] = {token: i for i, token in enumerate(tokens)}
+        self._bounds[layer_name] = bounds
+        self._trees[layer_name] = shapely.STRtree(shapely.box(*bounds.T))
+        self._coords[layer_name] = coords
+        self._geometries[layer_name] = [None] * len(coords)
+
+    def _geometry(self, layer_name, i):
+        # 精确几何按需构造并缓存
+        geometry = self._geometries[layer_name][i]
+        if geometry is None:
+            coords = self._coords[layer_name][i]
+            if layer_name in LINE_LAYERS and len(coords) > 1:
+                geometry = shapely.linestrings(coords)
+            elif len(coords) > 2:
+                geometry = shapely.polygons(coords)
+            else:
+                geometry = shapely.multipoints(coords)
+            self._geometries[layer_name][i] = geometry
+        return geometry
+
+    def _mask(self, layer_name, patches, tree_indexes, mode):
+        """patches 与 tree_indexes 逐对比较（patches 可以是单个几何），返回保留的布尔掩码。"""
+        if mode == 'intersect':
+            return np.ones(len(tree_indexes), dtype=bool)
+        if mode == 'within':
+            boxes = self._trees[layer_name].geometries.take(tree_indexes)
+            return shapely.within(boxes, patches)
+        if mode == 'exact':
+            geometries = np.empty(len(tree_indexes), dtype=object)
+            geometries[:] = [self._geometry(layer_name, i) for i in tree_indexes]
+            return shapely.intersects(geometries, patches)
+        raise ValueError(f"Unknown mode {mode!r}, expected 'intersect', 'within' or 'exact'")
+
+    def query(self, patch_box, patch_angle=0.0, layer_names=None, mode='intersect'):
+        """
+        返回 {layer_name: [record token, ...]}。
+        参数:
+        - mode: 'intersect' 包围盒与 patch 相交（与 nuscenes-devkit get_records_in_patch 相同）;
+                'within' 包围盒完全在 patch 内; 'exact' 记录几何本身与 patch 相交
+        """
+        patch = patch_polygons([patch_box], [patch_angle])[0]
+        result = {}
+        for name in layer_names or self.layer_names:
+            tree_indexes = self._trees[name].query(patch, predicate='intersects')
+            tree_indexes = np.sort(tree_indexes[self._mask(name, patch, tree_indexes, mode)])
+            result[name] = self._tokens[name][tree_indexes].tolist()
+        return result
+
+    def query_batch(self, patch_boxes, patch_angles=None, layer_names=None, mode='intersect'):
+        """
+        多个 patch 的批量查询，每层只调用一次 STRtree.query，'within' / 'exact' 的精确判断也是逐对向量化的。
+        返回长度为 N 的列表，每项与 query 的返回值相同。
+        """
+        patches = patch_polygons(patch_boxes, patch_angles)
+        results = [{} for _ in range(len(patches))]
+        for name in layer_names or self.layer_names:
+            patch_indexes, tree_indexes = self._trees[name].query(patches, predicate='intersects')
+            keep = self._mask(name, patches[patch_indexes], tree_indexes, mode)
+            patch_indexes, tree_indexes = patch_indexes[keep], tree_indexes[keep]
+            order = np.lexsort((tree_indexes, patch_indexes))
+            patch_indexes, tree_indexes = patch_indexes[order], tree_indexes[order]
+            splits = np.searchsorted(patch_indexes, np.arange(len(patches) + 1))
+            tokens = self._tokens[name]
+            for i, result in enumerate(results):
+                result[name] = tokens[tree_indexes[splits[i]:splits[i + 1]]].tolist()
+        return results
+
+    def record_coords(self, layer_name, token):
+        """返回某条记录的外环/折线坐标 (K, 2)。"""
+        return self._coords[layer_name][self._rows[layer_name][token]]
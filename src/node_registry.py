@@ -0,0 +1,68 @@
+import math
+
+
+class NodeRegistry:
+    """
+    基于哈希表的节点去重注册表，供 Geojson2Nuscenesjson 的 LineString / Polygon 外环 / 孔洞共用。
+    - tolerance 为 0（默认）时，键为原始 (x, y)，与原先逐个比较 x == x' and y == y' 的语义一致
+    - tolerance > 0 时，按 tolerance 把坐标量化到网格，查找所在格及相邻 8 格，
+      距离不超过 tolerance 的已有节点即视为同一节点（吸附）
+    两种模式的查找都是 O(1)，同一坐标以最先注册的 token 为准。
+    """
+
+    def __init__(self, tolerance=0.0):
+        """
+        参数:
+        - tolerance: 吸附容差（与坐标同单位，米），0 表示精确相等
+        """
+        if tolerance < 0:
+            raise ValueError(f"tolerance must be >= 0, got {tolerance}")
+        self.tolerance = tolerance
+        self._index = {}
+        self.hits = 0  # 命中已有节点的次数
+
+    def __len__(self):
+        if not self.tolerance:
+            return len(self._index)
+        return sum(len(cell) for cell in self._index.values())
+
+    def _cell(self, x, y):
+        return (math.floor(x / self.tolerance), math.floor(y / self.tolerance))
+
+    def lookup(self, x, y):
+        """
+        查找 (x, y) 对应的已有节点 token，不存在则返回 None。
+        """
+        if not self.tolerance:
+            return self._index.get((x, y))
+
+        cx, cy = self._cell(x, y)
+        best_token, best_dist = None, None
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for nx, ny, tok in self._index.get((cx + dx, cy + dy), ()):
+                    dist = math.hypot(nx - x, ny - y)
+                    if dist <= self.tolerance and (best_dist is None or dist < best_dist):
+                        best_token, best_dist = tok, dist
+        return best_token
+
+    def register(self, token, x, y):
+        """
+        登记一个节点（例如 Point 要素自带 token 的节点）。已有同坐标节点时保留先登记的。
+        """
+        if not self.tolerance:
+            self._index.setdefault((x, y), token)
+        else:
+            self._index.setdefault(self._cell(x, y), []).append((x, y, token))
+
+    def get_or_create(self, x, y, token_factory):
+        """
+        返回 (token, is_new)。坐标已存在时复用其 token，否则调用 token_factory(x, y) 生成新 token 并登记。
+        """
+        token = self.lookup(x, y)
+        if token is not None:
+            self.hits += 1
+            return token, False
+        token = token_factory(x, y)
+        self.register(token, x, y)
+        return token, True
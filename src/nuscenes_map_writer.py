@@ -0,0 +1,120 @@
+"""
+NuScenesMap JSON 的流式写出。
+顶层的 node / line / polygon / 语义层等数组按块编码后逐块写入文件，不需要先把整个地图编码成一个大字符串。
+- 默认模式：与 json.dump(nuscenes_map, f, indent=4) 的输出逐字节相同
+- compact 模式：无缩进、无多余空格，可配合 float_precision 固定 node 坐标的小数位数
+- fast_encoder：使用 orjson 编码（需要 pip install orjson，仅 compact 模式可用）
+输出仍是标准 JSON，nuScenes devkit 的 NuScenesMap 可直接读取。
+"""
+import json
+
+CHUNK_SIZE = 4096  # 每次编码并写入的数组元素个数
+
+
+def _import_orjson():
+    try:
+        import orjson
+    except ImportError as e:
+        raise ImportError("fast_encoder 需要安装 orjson: pip install orjson") from e
+    return orjson
+
+
+def _round_nodes(nodes, float_precision):
+    for node in nodes:
+        yield {**node, 'x': round(node['x'], float_precision), 'y': round(node['y'], float_precision)}
+
+
+def _chunks(items):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= CHUNK_SIZE:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _write_indented(nuscenes_map, f):
+    """
+    按 json.dump(indent=4) 的格式写出：顶层数组按块编码，去掉块自身的 [ ] 后再整体缩进 4 个空格。
+    """
+    f.write('{')
+    first_key = True
+    for key, value in nuscenes_map.items():
+        f.write('\n    ' if first_key else ',\n    ')
+        first_key = False
+        f.write(json.dumps(key) + ': ')
+        if isinstance(value, list) and value:
+            f.write('[')
+            first_item = True
+            for chunk in _chunks(value):
+                if not first_item:
+                    f.write(',')
+                # json.dumps(chunk, indent=4) 形如 '[\n    {...},\n    {...}\n]'
+                f.write(json.dumps(chunk, indent=4)[1:-2].replace('\n', '\n    '))
+                first_item = False
+            f.write('\n    ]')
+        else:
+            f.write(json.dumps(value, indent=4).replace('\n', '\n    '))
+    f.write('\n}' if not first_key else '}')
+
+
+def _write_compact(nuscenes_map, f, dumps):
+    """
+    紧凑格式写出，dumps 负责把一个 list 编码为 JSON 数组字符串。
+    """
+    f.write('{')
+    first_key = True
+    for key, value in nuscenes_map.items():
+        if not first_key:
+            f.write(',')
+        first_key = False
+        f.write(dumps(key) + ':')
+        if isinstance(value, (list, tuple)) or hasattr(value, '__next__'):
+            f.write('[')
+            first_item = True
+            for chunk in _chunks(value):
+                if not first_item:
+                    f.write(',')
+                f.write(dumps(chunk)[1:-1])  # 去掉块自身的 [ ]
+                first_item = False
+            f.write(']')
+        else:
+            f.write(dumps(value))
+    f.write('}')
+
+
+def write_nuscenes_map(nuscenes_map, output_path, compact=False, float_precision=None, fast_encoder=False):
+    """
+    将 NuScenesMap 字典流式写入 output_path。
+    参数:
+    - nuscenes_map: assemble_nuscenes_map / merge_maps 得到的字典
+    - output_path: 输出文件路径
+    - compact: 是否使用紧凑格式（不缩进），文件更小、写入更快
+    - float_precision: 仅 compact 模式有效，node 的 x/y 和 canvas_edge 保留的小数位数，None 表示不取整
+    - fast_encoder: 仅 compact 模式有效，使用 orjson 编码
+    """
+    if not compact:
+        if float_precision is not None or fast_encoder:
+            raise ValueError("float_precision / fast_encoder 仅在 compact=True 时可用")
+        with open(output_path, 'w') as f:
+            _write_indented(nuscenes_map, f)
+        return
+
+    if float_precision is not None:
+        nuscenes_map = dict(nuscenes_map)
+        if 'node' in nuscenes_map:
+            nuscenes_map['node'] = _round_nodes(nuscenes_map['node'], float_precision)
+        if 'canvas_edge' in nuscenes_map:
+            nuscenes_map['canvas_edge'] = [round(v, float_precision) for v in nuscenes_map['canvas_edge']]
+
+    if fast_encoder:
+        orjson = _import_orjson()
+        dumps = lambda obj: orjson.dumps(obj).decode('utf-8')  # noqa: E731
+    else:
+        encoder = json.JSONEncoder(separators=(',', ':'))
+        dumps = encoder.encode
+
+    with open(output_path, 'w') as f:
+        _write_compact(nuscenes_map, f, dumps)
@@ -0,0 +1,60 @@
+import json
+
+
+class TableIndex:
+    """
+    nuScenes 表（sample_data.json / sample.json / ego_pose.json 等 list[dict]）的哈希索引。
+    加载时对指定字段各建一次 value -> [记录] 的索引，之后按字段查找都是 O(1)，
+    替代逐帧调用 find_json_with_key / find_all_json_with_key 的线性扫描。
+    记录本身不复制，通过索引取到的 dict 修改后会直接反映到 self.records 中。
+    """
+
+    def __init__(self, records, keys=('token',)):
+        """
+        参数:
+        - records: 表记录列表
+        - keys: 需要建立索引的字段名
+        """
+        self.records = records
+        self._indexes = {}
+        for key in keys:
+            index = {}
+            for record in records:
+                value = record.get(key)
+                if value is not None:
+                    index.setdefault(value, []).append(record)
+            self._indexes[key] = index
+
+    @classmethod
+    def load(cls, path, keys=('token',)):
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f), keys)
+
+    def __len__(self):
+        return len(self.records)
+
+    def _index(self, key):
+        try:
+            return self._indexes[key]
+        except KeyError:
+            raise KeyError(f"字段 {key!r} 没有建立索引，可用: {tuple(self._indexes)}") from None
+
+    def get(self, key, value, default=None):
+        """
+        返回第一条 record[key] == value 的记录（与 find_json_with_key 相同），不存在返回 default。
+        """
+        matched = self._index(key).get(value)
+        return matched[0] if matched else default
+
+    def get_all(self, key, value):
+        """
+        返回所有 record[key] == value 的记录（与 find_all_json_with_key 相同）。
+        """
+        return list(self._index(key).get(value, ()))
+
+    def get_many(self, key, values, default=None):
+        """
+        批量版本的 get，按 values 的顺序返回。
+        """
+        index = self._index(key)
+        return [index[value][0] if value in index else default for value in values]
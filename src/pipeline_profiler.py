@@ -0,0 +1,162 @@
+"""
+转换流程的计时与计数。
+- stage(name): 上下文管理器，累计每个阶段（load / shapely / transform / reduce / dedup / assemble / merge / dump）的耗时与调用次数，
+  track_memory=True 时用 tracemalloc 记录每个阶段内的内存峰值
+- count(name, n): 计数器（features / vertices / nodes / dedup_hits / tokens ...）
+- report(): 结构化结果（dict，可直接写成 JSON），用于夜间重建地图时比对性能回归
+Geojson2Nuscenesjson 默认使用 NULL_PROFILER，不计时、几乎没有额外开销。
+
+用法:
+    python src/cli.py convert resource/AIR_F11/AIR_F11.yaml resource/AIR_F11/road_divider.geojson \\
+        -o output_nuscenes_map.json --report profile.json --memory --profile convert.pstats
+"""
+import json
+import time
+import tracemalloc
+
+
+class _Stage:
+    __slots__ = ('profiler', 'name', 'seconds', 'calls', 'peak_bytes', '_start')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.seconds = 0.0
+        self.calls = 0
+        self.peak_bytes = 0
+        self._start = 0.0
+
+    def __enter__(self):
+        if self.profiler.track_memory:
+            tracemalloc.reset_peak()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.seconds += time.perf_counter() - self._start
+        self.calls += 1
+        if self.profiler.track_memory:
+            self.peak_bytes = max(self.peak_bytes, tracemalloc.get_traced_memory()[1])
+        return False
+
+
+class PipelineProfiler:
+    """
+    参数:
+    - track_memory: 为 True 时启动 tracemalloc（会明显拖慢转换，只在排查内存时使用）
+    """
+    enabled = True
+
+    def __init__(self, track_memory=False):
+        self.track_memory = track_memory
+        self._stages = {}
+        self.counters = {}
+        self._created = time.perf_counter()
+        if track_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def stage(self, name):
+        stage = self._stages.get(name)
+        if stage is None:
+            stage = self._stages[name] = _Stage(self, name)
+        return stage
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def set_counter(self, name, value):
+        self.counters[name] = value
+
+    def report(self):
+        stages = {}
+        for name, stage in self._stages.items():
+            stages[name] = {'seconds': stage.seconds, 'calls': stage.calls}
+            if self.track_memory:
+                stages[name]['peak_bytes'] = stage.peak_bytes
+        return {
+            'wall_seconds': time.perf_counter() - self._created,
+            'stages': stages,
+            'counters': dict(self.counters),
+        }
+
+    def write_json(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.report(), f, indent=4)
+
+    def print_report(self):
+        report = self.report()
+        print(f"{'stage':<18} {'seconds':>10} {'calls':>10}" + (f" {'peak MB':>10}" if self.track_memory else ''))
+        for name, stage in report['stages'].items():
+            line = f"{name:<18} {stage['seconds']:>10.3f} {stage['calls']:>10}"
+            if self.track_memory:
+                line += f" {stage['peak_bytes'] / 1e6:>10.1f}"
+            print(line)
+        for name, value in report['counters'].items():
+            print(f"{name:<18} {value:>10}")
+        print(f"{'wall':<18} {report['wall_seconds']:>10.3f}")
+
+
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+class NullProfiler:
+    """不做任何记录的 profiler，作为默认值。"""
+    enabled = False
+    _stage = _NullStage()
+
+    def stage(self, name):
+        return self._stage
+
+    def count(self, name, n=1):
+        pass
+
+    def set_counter(self, name, value):
+        pass
+
+    def report(self):
+        return {'wall_seconds': 0.0, 'stages': {}, 'counters': {}}
+
+
+NULL_PROFILER = NullProfiler()
+
+
+def merge_reports(reports):
+    """将多个 report（例如批量转换中各子进程的图层）的阶段耗时与计数相加。"""
+    merged = {'wall_seconds': 0.0, 'stages': {}, 'counters': {}}
+    for report in reports:
+        merged['wall_seconds'] += report['wall_seconds']
+        for name, stage in report['stages'].items():
+            total = merged['stages'].setdefault(name, {key: 0 for key in stage})
+            for key, value in stage.items():
+                total[key] = max(total[key], value) if key == 'peak_bytes' else total[key] + value
+        for name, value in report['counters'].items():
+            merged['counters'][name] = merged['counters'].get(name, 0) + value
+    return merged
+
+
+def run_profiled(func, profile_path=None):
+    """
+    执行 func()；给出 profile_path 时用 cProfile 包装并把统计结果写到该文件（可用 pstats / snakeviz 查看）。
+    """
+    if profile_path is None:
+        return func()
+    import cProfile
+    profile = cProfile.Profile()
+    try:
+        return profile.runcall(func)
+    finally:
+        profile.dump_stats(profile_path)
+
+
+if __name__ == '__main__':
+    # 等价于 python src/cli.py convert <map_yaml> <geojson ...> --report ...
+    import sys
+    from cli import main
+    main(['convert'] + sys.argv[1:])
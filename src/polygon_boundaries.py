@@ -0,0 +1,67 @@
+"""
+多边形图层（如 road_segment，含 MultiPolygon 与孔洞）直接生成边界线 road_divider，
+替代 Usage.md 中 QGIS 的 polygon to lines -> merge -> multipart to singleparts 三步:
+- 外环与孔洞都作为边界环，全部坐标拼成一个数组后一次性构造 LineString（shapely 向量化函数）
+- union_all 在交点处打断并去掉相邻多边形的重合边，line_merge 把首尾相接的线段合并为最长的折线
+- get_parts 拆成单独的 LineString
+
+用法:
+    python src/polygon_boundaries.py road_segment.geojson -o road_divider.geojson
+"""
+import argparse
+import json
+
+import geojson
+import numpy as np
+import shapely
+
+from polygon_nesting import collect_rings
+
+
+def boundary_lines(features):
+    """
+    返回 (K, 2) 坐标数组列表，每项是一条合并后的边界线。
+    """
+    _, coords, _ = collect_rings(features)
+    if not coords:
+        return []
+    line_ids = np.repeat(np.arange(len(coords)), [len(c) for c in coords])
+    lines = shapely.linestrings(np.concatenate(coords), indices=line_ids)
+    merged = shapely.line_merge(shapely.union_all(lines))
+    parts = shapely.get_parts(merged)
+    parts = parts[shapely.get_type_id(parts) == shapely.GeometryType.LINESTRING]
+    return [shapely.get_coordinates(part) for part in parts]
+
+
+def boundary_features(features):
+    """
+    返回边界线的 GeoJSON LineString 要素（dict）列表。
+    """
+    return [
+        {'type': 'Feature', 'properties': {}, 'geometry': {'type': 'LineString', 'coordinates': line.tolist()}}
+        for line in boundary_lines(features)
+    ]
+
+
+def boundary_geojson_layers(geojson_paths, name='road_divider'):
+    """
+    读取多个多边形图层，返回名为 name 的边界线 FeatureCollection。
+    """
+    features = []
+    for path in geojson_paths:
+        with open(path, 'r') as f:
+            features.extend(geojson.load(f)['features'])
+    return {'type': 'FeatureCollection', 'name': name, 'features': boundary_features(features)}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="由多边形图层生成合并后的边界线图层（road_divider）")
+    parser.add_argument('geojson', nargs='+', help='多边形图层（如 road_segment）')
+    parser.add_argument('-o', '--output', required=True)
+    parser.add_argument('--name', default='road_divider', help='输出 FeatureCollection 的 name（即语义类型）')
+    args = parser.parse_args()
+
+    collection = boundary_geojson_layers(args.geojson, args.name)
+    with open(args.output, 'w') as f:
+        json.dump(collection, f)
+    print(f"{len(collection['features'])} lines written to {args.output}")
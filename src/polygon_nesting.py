@@ -0,0 +1,153 @@
+"""
+多边形内外环自动嵌套，替代 Usage.md 中手工把 holes 图层的多边形移进外轮廓 holes 的步骤。
+外轮廓（如 road_segment out）与内轮廓（road_segment holes）分别标注在不同图层中，这里把所有图层的环放在一起:
+- 用 STRtree 查询每个环被哪些环包含（只对包围盒相交的候选做精确判断，不做两两比较）
+- 包含它的环的个数即嵌套深度，深度为偶数的环是多边形外环，奇数的环是其直接父环（面积最小的包含环）的孔洞
+- 孔洞里面再标注的环（深度 2、4 ...）又成为新的多边形，可以任意层嵌套
+
+用法:
+    python src/polygon_nesting.py road_segment_out.geojson road_segment_holes.geojson -o road_segment.geojson
+"""
+import argparse
+import json
+
+import geojson
+import numpy as np
+import shapely
+
+
+def _iter_polygon_coordinates(geometry):
+    if geometry['type'] == 'Polygon':
+        yield geometry['coordinates']
+    elif geometry['type'] == 'MultiPolygon':
+        yield from geometry['coordinates']
+    elif geometry['type'] == 'GeometryCollection':
+        for part in geometry['geometries']:
+            yield from _iter_polygon_coordinates(part)
+
+
+def collect_rings(features):
+    """
+    将要素中的 Polygon / MultiPolygon 拆成单独的环（外环与已有的孔洞都各自作为一个环）。
+    所有环的坐标拼成一个数组后一次性构造 shapely 几何；完全相同的环只保留第一次出现的。
+    返回 (rings, coords, sources):
+    - rings: 环对应的无孔 Polygon 数组
+    - coords: 每个环的 (K, 2) 坐标（与 GeoJSON 中的取值相同）
+    - sources: 每个环来源要素的下标
+    """
+    coords, sources = [], []
+    for index, feature in enumerate(features):
+        geometry = feature['geometry']
+        if not geometry:
+            continue
+        for polygon in _iter_polygon_coordinates(geometry):
+            for ring in polygon:
+                if len(ring) >= 4:
+                    coords.append(np.asarray(ring, dtype=np.float64)[:, :2])
+                    sources.append(index)
+    if not coords:
+        return np.empty(0, dtype=object), [], np.zeros(0, dtype=np.int64)
+
+    ring_ids = np.repeat(np.arange(len(coords)), [len(c) for c in coords])
+    rings = shapely.polygons(shapely.linearrings(np.concatenate(coords), indices=ring_ids))
+    keys = shapely.to_wkb(shapely.normalize(rings))
+    _, first = np.unique(keys, return_index=True)
+    keep = np.sort(first)
+    return rings[keep], [coords[i] for i in keep], np.asarray(sources, dtype=np.int64)[keep]
+
+
+def nest_rings(rings):
+    """
+    返回 (parents, depths): 每个环的直接父环下标（没有则为 -1）与嵌套深度。
+    """
+    n = len(rings)
+    parents = np.full(n, -1, dtype=np.int64)
+    if n == 0:
+        return parents, np.zeros(0, dtype=np.int64)
+
+    tree = shapely.STRtree(rings)
+    inner, outer = tree.query(rings, predicate='within')
+    keep = inner != outer
+    inner, outer = inner[keep], outer[keep]
+    depths = np.bincount(inner, minlength=n)
+
+    # 每个环的所有包含环中面积最小的就是直接父环
+    areas = shapely.area(rings)
+    order = np.lexsort((areas[outer], inner))
+    inner, outer = inner[order], outer[order]
+    first = np.ones(len(inner), dtype=bool)
+    first[1:] = inner[1:] != inner[:-1]
+    parents[inner[first]] = outer[first]
+    return parents, depths
+
+
+def build_nested_polygons(parents, depths):
+    """
+    按嵌套关系组合，返回 [(外环下标, [孔洞下标, ...]), ...]，按外环下标排序。
+    父环不是外环的奇数层环（标注有重叠等不合法嵌套）按独立多边形处理。
+    """
+    is_shell = (depths % 2 == 0) | (parents < 0)
+    holes = {}
+    for i in np.flatnonzero(~is_shell):
+        parent = parents[i]
+        if is_shell[parent]:
+            holes.setdefault(parent, []).append(i)
+        else:
+            is_shell[i] = True
+    return [(i, holes.get(i, [])) for i in np.flatnonzero(is_shell)]
+
+
+def nest_features(features):
+    """
+    对一组要素（可来自多个图层）做内外环嵌套，返回 GeoJSON Polygon 要素（dict）列表，
+    每个多边形的 properties 取自其外环来源的要素。非多边形要素被忽略。
+    一个来源要素拆成多个外环时（MultiPolygon 或重叠标注），与 process_geometry 拆分多部件几何相同，
+    指定的 token 只给第一个外环，避免多个多边形共用同一个 token。
+    """
+    features = list(features)
+    rings, coords, sources = collect_rings(features)
+    parents, depths = nest_rings(rings)
+    nested = []
+    used_sources = set()
+    for shell_index, hole_indexes in build_nested_polygons(parents, depths):
+        source = sources[shell_index]
+        properties = dict(features[source].get('properties') or {})
+        if source in used_sources:
+            properties.pop('token', None)
+        used_sources.add(source)
+        nested.append({
+            'type': 'Feature',
+            'properties': properties,
+            'geometry': {
+                'type': 'Polygon',
+                'coordinates': [coords[shell_index].tolist()] + [coords[i].tolist() for i in hole_indexes],
+            },
+        })
+    return nested
+
+
+def nest_geojson_layers(geojson_paths, name=None):
+    """
+    读取多个 GeoJSON 图层并嵌套，返回 FeatureCollection。name 默认取第一个图层的 name。
+    """
+    features = []
+    for path in geojson_paths:
+        with open(path, 'r') as f:
+            gj = geojson.load(f)
+        if name is None:
+            name = gj.get('name', 'unknown')
+        features.extend(gj['features'])
+    return {'type': 'FeatureCollection', 'name': name, 'features': nest_features(features)}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="将分开标注的外轮廓与孔洞图层自动嵌套为带 holes 的多边形图层")
+    parser.add_argument('geojson', nargs='+', help='外轮廓图层与孔洞图层（顺序不限）')
+    parser.add_argument('-o', '--output', required=True)
+    parser.add_argument('--name', default=None, help='输出 FeatureCollection 的 name（即语义类型），默认取第一个图层的 name')
+    args = parser.parse_args()
+
+    collection = nest_geojson_layers(args.geojson, args.name)
+    with open(args.output, 'w') as f:
+        json.dump(collection, f)
+    print(f"{len(collection['features'])} polygons written to {args.output}")
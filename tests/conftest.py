@@ -0,0 +1,18 @@
+"""
+测试公共设置: 与 benchmarks 相同，直接按模块名导入 src 中的模块；合成地图由 benchmarks/synthetic_map.py 生成。
+"""
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+
+@pytest.fixture
+def synthetic_map(tmp_path):
+    """小规模合成地图: {'map_yaml', 'layers': [road_divider, road_segment, points], 'vertices'}。"""
+    from synthetic_map import generate
+    return generate(str(tmp_path / 'map'), lines=50, polygons=10, points=10, width=400, height=400)
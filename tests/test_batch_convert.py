@@ -0,0 +1,36 @@
+import json
+
+from batch_convert import run_batch
+
+
+def _job(synthetic_map, output, **options):
+    job = {'name': 'synthetic', 'map_yaml': synthetic_map['map_yaml'], 'layers': synthetic_map['layers'],
+           'output': output, 'token_factory': 'content'}
+    job.update(options)
+    return job
+
+
+def _read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def test_rerun_manifest_gives_identical_output(synthetic_map, tmp_path):
+    output = str(tmp_path / 'out.json')
+    jobs = [_job(synthetic_map, output)]
+
+    assert all(r['ok'] for r in run_batch(jobs, workers=1))
+    first = _read(output)
+    assert all(r['ok'] for r in run_batch(jobs, workers=1))
+    assert _read(output) == first
+
+
+def test_merge_existing_appends_to_output(synthetic_map, tmp_path):
+    output = str(tmp_path / 'out.json')
+    assert all(r['ok'] for r in run_batch([_job(synthetic_map, output)], workers=1))
+    with open(output) as f:
+        nodes = len(json.load(f)['node'])
+
+    assert all(r['ok'] for r in run_batch([_job(synthetic_map, output, merge_existing=True)], workers=1))
+    with open(output) as f:
+        assert len(json.load(f)['node']) == 2 * nodes
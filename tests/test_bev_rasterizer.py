@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+from bev_rasterizer import BEVRasterizer
+from cli import main
+from QGISMap2NuscenesMap import make_converter
+
+
+@pytest.fixture
+def rasterizer(synthetic_map, tmp_path):
+    output = str(tmp_path / 'out.json')
+    main(['convert', synthetic_map['map_yaml'], *synthetic_map['layers'], '-o', output, '--token-factory', 'content'])
+    return BEVRasterizer.from_files(output, synthetic_map['map_yaml'])
+
+
+def test_render_overlay_missing_background_raises(rasterizer, tmp_path):
+    with pytest.raises(FileNotFoundError, match='missing.png'):
+        rasterizer.render_overlay(background=str(tmp_path / 'missing.png'))
+
+
+def test_render_overlay_on_yaml_image(rasterizer):
+    overlay = rasterizer.render_overlay()
+    assert overlay.shape == (rasterizer.image_height, rasterizer.image_width, 3)
+
+
+def test_render_overlay_on_array_background(rasterizer):
+    background = np.zeros((rasterizer.image_height, rasterizer.image_width), dtype=np.uint8)
+    overlay = rasterizer.render_overlay(background=background)
+    assert overlay.shape == (rasterizer.image_height, rasterizer.image_width, 3)
+
+
+def _square_map(squares):
+    """由若干 (外环, [孔洞, ...]) 正方形（世界坐标 (x0, y0, size)）组成的 road_segment 图层。"""
+    nodes, polygons = [], []
+
+    def ring(x0, y0, size):
+        tokens = []
+        for x, y in ((x0, y0), (x0 + size, y0), (x0 + size, y0 + size), (x0, y0 + size)):
+            tokens.append(f'n{len(nodes)}')
+            nodes.append({'token': tokens[-1], 'x': float(x), 'y': float(y)})
+        return tokens
+
+    for i, (exterior, holes) in enumerate(squares):
+        polygons.append({'token': f'p{i}', 'exterior_node_tokens': ring(*exterior),
+                         'holes': [ring(*hole) for hole in holes]})
+    return {'node': nodes, 'line': [], 'polygon': polygons,
+            'road_segment': [{'token': f's{i}', 'polygon_token': p['token']} for i, p in enumerate(polygons)]}
+
+
+def test_masks_union_overlapping_polygons_and_keep_holes_local():
+    meta = {'resolution': 0.5, 'origin': [-60.0, -60.0, 0.0], 'image_height': 200, 'image_width': 200}
+    nuscenes_map = _square_map([
+        ((0, 0, 10), []),              # 与下一个多边形在 (5, 5) - (10, 10) 重叠
+        ((5, 5, 10), []),
+        ((20, 0, 20), [(25, 5, 10)]),  # 带孔洞
+        ((28, 8, 4), []),              # 位于上一个多边形的孔洞中
+    ])
+    rasterizer = BEVRasterizer(nuscenes_map, make_converter({}, meta))
+    mask = rasterizer.render_masks()['road_segment']
+
+    def value(x, y):
+        col, row = np.round(rasterizer.world_to_pixels([x, y])[0]).astype(int)
+        assert 0 <= row < mask.shape[0] and 0 <= col < mask.shape[1]
+        return mask[row, col]
+
+    assert value(2, 2) == 1 and value(12, 12) == 1
+    assert value(7.5, 7.5) == 1        # 重叠区域
+    assert value(22, 2) == 1
+    assert value(26, 6) == 0           # 孔洞
+    assert value(30, 10) == 1          # 孔洞中的另一个多边形
+    assert value(17, 17) == 0
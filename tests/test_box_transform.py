@@ -0,0 +1,26 @@
+import numpy as np
+import pytest
+
+from box_transform import transform_boxes
+
+
+def test_single_box_accepts_one_dimensional_rotation():
+    for rotation in ([1.0, 0.0, 0.0, 0.0], [0.0, 0.0, 0.0], [0.0]):
+        translation, quat = transform_boxes([1, 2, 3], rotation, [0, 0, 0], [1, 0, 0, 0])
+        assert translation.shape == (1, 3) and quat.shape == (1, 4)
+        np.testing.assert_allclose(quat, [[1, 0, 0, 0]])
+
+
+def test_yaws_for_several_boxes():
+    translation, quat = transform_boxes([[1, 2, 3]] * 3, [0.0, 0.1, 0.2], [0, 0, 0], [1, 0, 0, 0])
+    assert translation.shape == (3, 3) and quat.shape == (3, 4)
+
+
+@pytest.mark.parametrize('translations, rotations', [
+    ([[1, 2, 3]] * 2, [0.0, 0.1, 0.2]),
+    ([[1, 2, 3]] * 2, [[1, 0, 0, 0]] * 3),
+    ([1, 2, 3], [1.0, 2.0]),
+])
+def test_rotation_count_must_match_boxes(translations, rotations):
+    with pytest.raises(ValueError):
+        transform_boxes(translations, rotations, [0, 0, 0], [1, 0, 0, 0])
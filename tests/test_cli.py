@@ -0,0 +1,55 @@
+import json
+
+from cli import main
+
+
+def _convert(synthetic_map, output, *extra):
+    main(['convert', synthetic_map['map_yaml'], *synthetic_map['layers'], '-o', output,
+          '--token-factory', 'content', *extra])
+
+
+def _read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def _node_count(path):
+    with open(path) as f:
+        return len(json.load(f)['node'])
+
+
+def test_convert_rerun_gives_identical_output(synthetic_map, tmp_path):
+    output = str(tmp_path / 'out.json')
+    _convert(synthetic_map, output)
+    first = _read(output)
+    _convert(synthetic_map, output)
+    assert _read(output) == first
+
+
+def test_convert_merge_existing_appends(synthetic_map, tmp_path):
+    output = str(tmp_path / 'out.json')
+    _convert(synthetic_map, output)
+    nodes = _node_count(output)
+    _convert(synthetic_map, output, '--merge-existing')
+    assert _node_count(output) == 2 * nodes
+
+
+def test_merge_rerun_gives_identical_output(synthetic_map, tmp_path):
+    part = str(tmp_path / 'part.json')
+    _convert(synthetic_map, part)
+    output = str(tmp_path / 'merged.json')
+    main(['merge', part, '-o', output])
+    first = _read(output)
+    main(['merge', part, '-o', output])
+    assert _read(output) == first
+    assert _node_count(output) == _node_count(part)
+
+
+def test_batched_vertex_reduction_matches_stream(synthetic_map, tmp_path):
+    # 非流式读取时整个图层批量精简，流式读取时逐个要素精简，结果应逐字节相同
+    batched = str(tmp_path / 'batched.json')
+    streamed = str(tmp_path / 'streamed.json')
+    reduction = ['--simplify-tolerance', '0.05', '--resample-spacing', '0.5']
+    _convert(synthetic_map, batched, *reduction)
+    _convert(synthetic_map, streamed, *reduction, '--stream')
+    assert _read(batched) == _read(streamed)
@@ -0,0 +1,88 @@
+"""
+tools/cut_video.py 的端到端测试，需要 ffmpeg（含 libx264）与 ffprobe，找不到时跳过。
+"""
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tools'))
+
+import cut_video  # noqa: E402
+
+pytestmark = pytest.mark.skipif(shutil.which('ffmpeg') is None or shutil.which('ffprobe') is None,
+                                reason='需要 ffmpeg 与 ffprobe')
+
+FPS = 25
+
+
+@pytest.fixture(scope='module')
+def source(tmp_path_factory):
+    """20 秒 25fps 的 h264 High + aac 视频，每 2 秒一个关键帧，时间戳从 10 秒开始（start_time 不为 0）。"""
+    path = str(tmp_path_factory.mktemp('video') / 'src.mp4')
+    subprocess.run([
+        'ffmpeg', '-v', 'error', '-y',
+        '-f', 'lavfi', '-i', f'testsrc2=size=320x240:rate={FPS}',
+        '-f', 'lavfi', '-i', 'sine=frequency=440:sample_rate=48000',
+        '-t', '20', '-c:v', 'libx264', '-profile:v', 'high', '-level:v', '3.1', '-pix_fmt', 'yuv420p',
+        '-g', '50', '-keyint_min', '50', '-sc_threshold', '0', '-bf', '2', '-c:a', 'aac',
+        '-output_ts_offset', '10', path,
+    ], check=True)
+    return path
+
+
+def _frame_checksums(path):
+    out = subprocess.run(['ffmpeg', '-v', 'error', '-i', path, '-map', '0:v:0', '-f', 'framecrc', '-'],
+                         stdout=subprocess.PIPE, check=True, text=True).stdout
+    return [line.split(',')[5].strip() for line in out.splitlines() if not line.startswith('#')]
+
+
+def _duration(path):
+    out = subprocess.run(['ffprobe', '-v', 'error', '-select_streams', 'v:0', '-show_entries', 'stream=duration',
+                          '-of', 'csv=p=0', path], stdout=subprocess.PIPE, check=True, text=True).stdout
+    return float(out)
+
+
+def _decode_errors(path):
+    return subprocess.run(['ffmpeg', '-v', 'error', '-i', path, '-f', 'null', '-'],
+                          stderr=subprocess.PIPE, text=True).stderr.strip()
+
+
+def test_probe_is_relative_to_start_time(source):
+    meta = cut_video.probe_video(source)
+    assert meta['frames'] == 20 * FPS
+    assert meta['keyframes'] == list(range(0, 20 * FPS, 2 * FPS))
+    # aac 的前置样本使容器 start_time 略早于第一帧
+    assert 0 <= meta['video_start'] < 0.1
+    assert meta['keyframe_times'][2 * FPS] == pytest.approx(meta['video_start'] + 2.0, abs=1e-3)
+    assert meta['profile'] == 'High' and meta['level'] == 31
+
+
+def test_smart_cut_is_frame_accurate(source, tmp_path):
+    output = str(tmp_path / 'smart.mp4')
+    cut_video.cut_video(source, output, 3, 9)
+
+    checksums = _frame_checksums(output)
+    assert len(checksums) == 6 * FPS
+    assert _duration(output) == pytest.approx(6.0, abs=1.0 / FPS)
+    assert _decode_errors(output) == ''
+    # 4s - 8s 的两个完整 GOP 直接复制，与原视频逐帧相同
+    assert checksums[FPS:5 * FPS] == _frame_checksums(source)[4 * FPS:8 * FPS]
+
+
+def test_smart_cut_inside_one_gop(source, tmp_path):
+    output = str(tmp_path / 'short.mp4')
+    cut_video.cut_video(source, output, 4.1, 4.9)
+    assert len(_frame_checksums(output)) == 20
+    assert _duration(output) == pytest.approx(0.8, abs=1.0 / FPS)
+    assert _decode_errors(output) == ''
+
+
+def test_copy_mode_snaps_to_keyframes(source, tmp_path):
+    output = str(tmp_path / 'copy.mp4')
+    cut_video.cut_video(source, output, 3, 9, mode='copy')
+    checksums = _frame_checksums(output)
+    assert len(checksums) == 8 * FPS
+    assert checksums == _frame_checksums(source)[2 * FPS:10 * FPS]
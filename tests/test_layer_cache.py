@@ -0,0 +1,46 @@
+import json
+
+from cli import main
+from layer_cache import LayerCache
+
+
+def _convert_cached(synthetic_map, output, cache_dir, capsys):
+    main(['convert', synthetic_map['map_yaml'], *synthetic_map['layers'], '-o', output,
+          '--token-factory', 'content', '--cache-dir', cache_dir])
+    return capsys.readouterr().out
+
+
+def test_cached_rebuild_gives_identical_output(synthetic_map, tmp_path, capsys):
+    output = str(tmp_path / 'out.json')
+    cache_dir = str(tmp_path / 'cache')
+    layers = len(synthetic_map['layers'])
+
+    out = _convert_cached(synthetic_map, output, cache_dir, capsys)
+    assert f"0/{layers} 个图层来自缓存" in out
+    with open(output, 'rb') as f:
+        first = f.read()
+
+    out = _convert_cached(synthetic_map, output, cache_dir, capsys)
+    assert f"{layers}/{layers} 个图层来自缓存" in out
+    with open(output, 'rb') as f:
+        assert f.read() == first
+
+
+def test_cached_rebuild_matches_uncached_convert(synthetic_map, tmp_path, capsys):
+    cached = str(tmp_path / 'cached.json')
+    _convert_cached(synthetic_map, cached, str(tmp_path / 'cache'), capsys)
+    _convert_cached(synthetic_map, cached, str(tmp_path / 'cache'), capsys)
+    plain = str(tmp_path / 'plain.json')
+    main(['convert', synthetic_map['map_yaml'], *synthetic_map['layers'], '-o', plain, '--token-factory', 'content'])
+    with open(cached) as f, open(plain) as g:
+        cached_map, plain_map = json.load(f), json.load(g)
+    assert {k: len(v) for k, v in cached_map.items()} == {k: len(v) for k, v in plain_map.items()}
+
+
+def test_invalidate_removes_layer_entries(synthetic_map, tmp_path, capsys):
+    cache_dir = str(tmp_path / 'cache')
+    _convert_cached(synthetic_map, str(tmp_path / 'out.json'), cache_dir, capsys)
+    cache = LayerCache(cache_dir)
+    assert cache.stats()['entries'] == len(synthetic_map['layers'])
+    assert cache.invalidate(synthetic_map['layers'][0]) == 1
+    assert cache.stats()['entries'] == len(synthetic_map['layers']) - 1
@@ -0,0 +1,151 @@
+import copy
+import json
+
+import pytest
+
+from cli import main
+from map_meta import load_map_meta
+from map_patch import apply_patch, update_map
+
+OPTIONS = {'token_factory': 'content'}
+
+
+def _read_json(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write_json(path, data):
+    with open(path, 'w') as f:
+        json.dump(data, f)
+
+
+def _update(synthetic_map, output, patch=None, options=OPTIONS):
+    return update_map(load_map_meta(synthetic_map['map_yaml']), synthetic_map['layers'], output, dict(options),
+                      patch_path=patch)
+
+
+def _edit_first_line(layer_path, dx=1.0):
+    collection = _read_json(layer_path)
+    coordinates = collection['features'][0]['geometry']['coordinates']
+    coordinates[1] = [coordinates[1][0] + dx, coordinates[1][1]]
+    _write_json(layer_path, collection)
+
+
+def _assert_no_dangling_tokens(nuscenes_map):
+    nodes = {node['token'] for node in nuscenes_map['node']}
+    lines = {line['token'] for line in nuscenes_map['line']}
+    polygons = {polygon['token'] for polygon in nuscenes_map['polygon']}
+    for line in nuscenes_map['line']:
+        assert set(line['node_tokens']) <= nodes
+    for polygon in nuscenes_map['polygon']:
+        assert set(polygon['exterior_node_tokens']) <= nodes
+        assert all(set(hole) <= nodes for hole in polygon['holes'])
+    for record in nuscenes_map.get('road_divider', []):
+        assert record['line_token'] in lines
+    for record in nuscenes_map.get('road_segment', []):
+        assert record['polygon_token'] in polygons
+
+
+def _line_polygon_nodes(nuscenes_map):
+    tokens = {token for line in nuscenes_map['line'] for token in line['node_tokens']}
+    for polygon in nuscenes_map['polygon']:
+        tokens.update(polygon['exterior_node_tokens'])
+        for hole in polygon['holes']:
+            tokens.update(hole)
+    return tokens
+
+
+def test_update_from_scratch_matches_convert(synthetic_map, tmp_path):
+    converted = str(tmp_path / 'converted.json')
+    updated = str(tmp_path / 'updated.json')
+    main(['convert', synthetic_map['map_yaml'], *synthetic_map['layers'], '-o', converted, '--token-factory', 'content'])
+    patch = _update(synthetic_map, updated)
+    assert _read_json(updated) == _read_json(converted)
+    for stats in patch['features'].values():
+        assert stats['added'] > 0 and stats['modified'] == stats['removed'] == stats['unchanged'] == 0
+
+
+def test_unchanged_layers_give_empty_patch(synthetic_map, tmp_path):
+    output = str(tmp_path / 'out.json')
+    _update(synthetic_map, output)
+    with open(output, 'rb') as f:
+        before = f.read()
+    patch = _update(synthetic_map, output)
+    assert patch['removed'] == {} and patch['upserted'] == {}
+    with open(output, 'rb') as f:
+        assert f.read() == before
+
+
+def test_patch_replays_edit_and_keeps_other_tokens(synthetic_map, tmp_path):
+    output = str(tmp_path / 'out.json')
+    _update(synthetic_map, output)
+    old = _read_json(output)
+
+    road_divider = synthetic_map['layers'][0]
+    _edit_first_line(road_divider)
+    patch_path = str(tmp_path / 'patch.json')
+    patch = _update(synthetic_map, output, patch_path)
+    new = _read_json(output)
+
+    # 合成图层没有要素 id，修改几何表现为删除旧要素 + 新增要素
+    stats = patch['features'][road_divider]
+    assert (stats['added'], stats['modified'], stats['removed']) == (1, 0, 1)
+    assert apply_patch(copy.deepcopy(old), _read_json(patch_path)) == new
+    _assert_no_dangling_tokens(new)
+    old_lines = {line['token'] for line in old['line']}
+    new_lines = {line['token'] for line in new['line']}
+    assert len(old_lines & new_lines) == len(old_lines) - 1
+    assert {polygon['token'] for polygon in old['polygon']} == {polygon['token'] for polygon in new['polygon']}
+
+
+def test_modified_feature_with_id_keeps_tokens(synthetic_map, tmp_path):
+    road_divider = synthetic_map['layers'][0]
+    collection = _read_json(road_divider)
+    for i, feature in enumerate(collection['features']):
+        feature['id'] = i
+    _write_json(road_divider, collection)
+
+    output = str(tmp_path / 'out.json')
+    _update(synthetic_map, output)
+    old = _read_json(output)
+    _edit_first_line(road_divider, dx=5.0)
+    patch = _update(synthetic_map, output)
+    new = _read_json(output)
+
+    stats = patch['features'][road_divider]
+    assert (stats['added'], stats['modified'], stats['removed']) == (0, 1, 0)
+    assert {line['token'] for line in new['line']} == {line['token'] for line in old['line']}
+    assert {r['token'] for r in new['road_divider']} == {r['token'] for r in old['road_divider']}
+    # 被移动的顶点换成新节点，旧节点不再被引用而被删除
+    assert len(patch['removed']['node']) == 1
+    assert len(new['node']) == len(old['node'])
+    _assert_no_dangling_tokens(new)
+
+
+def test_removed_feature_deletes_orphan_nodes(synthetic_map, tmp_path):
+    output = str(tmp_path / 'out.json')
+    _update(synthetic_map, output)
+    old = _read_json(output)
+
+    road_divider = synthetic_map['layers'][0]
+    collection = _read_json(road_divider)
+    collection['features'] = collection['features'][1:]
+    _write_json(road_divider, collection)
+    patch = _update(synthetic_map, output)
+    new = _read_json(output)
+
+    assert patch['features'][road_divider]['removed'] == 1
+    assert len(new['line']) == len(old['line']) - 1
+    old_referenced, new_referenced = _line_polygon_nodes(old), _line_polygon_nodes(new)
+    point_nodes = {node['token'] for node in old['node']} - old_referenced
+    assert {node['token'] for node in new['node']} == new_referenced | point_nodes
+    assert set(patch['removed']['node']) == old_referenced - new_referenced != set()
+    _assert_no_dangling_tokens(new)
+
+
+def test_changed_params_require_rebuild(synthetic_map, tmp_path):
+    output = str(tmp_path / 'out.json')
+    _update(synthetic_map, output)
+    with pytest.raises(ValueError, match='完整重建'):
+        _update(synthetic_map, output, options={**OPTIONS, 'node_tolerance': 0.01})
@@ -0,0 +1,80 @@
+import json
+
+import numpy as np
+import pytest
+import shapely
+
+from cli import main
+from map_query import LINE_LAYERS, MapSpatialIndex, patch_polygons
+
+
+@pytest.fixture
+def converted_map(synthetic_map, tmp_path):
+    output = str(tmp_path / 'out.json')
+    main(['convert', synthetic_map['map_yaml'], *synthetic_map['layers'], '-o', output, '--token-factory', 'content'])
+    with open(output) as f:
+        return json.load(f)
+
+
+def _record_geometries(nuscenes_map, layer_name):
+    """逐条记录直接由地图构造几何：[(token, 坐标, 几何)]。"""
+    nodes = {node['token']: (node['x'], node['y']) for node in nuscenes_map['node']}
+    lines = {line['token']: line for line in nuscenes_map['line']}
+    polygons = {polygon['token']: polygon for polygon in nuscenes_map['polygon']}
+    records = []
+    for record in nuscenes_map[layer_name]:
+        if layer_name in LINE_LAYERS:
+            coords = np.array([nodes[t] for t in lines[record['line_token']]['node_tokens']])
+            geometry = shapely.LineString(coords)
+        else:
+            coords = np.array([nodes[t] for t in polygons[record['polygon_token']]['exterior_node_tokens']])
+            geometry = shapely.Polygon(coords)
+        records.append((record['token'], coords, geometry))
+    return records
+
+
+def _brute_force(records, patch, mode):
+    result = []
+    for token, coords, geometry in records:
+        box = shapely.box(*coords.min(axis=0), *coords.max(axis=0))
+        if mode == 'intersect':
+            keep = box.intersects(patch)
+        elif mode == 'within':
+            keep = box.within(patch)
+        else:
+            keep = geometry.intersects(patch)
+        if keep:
+            result.append(token)
+    return result
+
+
+def _random_patches(nuscenes_map, n, seed=0):
+    rng = np.random.default_rng(seed)
+    xy = np.array([(node['x'], node['y']) for node in nuscenes_map['node']])
+    lo, hi = xy.min(axis=0), xy.max(axis=0)
+    centers = rng.uniform(lo, hi, (n, 2))
+    sizes = rng.uniform(0.05, 0.5, (n, 2)) * (hi - lo)
+    return np.column_stack([centers, sizes]), rng.uniform(-180, 180, n)
+
+
+@pytest.mark.parametrize('mode', ['intersect', 'within', 'exact'])
+def test_query_matches_brute_force(converted_map, mode):
+    index = MapSpatialIndex(converted_map)
+    records = {name: _record_geometries(converted_map, name) for name in index.layer_names}
+    boxes, angles = _random_patches(converted_map, 30)
+    batch = index.query_batch(boxes, angles, mode=mode)
+    found = 0
+    for box, angle, batch_result in zip(boxes, angles, batch):
+        patch = patch_polygons([box], [angle])[0]
+        expected = {name: _brute_force(records[name], patch, mode) for name in index.layer_names}
+        assert index.query(box, angle, mode=mode) == expected
+        assert batch_result == expected
+        found += sum(len(tokens) for tokens in expected.values())
+    assert found > 0, mode
+
+
+def test_record_coords(converted_map):
+    index = MapSpatialIndex(converted_map)
+    for name in index.layer_names:
+        for token, coords, _ in _record_geometries(converted_map, name):
+            assert np.array_equal(index.record_coords(name, token), coords)
@@ -0,0 +1,20 @@
+from polygon_nesting import nest_features
+
+
+def _square(x, y, size):
+    return [[x, y], [x + size, y], [x + size, y + size], [x, y + size], [x, y]]
+
+
+def test_multi_shell_source_keeps_token_on_first_shell_only():
+    features = [
+        {'type': 'Feature', 'properties': {'token': 'seg-a', 'name': 'a'},
+         'geometry': {'type': 'MultiPolygon', 'coordinates': [[_square(0, 0, 10)], [_square(20, 0, 10)]]}},
+        {'type': 'Feature', 'properties': {'token': 'hole'},
+         'geometry': {'type': 'Polygon', 'coordinates': [_square(2, 2, 2)]}},
+    ]
+    nested = nest_features(features)
+    assert len(nested) == 2
+    assert nested[0]['properties'] == {'token': 'seg-a', 'name': 'a'}
+    assert nested[1]['properties'] == {'name': 'a'}
+    assert len(nested[0]['geometry']['coordinates']) == 2
+    assert features[0]['properties']['token'] == 'seg-a'
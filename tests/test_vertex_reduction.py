@@ -0,0 +1,49 @@
+import numpy as np
+
+from vertex_reduction import resample_lines
+
+
+def _resample_one(line, spacing):
+    """单条折线的参考实现：np.cumsum 累计长度，在该折线内 searchsorted。"""
+    seg_len = np.hypot(*np.diff(line, axis=0).T)
+    cum = np.concatenate([[0.0], np.cumsum(seg_len)])
+    total = cum[-1]
+    distance = np.minimum(np.arange(max(int(np.ceil(total / spacing)), 1) + 1) * spacing, total)
+    seg = np.clip(np.searchsorted(cum, distance, side='right') - 1, 0, len(line) - 2)
+    length = seg_len[seg]
+    t = np.divide(distance - cum[seg], length, out=np.zeros_like(length), where=length > 0)
+    sampled = line[seg] + t[:, None] * (line[seg + 1] - line[seg])
+    sampled[0], sampled[-1] = line[0], line[-1]
+    return sampled
+
+
+def _random_lines(rng, n):
+    lines = []
+    for i in range(n):
+        count = int(rng.choice([2, 3, 5, 20, 200]))
+        start = rng.uniform(-1e5, 1e5, 2)
+        line = start + np.cumsum(rng.normal(0, rng.choice([0.01, 1.0, 10.0]), (count, 2)), axis=0)
+        if i % 7 == 0:
+            line[count // 2] = line[count // 2 - 1]  # 长度为 0 的线段
+        lines.append(line)
+    return lines
+
+
+def test_batch_resample_is_bit_identical_to_single_lines():
+    rng = np.random.default_rng(0)
+    lines = _random_lines(rng, 300)
+    for spacing in (0.1, 2.0):
+        batched = resample_lines(lines, spacing)
+        for line, result in zip(lines, batched):
+            expected = _resample_one(line, spacing)
+            assert np.array_equal(result, expected)
+            assert np.array_equal(resample_lines([line], spacing)[0], expected)
+
+
+def test_resample_segment_lookup_with_large_line_offsets():
+    # 排在后面的折线偏移很大，加偏移后极短线段的累计长度会舍入成同一个值
+    tiny = np.cumsum(np.random.default_rng(0).normal(0, 1e-12, (20, 2)), axis=0) + [3.0, 4.0]
+    lines = [tiny] * 30000
+    batched = resample_lines(lines, 3e-12)
+    expected = _resample_one(tiny, 3e-12)
+    assert all(np.array_equal(result, expected) for result in batched[-100:])
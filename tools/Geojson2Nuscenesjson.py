@@ -15,7 +15,7 @@ class Geojson2Nuscenesjson:
         # 初始化语义数据字典
         self.semantic_data = {layer: [] for layer in self.nuscenes_semantic_layers}
         # 初始化几何数据
-        self.nodes = {}
+        self.nodes = {}  # (x, y) -> token，O(1) 查找已有节点
         self.node_list = []
         self.line_list = []
         self.polygon_list = []
@@ -38,6 +38,26 @@ class Geojson2Nuscenesjson:
             semantic_type = 'unknown'
         return semantic_type
 
+    def coords_to_node_tokens(self, coords):
+        """
+        将一串坐标转换为节点 token 列表，坐标完全相同的节点复用已有 token。
+        """
+        node_tokens = []
+        for coord in coords:
+            key = (coord[0], coord[1])
+            token = self.nodes.get(key)
+            if token is None:
+                token = self.generate_token()
+                node = {
+                    'token': token,
+                    'x': coord[0],
+                    'y': coord[1]
+                }
+                self.node_list.append(node)
+                self.nodes[key] = token
+            node_tokens.append(token)
+        return node_tokens
+
     def process_geometry(self, feature, semantic_type):
         """
         处理GeoJSON要素的几何数据，并根据语义类型分类存储。
@@ -54,29 +74,10 @@ class Geojson2Nuscenesjson:
                 'y': y
             }
             self.node_list.append(node)
-            self.nodes[token] = (x, y)
+            self.nodes.setdefault((x, y), token)
 
         elif geom.geom_type == 'LineString':
-            coords = list(geom.coords)
-            node_tokens = []
-            for coord in coords:
-                existing_token = None
-                for tok, (x, y) in self.nodes.items():
-                    if x == coord[0] and y == coord[1]:
-                        existing_token = tok
-                        break
-                if existing_token is None:
-                    new_token = self.generate_token()
-                    node = {
-                        'token': new_token,
-                        'x': coord[0],
-                        'y': coord[1]
-                    }
-                    self.node_list.append(node)
-                    self.nodes[new_token] = coord
-                    node_tokens.append(new_token)
-                else:
-                    node_tokens.append(existing_token)
+            node_tokens = self.coords_to_node_tokens(geom.coords)
             if len(node_tokens) >= 2:
                 line = {
                     'token': token,
@@ -85,50 +86,12 @@ class Geojson2Nuscenesjson:
                 self.line_list.append(line)
 
         elif geom.geom_type == 'Polygon':
-            exterior_coords = list(geom.exterior.coords)
-            exterior_node_tokens = []
-            for coord in exterior_coords:
-                existing_token = None
-                for tok, (x, y) in self.nodes.items():
-                    if x == coord[0] and y == coord[1]:
-                        existing_token = tok
-                        break
-                if existing_token is None:
-                    new_token = self.generate_token()
-                    node = {
-                        'token': new_token,
-                        'x': coord[0],
-                        'y': coord[1]
-                    }
-                    self.node_list.append(node)
-                    self.nodes[new_token] = coord
-                    exterior_node_tokens.append(new_token)
-                else:
-                    exterior_node_tokens.append(existing_token)
+            exterior_node_tokens = self.coords_to_node_tokens(geom.exterior.coords)
 
             # 处理孔洞（holes）
             holes = []
             for interior in geom.interiors:
-                hole_coords = list(interior.coords)
-                hole_tokens = []
-                for coord in hole_coords:
-                    existing_token = None
-                    for tok, (x, y) in self.nodes.items():
-                        if x == coord[0] and y == coord[1]:
-                            existing_token = tok
-                            break
-                    if existing_token is None:
-                        new_token = self.generate_token()
-                        node = {
-                            'token': new_token,
-                            'x': coord[0],
-                            'y': coord[1]
-                        }
-                        self.node_list.append(node)
-                        self.nodes[new_token] = coord
-                        hole_tokens.append(new_token)
-                    else:
-                        hole_tokens.append(existing_token)
+                hole_tokens = self.coords_to_node_tokens(interior.coords)
                 if hole_tokens:
                     holes.append(hole_tokens)
 
@@ -1,30 +1,340 @@
-from moviepy.video.io.VideoFileClip import VideoFileClip
+"""
+从视频中截取片段。三种方式:
+- smart（默认）: 起止点之间完整的 GOP 直接复制编码后的数据包（不解码），只重新编码起点到下一个关键帧、
+  最后一个关键帧到终点这两段不完整的 GOP，再拼接；速度接近文件读写速度，起止点仍然精确到帧
+- copy: 只复制数据包，起止点分别向外对齐到关键帧（片段可能略长），最快
+- reencode: 原来的做法，moviepy subclip 后用 libx264 重新编码整个片段
 
-def cut_video(input_path, output_path, start_time, end_time):
+smart / copy 模式的细节:
+- 时间从文件开头（容器的 start_time）算起，与播放器显示的时间一致；关键帧时间戳减去 start_time 后再规划
+- 按帧号规划（恒定帧率），重新编码的片段使用与原视频相同的编码、profile、level、像素格式、帧率与时间基
+- 每段的 SPS / PPS（HEVC 还有 VPS）都写在关键帧前（h264_mp4toannexb / hevc_mp4toannexb），
+  MP4 输出使用允许码流内参数集的 avc3 / hev1 标记，重新编码的片段与复制的片段各自使用自己的参数集
+- 可变帧率、h264 / hevc 以外的编码或无法匹配的 profile 自动改为 reencode
+- 批量截取时只用 ffprobe 扫描一次关键帧，各片段按关键帧直接 seek，只读取自己的范围，可以用多个线程并行
+
+需要 ffmpeg / ffprobe（PATH 中的 ffmpeg，或 moviepy 自带的 imageio-ffmpeg 加上 PATH 中的 ffprobe）。
+
+用法:
+    python tools/cut_video.py vis_VAD.mp4 --clip 1:56 2:07 cuted_video.mp4
+    python tools/cut_video.py vis_VAD.mp4 --clip 0:10 0:25 a.mp4 --clip 5:00 5:30 b.mp4 --mode copy
+    python tools/cut_video.py vis_VAD.mp4 --list clips.csv --workers 4    # 每行: 输出文件,起始时间,结束时间
+"""
+import argparse
+import csv
+import json
+import math
+import os
+import shutil
+import subprocess
+import tempfile
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ThreadPoolExecutor
+
+# smart / copy 模式支持的编码: 重新编码边缘所用的编码器、ffprobe profile -> 编码器 profile、码流内参数集的 bsf 与 MP4 标记
+_CODECS = {
+    'h264': {
+        'encoder': 'libx264', 'bsf': 'h264_mp4toannexb', 'tag': 'avc3',
+        'profiles': {'Constrained Baseline': 'baseline', 'Baseline': 'baseline', 'Main': 'main', 'High': 'high',
+                     'High 10': 'high10', 'High 4:2:2': 'high422', 'High 4:4:4 Predictive': 'high444'},
+    },
+    'hevc': {
+        'encoder': 'libx265', 'bsf': 'hevc_mp4toannexb', 'tag': 'hev1',
+        'profiles': {'Main': 'main', 'Main 10': 'main10', 'Main Still Picture': 'mainstillpicture'},
+    },
+}
+_MP4_EXTENSIONS = ('.mp4', '.m4v', '.mov')
+
+
+def ffmpeg_exe():
+    # 优先使用 PATH 中的 ffmpeg（通常与 ffprobe 来自同一次安装），其次是 moviepy 依赖的 imageio-ffmpeg
+    path = shutil.which('ffmpeg')
+    if path:
+        return path
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except ImportError:
+        return 'ffmpeg'
+
+
+def ffprobe_exe():
+    sibling = os.path.join(os.path.dirname(ffmpeg_exe()), 'ffprobe')
+    return sibling if os.path.exists(sibling) else (shutil.which('ffprobe') or 'ffprobe')
+
+
+def _run(cmd):
+    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"命令执行失败: {' '.join(cmd)}\n{result.stderr[-2000:]}")
+    return result.stdout
+
+
+def parse_time(text):
+    """'116' / '1:56' / '0:01:56.5' -> 秒。"""
+    seconds = 0.0
+    for part in str(text).split(':'):
+        seconds = seconds * 60 + float(part)
+    return seconds
+
+
+def _rate(text):
+    num, _, den = (text or '0/0').partition('/')
+    num, den = int(num), int(den or 1)
+    return num / den if num and den else 0.0
+
+
+def probe_video(input_path):
+    """
+    读取视频流信息与所有关键帧（只解复用数据包，不解码）。时间均为相对文件开头（容器 start_time）的秒数。
+    返回:
+    - {'codec', 'profile', 'level', 'pix_fmt', 'rate': '25/1', 'fps', 'cfr', 'timescale', 'video_start',
+       'frames', 'keyframes': [帧号, ...], 'keyframe_times': {帧号: 秒}, 'has_audio'}
+    """
+    info = json.loads(_run([
+        ffprobe_exe(), '-v', 'error', '-show_entries',
+        'format=start_time:stream=codec_type,codec_name,profile,level,pix_fmt,avg_frame_rate,r_frame_rate,'
+        'time_base,start_time',
+        '-of', 'json', input_path,
+    ]))
+    video = next(s for s in info['streams'] if s['codec_type'] == 'video')
+    # -ss 等时间都相对容器的 start_time，数据包的 pts_time 是绝对时间
+    format_start = float(info.get('format', {}).get('start_time') or 0.0)
+    fps = _rate(video['r_frame_rate'])
+    video_start = float(video.get('start_time') or format_start) - format_start
+
+    packets = _run([
+        ffprobe_exe(), '-v', 'error', '-select_streams', 'v:0',
+        '-show_entries', 'packet=pts_time,flags', '-of', 'csv=p=0', input_path,
+    ])
+    frames = 0
+    keyframe_times = {}
+    for line in packets.splitlines():
+        pts_time, _, flags = line.partition(',')
+        if pts_time in ('', 'N/A'):
+            continue
+        frames += 1
+        if 'K' in flags:
+            time = float(pts_time) - format_start
+            keyframe_times[int(round((time - video_start) * fps))] = time
+    return {
+        'codec': video['codec_name'],
+        'profile': video.get('profile'),
+        'level': video.get('level'),
+        'pix_fmt': video.get('pix_fmt', 'yuv420p'),
+        'rate': video['r_frame_rate'],
+        'fps': fps,
+        'cfr': fps > 0 and abs(_rate(video.get('avg_frame_rate')) - fps) < 1e-3,
+        'timescale': int(video['time_base'].split('/')[1]),
+        'video_start': video_start,
+        'frames': frames,
+        'keyframes': sorted(keyframe_times),
+        'keyframe_times': keyframe_times,
+        'has_audio': any(s['codec_type'] == 'audio' for s in info['streams']),
+    }
+
+
+def smart_cut_unsupported(meta, mode='smart'):
+    """不能按帧号规划、复制或匹配编码参数时返回原因，否则返回 None。"""
+    codec = _CODECS.get(meta['codec'])
+    if codec is None:
+        return f"{meta['codec']} 编码不支持 {mode} 模式"
+    if not meta['cfr']:
+        return "可变帧率视频不支持按帧号截取"
+    if mode == 'smart' and codec['profiles'].get(meta['profile']) is None:
+        return f"{codec['encoder']} 无法按原视频的 {meta['profile']} profile 编码"
+    return None
+
+
+def frame_range(meta, start_time, end_time):
+    """时间段 [start_time, end_time) 内的帧号区间 [first, end)。"""
+    first = math.ceil((start_time - meta['video_start']) * meta['fps'] - 1e-6)
+    end = math.ceil((end_time - meta['video_start']) * meta['fps'] - 1e-6)
+    return max(first, 0), min(end, meta['frames'])
+
+
+def frame_time(meta, index):
+    return meta['video_start'] + index / meta['fps']
+
+
+def plan_clip(keyframes, first, end):
+    """
+    将帧区间 [first, end) 分为 (head, middle, tail) 三段，每段为帧号区间 (起, 止) 或 None:
+    middle 从 first 之后第一个关键帧到 end 之前最后一个关键帧（keyframes 末尾可以加上总帧数表示文件结尾），
+    可以直接复制；head / tail 需要重新编码。其间没有完整 GOP 时 middle 为 None，整个片段作为 head 重新编码。
+    """
+    i = bisect_left(keyframes, first)
+    j = bisect_right(keyframes, end) - 1
+    if i >= len(keyframes) or j < 0 or keyframes[i] >= keyframes[j]:
+        return (first, end), None, None
+    k1, k2 = keyframes[i], keyframes[j]
+    head = (first, k1) if first < k1 else None
+    tail = (k2, end) if k2 < end else None
+    return head, (k1, k2), tail
+
+
+def _container_args(meta, output_path):
+    """参数集写入码流，MP4 使用 avc3 / hev1 标记并保持原视频的时间基。"""
+    codec = _CODECS[meta['codec']]
+    args = ['-bsf:v', codec['bsf']]
+    if output_path.lower().endswith(_MP4_EXTENSIONS):
+        args += ['-tag:v', codec['tag'], '-video_track_timescale', str(meta['timescale'])]
+    return args
+
+
+def _encode_segment(input_path, output_path, first, end, meta):
+    """重新编码帧 [first, end)，编码、profile、level、像素格式、帧率与时间基与原视频一致。"""
+    codec = _CODECS[meta['codec']]
+    level = meta['level']
+    if meta['codec'] == 'h264':
+        encoder_args = ['-profile:v', codec['profiles'][meta['profile']]]
+        if level and level > 0:
+            encoder_args += ['-level:v', f'{level / 10:.1f}']
+    else:
+        x265_params = 'log-level=error'
+        if level and level > 0:
+            x265_params += f':level-idc={level / 30:.1f}'
+        encoder_args = ['-profile:v', codec['profiles'][meta['profile']], '-x265-params', x265_params]
+    # 向前留半帧，精确 seek 后第一帧恰好是 first
+    seek = max(frame_time(meta, first) - 0.5 / meta['fps'], 0.0)
+    _run([
+        ffmpeg_exe(), '-v', 'error', '-y', '-ss', f'{seek:.6f}', '-i', input_path,
+        '-map', '0:v:0', '-an', '-frames:v', str(end - first),
+        '-c:v', codec['encoder'], *encoder_args, '-pix_fmt', meta['pix_fmt'], '-r', meta['rate'],
+        *_container_args(meta, output_path), output_path,
+    ])
+
+
+def _copy_segment(input_path, output_path, first, end, meta):
+    """复制帧 [first, end) 的数据包，first 必须是关键帧（按关键帧的精确时间戳 seek，不解码）。"""
+    _run([
+        ffmpeg_exe(), '-v', 'error', '-y', '-ss', f"{meta['keyframe_times'][first]:.6f}", '-i', input_path,
+        '-map', '0:v:0', '-an', '-c:v', 'copy', '-frames:v', str(end - first),
+        *_container_args(meta, output_path), output_path,
+    ])
+
+
+def _concat(parts, input_path, output_path, start, end, meta, tmp_dir):
+    """拼接视频片段，音频从原视频按 [start, end) 截取后重新编码（体积小，开销可以忽略）。"""
+    list_path = os.path.join(tmp_dir, 'parts.txt')
+    with open(list_path, 'w', encoding='utf-8') as f:
+        for part in parts:
+            f.write(f"file '{os.path.abspath(part)}'\n")
+    cmd = [ffmpeg_exe(), '-v', 'error', '-y', '-f', 'concat', '-safe', '0', '-i', list_path]
+    if meta['has_audio']:
+        cmd += ['-ss', f'{start:.6f}', '-t', f'{end - start:.6f}', '-i', input_path,
+                '-map', '0:v:0', '-map', '1:a:0?', '-c:a', 'aac']
+    else:
+        cmd += ['-map', '0:v:0']
+    cmd += ['-c:v', 'copy']
+    if output_path.lower().endswith(_MP4_EXTENSIONS):
+        cmd += ['-tag:v', _CODECS[meta['codec']]['tag'], '-video_track_timescale', str(meta['timescale'])]
+    _run(cmd + [output_path])
+
+
+def _cut_one(input_path, meta, output_path, start_time, end_time, mode, tmp_dir):
+    """截取一个片段，返回 (帧数, 复制的帧数)。"""
+    first, end = frame_range(meta, start_time, end_time)
+    if end <= first:
+        raise ValueError(f"{output_path}: {start_time:.3f}s - {end_time:.3f}s 不包含任何帧")
+    # 文件结尾也是完整 GOP 的边界
+    boundaries = meta['keyframes'] + [meta['frames']]
+    if mode == 'copy':
+        first = boundaries[max(bisect_right(boundaries, first) - 1, 0)]
+        end = boundaries[bisect_left(boundaries, end)]
+        head, middle, tail = None, (first, end), None
+    else:
+        head, middle, tail = plan_clip(boundaries, first, end)
+
+    os.makedirs(tmp_dir)
+    parts = []
+    for name, segment, write in (('head', head, _encode_segment), ('middle', middle, _copy_segment),
+                                 ('tail', tail, _encode_segment)):
+        if segment is not None:
+            parts.append(os.path.join(tmp_dir, f'{name}.mp4'))
+            write(input_path, parts[-1], *segment, meta)
+    _concat(parts, input_path, output_path, frame_time(meta, first), frame_time(meta, end), meta, tmp_dir)
+    return end - first, 0 if middle is None else middle[1] - middle[0]
+
+
+def cut_clips(input_path, clips, mode='smart', workers=1):
+    """
+    从同一个视频截取多个片段。
+    参数:
+    - clips: [(output_path, start_time, end_time)]，时间单位为秒，从文件开头算起
+    - mode: 'smart' | 'copy' | 'reencode'，见模块说明
+    - workers: 同时处理的片段数（每个片段各自调用 ffmpeg）
+    """
+    if mode == 'reencode':
+        for output_path, start_time, end_time in clips:
+            cut_video_reencode(input_path, output_path, start_time, end_time)
+        return
+
+    meta = probe_video(input_path)
+    reason = smart_cut_unsupported(meta, mode)
+    if reason is not None:
+        print(f"{reason}，改为重新编码")
+        return cut_clips(input_path, clips, 'reencode')
+
+    with tempfile.TemporaryDirectory() as tmp_dir, ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_cut_one, input_path, meta, output_path, start_time, end_time, mode,
+                               os.path.join(tmp_dir, str(i)))
+                   for i, (output_path, start_time, end_time) in enumerate(clips)]
+        for (output_path, start_time, end_time), future in zip(clips, futures):
+            frames, copied = future.result()
+            print(f"{output_path}: {start_time:.3f}s - {end_time:.3f}s, {frames} 帧（复制 {copied} 帧）")
+
+
+def cut_video(input_path, output_path, start_time, end_time, mode='smart'):
     """
     从输入视频中截取从 start_time 到 end_time 时间段的视频，并保存到 output_path。
-    
+
     参数:
         input_path: 输入视频文件路径
         output_path: 输出视频文件路径
         start_time: 截取起始时间（单位：秒）
         end_time: 截取结束时间（单位：秒）
+        mode: 'smart' | 'copy' | 'reencode'，见模块说明
+    """
+    cut_clips(input_path, [(output_path, start_time, end_time)], mode)
+
+
+def cut_video_reencode(input_path, output_path, start_time, end_time):
     """
+    用 moviepy 截取并用 libx264 重新编码整个片段。
+    """
+    from moviepy.video.io.VideoFileClip import VideoFileClip
+
     clip = VideoFileClip(input_path)
-    
+
     try:
         # 尝试使用 subclip 方法
         new_clip = clip.subclip(start_time, end_time)
     except AttributeError:
         # 如果不存在 subclip 方法，尝试使用 subclipped 方法（部分版本可能命名为 subclipped）
         new_clip = clip.subclipped(start_time, end_time)
-    
+
     new_clip.write_videofile(output_path, codec="libx264", audio_codec="aac")
 
+
+def _read_clip_list(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return [(row[0], parse_time(row[1]), parse_time(row[2])) for row in csv.reader(f) if row]
+
+
 if __name__ == "__main__":
-    input_path = r"E:\A_Work\学术\FreeAD_机器人端到端自动驾驶\可视化结果\vis_VAD.mp4"
-    output_path = "cuted_video.mp4"
-    start = 60*1 + 56  # 1 分钟 56 秒
-    end = 60*2 + 7     # 2 分钟 7 秒
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('input_path')
+    parser.add_argument('--clip', nargs=3, action='append', default=[], metavar=('START', 'END', 'OUTPUT'),
+                        help='起始时间 结束时间 输出文件（时间写成秒或 分:秒），可重复')
+    parser.add_argument('--list', default=None, help='CSV 片段列表，每行: 输出文件,起始时间,结束时间')
+    parser.add_argument('--mode', choices=('smart', 'copy', 'reencode'), default='smart')
+    parser.add_argument('--workers', type=int, default=1, help='同时处理的片段数')
+    args = parser.parse_args()
 
-    cut_video(input_path, output_path, start, end)
+    clips = [(output, parse_time(start), parse_time(end)) for start, end, output in args.clip]
+    if args.list:
+        clips += _read_clip_list(args.list)
+    if not clips:
+        parser.error("至少需要一个 --clip 或 --list")
+    cut_clips(args.input_path, clips, args.mode, args.workers)
@@ -1,46 +1,155 @@
-import cv2
+"""
+从视频中按时间段抽帧保存为图片。
+- 解码在当前线程中顺序进行，不需要的帧只 grab() 不 retrieve()，时间段之间间隔较大时直接 seek 到下一段的起始帧
+- JPEG 编码与写文件交给有界线程池（cv2.imencode / imwrite 会释放 GIL），队列中最多 2 * workers 帧，内存占用有上限
+- 一次解码可以抽取多个时间段，每段有自己的帧间隔
+- --processes N 时按帧数把要抽取的帧分成 N 段，每个进程各自打开视频并 seek 到自己的起始帧，适合小时级的长视频
+
+用法:
+    python tools/extract_frame_from_video.py vis_VAD.mp4 -o extracted_frames --window 87:88
+    python tools/extract_frame_from_video.py vis_VAD.mp4 --window 0:600:10 --window 1800:1860 --workers 8 --processes 4
+时间段写成 start:end[:stride]（秒，stride 为帧间隔，默认 --stride），不给出 --window 时抽取整个视频。
+"""
+import argparse
 import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import cv2
+
+# 与下一帧的间隔超过该帧数时 seek，而不是逐帧 grab
+SEEK_THRESHOLD = 250
+
+
+def parse_window(text, default_stride=1):
+    """'start:end[:stride]' -> (start 秒, end 秒, stride)。"""
+    parts = text.split(':')
+    if len(parts) not in (2, 3):
+        raise argparse.ArgumentTypeError(f"时间段格式应为 start:end[:stride]，得到 {text!r}")
+    stride = int(parts[2]) if len(parts) == 3 else default_stride
+    return float(parts[0]), float(parts[1]), stride
+
+
+def frame_indices(windows, fps, frame_count):
+    """
+    将多个时间段转换为排好序、去重后的帧序号列表。
+    参数:
+    - windows: [(start 秒, end 秒, stride)]，为空时表示整个视频（stride 1）
+    """
+    if not windows:
+        return list(range(frame_count))
+    indices = set()
+    for start_time, end_time, stride in windows:
+        start_frame = int(start_time * fps)
+        end_frame = min(int(end_time * fps), frame_count)
+        indices.update(range(start_frame, end_frame, max(stride, 1)))
+    return sorted(indices)
+
+
+def _write_frame(path, frame, params, semaphore):
+    try:
+        if not cv2.imwrite(path, frame, params):
+            raise IOError(f"无法写入 {path}")
+    finally:
+        semaphore.release()
+
+
+def extract_frames(video_path, indices, output_dir, workers=4, ext='jpg', jpeg_quality=95, verbose=False):
+    """
+    解码 video_path 中的 indices（升序）各帧并写到 output_dir/frame_{序号}.{ext}，返回写出的帧数。
+    """
+    if not indices:
+        return 0
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise IOError(f"无法打开视频文件: {video_path}")
+
+    params = [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality] if ext.lower() in ('jpg', 'jpeg') else []
+    # 限制排队等待编码的帧数，解码快于编码时解码线程在这里等待
+    semaphore = threading.BoundedSemaphore(2 * workers)
+    written = 0
+    futures = deque()
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, indices[0])
+            current_frame = indices[0]
+            for index in indices:
+                if index - current_frame > SEEK_THRESHOLD:
+                    cap.set(cv2.CAP_PROP_POS_FRAMES, index)
+                    current_frame = index
+                # 跳过的帧只 grab，不做颜色转换与拷贝
+                while current_frame < index and cap.grab():
+                    current_frame += 1
+                if current_frame < index:
+                    # grab 失败（视频提前结束或损坏），否则会把之后读到的帧错存为 index
+                    break
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                current_frame += 1
+
+                semaphore.acquire()
+                frame_filename = os.path.join(output_dir, f"frame_{index}.{ext}")
+                futures.append(pool.submit(_write_frame, frame_filename, frame, params, semaphore))
+                if verbose:
+                    print(f"保存帧 {index} 到 {frame_filename}")
+                # 及时取回已完成的结果，写文件出错时尽早报错
+                while futures and futures[0].done():
+                    futures.popleft().result()
+                    written += 1
+            for future in futures:
+                future.result()
+                written += 1
+    finally:
+        cap.release()
+    return written
+
+
+def _split(indices, chunks):
+    size = -(-len(indices) // chunks)
+    return [indices[i:i + size] for i in range(0, len(indices), size)]
+
+
+def extract_windows(video_path, output_dir, windows=None, workers=4, processes=1, ext='jpg', jpeg_quality=95,
+                    verbose=False):
+    """
+    按时间段抽帧，返回写出的帧数。processes > 1 时按帧数分段，由多个进程各自解码。
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise IOError(f"无法打开视频文件: {video_path}")
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    print(f"视频帧率: {fps} fps, 共 {frame_count} 帧")
+
+    indices = frame_indices(windows, fps, frame_count)
+    if processes <= 1 or len(indices) < 2 * processes:
+        return extract_frames(video_path, indices, output_dir, workers, ext, jpeg_quality, verbose)
+
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        futures = [pool.submit(extract_frames, video_path, chunk, output_dir, workers, ext, jpeg_quality, verbose)
+                   for chunk in _split(indices, processes)]
+        return sum(future.result() for future in futures)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('video_path')
+    parser.add_argument('-o', '--output-dir', default='extracted_frames')
+    parser.add_argument('--window', action='append', default=None, metavar='START:END[:STRIDE]',
+                        help='要抽取的时间段（秒），可重复；不给出时抽取整个视频')
+    parser.add_argument('--stride', type=int, default=1, help='时间段未指定 stride 时的帧间隔')
+    parser.add_argument('--workers', type=int, default=4, help='每个进程中编码、写文件的线程数')
+    parser.add_argument('--processes', type=int, default=1, help='分段解码的进程数')
+    parser.add_argument('--ext', default='jpg')
+    parser.add_argument('--jpeg-quality', type=int, default=95)
+    parser.add_argument('-v', '--verbose', action='store_true', help='打印每一帧的保存路径')
+    args = parser.parse_args()
 
-# 视频文件路径
-video_path = r"D:\vis_VAD.mp4"
-# 存储提取帧的文件夹
-output_dir = 'extracted_frames'
-if not os.path.exists(output_dir):
-    os.makedirs(output_dir)
-
-# 打开视频文件
-cap = cv2.VideoCapture(video_path)
-if not cap.isOpened():
-    print("无法打开视频文件")
-    exit()
-
-# 获取视频的帧率
-fps = cap.get(cv2.CAP_PROP_FPS)
-print(f"视频帧率: {fps} fps")
-
-# 设定要抽取的时间段：从 1分50秒 到 1分51秒
-start_time = 1 * 60 + 27   # 1分50秒转换为秒
-end_time = start_time + 1  # 1秒钟的时长
-
-# 计算对应的帧索引
-start_frame = int(start_time * fps)
-end_frame = int(end_time * fps)
-
-# 设置视频的起始帧位置
-cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
-
-current_frame = start_frame
-while cap.isOpened() and current_frame < end_frame:
-    ret, frame = cap.read()
-    if not ret:
-        break
-
-    # 构造输出文件名
-    frame_filename = os.path.join(output_dir, f"frame_{current_frame}.jpg")
-    cv2.imwrite(frame_filename, frame)
-    print(f"保存帧 {current_frame} 到 {frame_filename}")
-
-    current_frame += 1
-
-cap.release()
-print("帧提取完成！")
+    windows = [parse_window(text, args.stride) for text in args.window or ()]
+    count = extract_windows(args.video_path, args.output_dir, windows, args.workers, args.processes,
+                            args.ext, args.jpeg_quality, args.verbose)
+    print(f"帧提取完成！共 {count} 帧")